@@ -2,6 +2,7 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from config import Config
+from app.database import engine_options, register_sqlite_tuning
 
 db = SQLAlchemy()
 login_manager = LoginManager()
@@ -10,12 +11,27 @@ login_manager.login_view = 'auth.login'
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
     
     db.init_app(app)
     login_manager.init_app(app)
     
+    # Engine hooks: SQLite PRAGMAs and optional per-view SQL statement budgets
+    from app.utils.query_budget import init_query_budget
+    with app.app_context():
+        register_sqlite_tuning(db.engine, app.config)
+        init_query_budget(app, db.engine)
+    
+    # Per-user analytics result cache
+    from app.utils.analytics_cache import init_analytics_cache
+    init_analytics_cache(app)
+    
     from app.routes import main_bp, auth_bp, expense_bp
     
+    # Per-merchant categorization caches, sized from MERCHANT_CACHE_SIZE
+    from app.utils.expense_categorizer import init_merchant_caches
+    init_merchant_caches(app)
+    
     # Register blueprints
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
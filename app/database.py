@@ -0,0 +1,70 @@
+"""Database engine configuration.
+
+Engine options come from the DB_* settings in config.py. SQLite connections
+are additionally tuned for concurrent readers and writers (WAL journal,
+busy timeout, relaxed fsync and a larger page cache/mmap) through a
+connection hook, so statement imports no longer lock out the dashboard.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+def engine_options(config):
+    """Build SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings."""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    timeout = config.get('DB_STATEMENT_TIMEOUT', 30)
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.setdefault('pool_pre_ping', True)
+    options.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', 1800))
+
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    connect_args = dict(options.get('connect_args', {}))
+    if backend == 'sqlite':
+        # In-memory databases use a singleton pool that does not take a size
+        if url.database and url.database != ':memory:':
+            options.setdefault('pool_size', config.get('DB_POOL_SIZE', 5))
+            options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 10))
+        # How long the driver waits on a locked database before raising
+        connect_args.setdefault('timeout', timeout)
+    else:
+        options.setdefault('pool_size', config.get('DB_POOL_SIZE', 5))
+        options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 10))
+        if backend == 'postgresql':
+            connect_args.setdefault('options', f'-c statement_timeout={int(timeout * 1000)}')
+        elif backend == 'mysql':
+            connect_args.setdefault('init_command', f'SET SESSION max_execution_time={int(timeout * 1000)}')
+
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
+
+def register_sqlite_tuning(engine, config):
+    """Apply the SQLite PRAGMAs to every new connection of `engine`."""
+    if engine.dialect.name != 'sqlite' or not config.get('SQLITE_TUNING', True):
+        return
+
+    in_memory = engine.url.database in (None, '', ':memory:')
+    busy_timeout_ms = int(config.get('DB_STATEMENT_TIMEOUT', 30) * 1000)
+    cache_size_kb = config.get('SQLITE_CACHE_SIZE_KB', 64 * 1024)
+    mmap_size = config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if not in_memory:
+                # Readers no longer block writers (and vice versa)
+                cursor.execute('PRAGMA journal_mode=WAL')
+                # Safe with WAL: only a power loss can drop the last commits
+                cursor.execute('PRAGMA synchronous=NORMAL')
+                cursor.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+            cursor.execute(f'PRAGMA busy_timeout={busy_timeout_ms}')
+            # Negative values are KiB rather than pages
+            cursor.execute(f'PRAGMA cache_size=-{int(cache_size_kb)}')
+            cursor.execute('PRAGMA temp_store=MEMORY')
+        finally:
+            cursor.close()
@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from flask_wtf.file import FileField, FileAllowed, FileRequired
+from flask_wtf.file import FileField, FileAllowed, FileRequired, MultipleFileField
 from wtforms import StringField, PasswordField, SubmitField, FloatField, SelectField, TextAreaField, DateField, EmailField, BooleanField
 from wtforms.validators import DataRequired, Length, EqualTo, ValidationError, Regexp, NumberRange, Optional
 from app.models import User
@@ -43,12 +43,19 @@ class ExpenseForm(FlaskForm):
     submit = SubmitField('Save Expense')
 
 class StatementUploadForm(FlaskForm):
-    statement = FileField('Bank Statement (PDF)', validators=[
+    statement = FileField('Bank Statement (PDF, CSV, OFX or QIF)', validators=[
         FileRequired(),
-        FileAllowed(['pdf'], 'PDF files only!')
+        FileAllowed(['pdf', 'csv', 'ofx', 'qfx', 'qif'], 'PDF, CSV, OFX or QIF files only!')
     ])
     submit = SubmitField('Upload Statement')
 
+class StatementBatchUploadForm(FlaskForm):
+    statements = MultipleFileField('Bank Statements (PDF, CSV, OFX, QIF, or a zip of them)', validators=[
+        FileRequired(),
+        FileAllowed(['pdf', 'csv', 'ofx', 'qfx', 'qif', 'zip'], 'PDF, CSV, OFX, QIF or zip files only!')
+    ])
+    submit = SubmitField('Upload Statements')
+
 class DateRangeForm(FlaskForm):
     start_date = DateField('Start Date', validators=[DataRequired()])
     end_date = DateField('End Date', validators=[DataRequired()])
@@ -2,6 +2,7 @@ from app import db, login_manager
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from app.utils.money import money_property
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -13,6 +14,8 @@ class User(db.Model, UserMixin):
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128))
+    # Bumped on every write so cached analytics for the user are invalidated
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     expenses = db.relationship('Expense', backref='user', lazy=True)
     categories = db.relationship('Category', backref='user', lazy=True)
     
@@ -29,31 +32,90 @@ class Category(db.Model):
     __tablename__ = 'categories'  # Explicitly set table name
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
-    budget = db.Column(db.Float, default=0.0)
+    # Money is stored as integer cents; `budget` is the dollar view of it
+    budget_cents = db.Column(db.Integer, default=0)
+    budget = money_property('budget_cents')
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
     # Define relationship without backref or back_populates
     expenses = db.relationship('Expense', lazy=True, cascade="all, delete-orphan")
     
+    __table_args__ = (
+        db.Index('ix_categories_user_name', 'user_id', 'name'),
+    )
+    
     def __repr__(self):
         return f'<Category {self.name}>'
 
 class Expense(db.Model):
     __tablename__ = 'expenses'  # Explicitly set table name
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Float, nullable=False)
+    amount_cents = db.Column(db.Integer, nullable=False)
+    amount = money_property('amount_cents')
     description = db.Column(db.String(200), nullable=False)
     date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     source = db.Column(db.String(50), default='manual')
+    # Set for imported transactions so re-imports skip rows already present
+    fingerprint = db.Column(db.String(40), nullable=True)
     
     # Define relationship with foreign_keys to avoid ambiguity
     category = db.relationship('Category', foreign_keys=[category_id])
     
+    # Routes filter by user plus a date range or a category
+    __table_args__ = (
+        db.Index('ix_expenses_user_date', 'user_id', 'date'),
+        db.Index('ix_expenses_user_category_date', 'user_id', 'category_id', 'date'),
+        db.Index('ux_expenses_user_fingerprint', 'user_id', 'fingerprint', unique=True),
+    )
+    
+    @classmethod
+    def query_with_category(cls):
+        """Expense query that loads each expense's category in the same SELECT."""
+        return cls.query.options(db.joinedload(cls.category))
+    
     def __repr__(self):
         return f'<Expense {self.description} ${self.amount}>'
 
+class MerchantRule(db.Model):
+    __tablename__ = 'merchant_rules'  # Explicitly set table name
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # normalize_merchant() of the description the user recategorized
+    normalized_merchant = db.Column(db.String(200), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # One learned category per merchant and user
+    __table_args__ = (
+        db.Index('ux_merchant_rules_user_merchant', 'user_id', 'normalized_merchant', unique=True),
+    )
+    
+    def __repr__(self):
+        return f'<MerchantRule {self.normalized_merchant} -> {self.category_id}>'
+
+class ExpenseRollup(db.Model):
+    __tablename__ = 'expense_rollups'  # Explicitly set table name
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    day = db.Column(db.Integer, nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True)
+    total_cents = db.Column(db.Integer, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = money_property('total_cents')
+    
+    # One row per (user, day, category) bucket
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'year', 'month', 'day', 'category_id',
+                            name='uq_expense_rollups_bucket'),
+    )
+    
+    def __repr__(self):
+        return f'<ExpenseRollup {self.year}-{self.month:02d}-{self.day:02d} ${self.total}>'
+
 class Statement(db.Model):
     __tablename__ = 'statements'  # Explicitly set table name
     id = db.Column(db.Integer, primary_key=True)
@@ -61,12 +123,90 @@ class Statement(db.Model):
     upload_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     processed = db.Column(db.Boolean, default=False)
+    # SHA-256 of the uploaded file, the key into parsed_statements
+    sha256 = db.Column(db.String(64), nullable=True, index=True)
+    # Stage timings and counters of the last import (ImportMetrics.to_dict())
+    import_metrics = db.Column(db.JSON, nullable=True)
     
     user = db.relationship('User', backref=db.backref('statements', lazy=True))
     
     def __repr__(self):
         return f'<Statement {self.filename}>'
 
+class ParsedStatement(db.Model):
+    __tablename__ = 'parsed_statements'  # Explicitly set table name
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False)
+    # Results from an older parser are never reused
+    parser_version = db.Column(db.Integer, nullable=False)
+    transaction_count = db.Column(db.Integer, nullable=False)
+    transactions = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('sha256', 'parser_version', name='uq_parsed_statements_sha256_version'),
+    )
+    
+    def __repr__(self):
+        return f'<ParsedStatement {self.sha256[:12]} ({self.transaction_count} transactions)>'
+
+class ImportJob(db.Model):
+    __tablename__ = 'import_jobs'  # Explicitly set table name
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    statement_id = db.Column(db.Integer, db.ForeignKey('statements.id'), nullable=False)
+    batch_id = db.Column(db.String(32), nullable=True)  # shared by the files of one batch upload
+    filepath = db.Column(db.String(500), nullable=False)
+    source = db.Column(db.String(50), nullable=False, default='statement')
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'done', 'failed'
+    worker = db.Column(db.String(100), nullable=True)
+    backend = db.Column(db.String(20), nullable=True)  # parser that read the file, or 'cache'
+    total_pages = db.Column(db.Integer, nullable=True)
+    pages_done = db.Column(db.Integer, nullable=False, default=0)
+    imported = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)
+    duplicates = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    user = db.relationship('User', backref=db.backref('import_jobs', lazy=True))
+    statement = db.relationship('Statement', backref=db.backref('import_jobs', lazy=True))
+    
+    # Workers claim the oldest queued job
+    __table_args__ = (
+        db.Index('ix_import_jobs_status_id', 'status', 'id'),
+        db.Index('ix_import_jobs_batch_id', 'batch_id'),
+    )
+    
+    @property
+    def progress_percentage(self):
+        if self.status == 'done':
+            return 100
+        if not self.total_pages:
+            return 0
+        return min(99, int(self.pages_done / self.total_pages * 100))
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'batch_id': self.batch_id,
+            'status': self.status,
+            'filename': self.statement.filename,
+            'backend': self.backend,
+            'total_pages': self.total_pages,
+            'pages_done': self.pages_done,
+            'progress': self.progress_percentage,
+            'imported': self.imported,
+            'skipped': self.skipped,
+            'duplicates': self.duplicates,
+            'error': self.error
+        }
+    
+    def __repr__(self):
+        return f'<ImportJob {self.id} {self.status}>'
+
 class Reminder(db.Model):
     __tablename__ = 'reminders'  # Explicitly set table name
     id = db.Column(db.Integer, primary_key=True)
@@ -74,7 +214,8 @@ class Reminder(db.Model):
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     due_date = db.Column(db.DateTime, nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount_cents = db.Column(db.Integer, nullable=False)
+    amount = money_property('amount_cents')
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True)
     is_recurring = db.Column(db.Boolean, default=False)
     recurrence_type = db.Column(db.String(20), nullable=True)  # 'weekly', 'monthly', 'yearly'
@@ -84,6 +225,10 @@ class Reminder(db.Model):
     # Relationships
     user = db.relationship('User', backref=db.backref('reminders', lazy=True))
     category = db.relationship('Category', backref=db.backref('reminders', lazy=True))
+    
+    __table_args__ = (
+        db.Index('ix_reminders_user_completed_due', 'user_id', 'is_completed', 'due_date'),
+    )
 
 class FinancialGoal(db.Model):
     __tablename__ = 'financial_goals'  # Explicitly set table name
@@ -91,8 +236,10 @@ class FinancialGoal(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
-    target_amount = db.Column(db.Float, nullable=False)
-    current_amount = db.Column(db.Float, default=0.0)
+    target_amount_cents = db.Column(db.Integer, nullable=False)
+    current_amount_cents = db.Column(db.Integer, default=0)
+    target_amount = money_property('target_amount_cents')
+    current_amount = money_property('current_amount_cents')
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True)
     start_date = db.Column(db.DateTime, default=datetime.utcnow)
     target_date = db.Column(db.DateTime, nullable=False)
@@ -102,11 +249,15 @@ class FinancialGoal(db.Model):
     user = db.relationship('User', backref=db.backref('goals', lazy=True))
     category = db.relationship('Category', backref=db.backref('goals', lazy=True))
     
+    __table_args__ = (
+        db.Index('ix_financial_goals_user_completed_target', 'user_id', 'is_completed', 'target_date'),
+    )
+    
     @property
     def progress_percentage(self):
-        if self.target_amount == 0:
+        if not self.target_amount_cents:
             return 100
-        return min(100, (self.current_amount / self.target_amount) * 100)
+        return min(100, ((self.current_amount_cents or 0) / self.target_amount_cents) * 100)
     
     @property
     def days_remaining(self):
@@ -1,20 +1,35 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify
+from flask import Blueprint, render_template, stream_template, redirect, url_for, flash, request, current_app, jsonify
 from flask_login import login_user, current_user, logout_user, login_required
 from app import db
-from app.models import User, Expense, Category, Statement, Reminder, FinancialGoal
-from app.forms import RegistrationForm, LoginForm, ExpenseForm, StatementUploadForm, DateRangeForm, CategoryForm, ReminderForm, FinancialGoalForm
-from app.utils.pdf_extractor import extract_transactions_from_pdf
+from app.models import User, Expense, Category, Statement, Reminder, FinancialGoal, ImportJob
+from app.forms import RegistrationForm, LoginForm, ExpenseForm, StatementUploadForm, StatementBatchUploadForm, DateRangeForm, CategoryForm, ReminderForm, FinancialGoalForm
 from app.utils.expense_categorizer import categorize_expense
+from app.utils.import_jobs import enqueue_import, enqueue_import_batch
+from app.utils.statement_cache import save_upload, save_stream
+from app.utils.statement_formats import is_statement_file
+from app.utils.import_metrics import ImportMetrics
+from app.utils.merchant_rules import forget_category_rules, learn_merchant_rule
+from app.utils.expense_classifier import relabel_expense
+from app.utils.category_index import category_index
 from sqlalchemy import extract
 import os
+import uuid
+import zipfile
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 import json
 from app.utils.expense_analyzer import analyze_spending_patterns, get_ai_recommendations
+from app.utils.aggregates import ExpenseAggregates
+from app.utils.expense_frame import ExpenseFrame
+from app.utils.forecasting import generate_expense_forecast
 from app.utils.openai_advisor import get_openai_advice
 from collections import defaultdict
 from .utils.receipt_scanner import scan_receipt
 from .utils.financial_health import calculate_financial_health
+from .utils import rollups
+from .utils.query_budget import query_budget
+from .utils.analytics_cache import bump_data_version, cached_analytics
+from .utils.money import from_cents
 
 main_bp = Blueprint('main', __name__)
 auth_bp = Blueprint('auth', __name__)
@@ -99,62 +114,132 @@ def logout():
 # Expense routes
 @expense_bp.route('/dashboard')
 @login_required
+@query_budget(12)
 def dashboard():
     # Get existing dashboard data
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    today = datetime.now()
     
-    # Get all expenses and categories for the current user
-    all_expenses = Expense.query.filter_by(user_id=current_user.id).all()
+    # Get categories and grouped expense totals for the current user
     categories = Category.query.filter_by(user_id=current_user.id).all()
+    aggregates = ExpenseAggregates(current_user.id)
     
-    # Get insights and recommendations
-    insights = analyze_spending_patterns(all_expenses, categories)
-    recommendations = get_ai_recommendations(all_expenses, categories)
+    # Get insights and recommendations, cached until the user's data changes
+    insights, recommendations = cached_analytics('dashboard_insights', current_user, lambda: (
+        analyze_spending_patterns(aggregates, categories),
+        get_ai_recommendations(aggregates, categories)
+    ))
     
+    # Chart data comes from the pre-aggregated rollup table
     # Calculate monthly trends (last 6 months)
-    monthly_trends = {}
-    for i in range(6):
-        month = current_month - i
-        year = current_year
-        if month <= 0:
-            month += 12
-            year -= 1
-        
-        month_expenses = sum(e.amount for e in all_expenses 
-                           if e.date.month == month and e.date.year == year)
-        monthly_trends[f"{year}-{month:02d}"] = month_expenses
+    monthly_trends = rollups.monthly_totals(current_user.id, 6, today)
     
     # Calculate category-wise spending
+    category_totals = rollups.category_totals(current_user.id)
     category_spending = {}
     category_budget_usage = {}
     for category in categories:
-        total = sum(e.amount for e in all_expenses if e.category_id == category.id)
+        total = category_totals.get(category.id, 0)
         category_spending[category.name] = total
-        if category.budget > 0:
+        if (category.budget_cents or 0) > 0:
             category_budget_usage[category.name] = (total / category.budget) * 100
     
     # Calculate daily spending pattern
-    daily_spending = defaultdict(float)
-    for expense in all_expenses:
-        if expense.date.month == current_month and expense.date.year == current_year:
-            daily_spending[expense.date.day] += expense.amount
+    daily_spending = rollups.daily_totals(current_user.id, today.year, today.month)
     
     return render_template('dashboard.html',
                          categories=list(category_spending.keys()),
                          amounts=list(category_spending.values()),
                          monthly_trends=monthly_trends,
                          category_budget_usage=category_budget_usage,
-                         daily_spending=dict(daily_spending),
+                         daily_spending=daily_spending,
                          insights=insights,
                          recommendations=recommendations)
 
+EXPENSES_PER_PAGE = 50
+MAX_EXPENSES_PER_PAGE = 500
+
+def _parse_list_date(value):
+    """Parse a YYYY-MM-DD query parameter, returning None if missing or invalid."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d') if value else None
+    except ValueError:
+        return None
+
+def _encode_cursor(expense):
+    """Encode the (date, id) keyset position of an expense."""
+    return f"{expense.date.isoformat()}_{expense.id}"
+
+def _decode_cursor(cursor):
+    """Decode a cursor produced by _encode_cursor, returning None if invalid."""
+    try:
+        date_str, id_str = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(date_str), int(id_str)
+    except (AttributeError, ValueError):
+        return None
+
 @expense_bp.route('/expenses')
 @login_required
+@query_budget(4)
 def list_expenses():
-    expenses = Expense.query.filter_by(user_id=current_user.id)\
-        .order_by(Expense.date.desc()).all()
-    return render_template('expenses/list.html', expenses=expenses)
+    # Filters
+    category_id = request.args.get('category_id', type=int)
+    start_date = _parse_list_date(request.args.get('start_date'))
+    end_date = _parse_list_date(request.args.get('end_date'))
+    stream = request.args.get('stream', type=int) == 1
+    
+    query = Expense.query_with_category().filter(Expense.user_id == current_user.id)
+    if category_id:
+        query = query.filter(Expense.category_id == category_id)
+    if start_date:
+        query = query.filter(Expense.date >= start_date)
+    if end_date:
+        query = query.filter(Expense.date < end_date + timedelta(days=1))
+    
+    # Newest first, with id as a tie-breaker so the keyset is unique
+    query = query.order_by(Expense.date.desc(), Expense.id.desc())
+    
+    filters = {
+        'category_id': category_id or '',
+        'start_date': start_date.strftime('%Y-%m-%d') if start_date else '',
+        'end_date': end_date.strftime('%Y-%m-%d') if end_date else ''
+    }
+    categories = Category.query.filter_by(user_id=current_user.id).order_by(Category.name).all()
+    
+    if stream:
+        # Render rows as they are fetched so the full result set is never held in memory
+        return stream_template('expenses/list.html',
+                               expenses=query.yield_per(500),
+                               categories=categories,
+                               filters=filters,
+                               stream=True,
+                               next_cursor=None)
+    
+    per_page = min(request.args.get('per_page', EXPENSES_PER_PAGE, type=int), MAX_EXPENSES_PER_PAGE)
+    per_page = max(per_page, 1)
+    
+    # Keyset pagination: continue strictly after the last (date, id) seen
+    cursor = _decode_cursor(request.args.get('cursor'))
+    if cursor:
+        cursor_date, cursor_id = cursor
+        query = query.filter(db.or_(
+            Expense.date < cursor_date,
+            db.and_(Expense.date == cursor_date, Expense.id < cursor_id)
+        ))
+    
+    expenses = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(expenses) > per_page:
+        expenses = expenses[:per_page]
+        next_cursor = _encode_cursor(expenses[-1])
+    
+    return render_template('expenses/list.html',
+                         expenses=expenses,
+                         categories=categories,
+                         filters=filters,
+                         per_page=per_page,
+                         stream=False,
+                         next_cursor=next_cursor,
+                         is_first_page=cursor is None)
 
 @expense_bp.route('/expenses/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
@@ -171,12 +256,23 @@ def edit_expense(id):
     form.category_id.choices = [(c.id, c.name) for c in Category.query.all()]
     
     if form.validate_on_submit():
+        rollups.remove_from_rollups(expense)
+        previous_category_id = expense.category_id
+        previous_description = expense.description
         expense.amount = form.amount.data
         expense.description = form.description.data
         expense.date = form.date.data
         expense.category_id = form.category_id.data
+        rollups.add_to_rollups(expense)
+        # A category fix teaches imports where this merchant belongs
+        if expense.category_id != previous_category_id:
+            learn_merchant_rule(current_user.id, expense.description, expense.category_id)
+        bump_data_version(current_user.id)
         
         db.session.commit()
+        if expense.category_id != previous_category_id or expense.description != previous_description:
+            relabel_expense(current_user.id, expense.id, previous_description, previous_category_id,
+                            expense.description, expense.category_id)
         flash('Expense has been updated!', 'success')
         return redirect(url_for('expense.list_expenses'))
     
@@ -202,8 +298,13 @@ def delete_expense(id):
         flash('You do not have permission to delete this expense.', 'danger')
         return redirect(url_for('expense.list_expenses'))
     
+    rollups.remove_from_rollups(expense)
+    expense_id, description, category_id = expense.id, expense.description, expense.category_id
     db.session.delete(expense)
+    bump_data_version(current_user.id)
     db.session.commit()
+    # Take the expense's counts back out of the user's classifier
+    relabel_expense(current_user.id, expense_id, description, category_id, None, None)
     flash('Expense has been deleted!', 'success')
     return redirect(url_for('expense.list_expenses'))
 
@@ -223,6 +324,8 @@ def add_expense():
             user_id=current_user.id
         )
         db.session.add(expense)
+        rollups.add_to_rollups(expense)
+        bump_data_version(current_user.id)
         db.session.commit()
         flash('Expense added successfully!', 'success')
         return redirect(url_for('expense.list_expenses'))
@@ -244,6 +347,7 @@ def add_category():
     if form.validate_on_submit():
         category = Category(name=form.name.data, budget=form.budget.data)
         db.session.add(category)
+        bump_data_version(current_user.id)
         db.session.commit()
         flash('Category added successfully!', 'success')
         return redirect(url_for('expense.list_categories'))
@@ -258,6 +362,7 @@ def edit_category(id):
     if form.validate_on_submit():
         category.name = form.name.data
         category.budget = form.budget.data
+        bump_data_version(category.user_id)
         db.session.commit()
         flash('Category has been updated!', 'success')
         return redirect(url_for('expense.list_categories'))
@@ -280,84 +385,154 @@ def delete_category(id):
         flash('Cannot delete category with existing expenses. Please reassign or delete the expenses first.', 'danger')
         return redirect(url_for('expense.list_categories'))
     
+    rollups.clear_category_rollups(category.id)
+    forget_category_rules(category.id)
     db.session.delete(category)
+    bump_data_version(category.user_id)
     db.session.commit()
     flash('Category has been deleted!', 'success')
     return redirect(url_for('expense.list_categories'))
 
+def _queue_statement_import(statement_file, source):
+    """Save an uploaded statement and queue its import job."""
+    filename = secure_filename(statement_file.filename)
+    # Prefix the stored file so queued uploads with the same name don't collide
+    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], f'{uuid.uuid4().hex}_{filename}')
+    metrics = ImportMetrics()
+    with metrics.stage('save'):
+        sha256 = save_upload(statement_file, filepath)
+    metrics.count('bytes', os.path.getsize(filepath))
+    
+    statement = Statement(filename=filename, user_id=current_user.id, sha256=sha256,
+                          import_metrics=metrics.to_dict())
+    db.session.add(statement)
+    return enqueue_import(current_user.id, statement, filepath, source)
+
 @expense_bp.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload_statement():
     form = StatementUploadForm()
     if form.validate_on_submit():
         try:
-            # Save and process file
-            statement_file = form.statement.data
-            filename = secure_filename(statement_file.filename)
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            statement_file.save(filepath)
+            # Transactions already imported from an earlier statement are skipped
+            job = _queue_statement_import(form.statement.data, 'Bank Statement')
             
-            # Delete all existing expenses for the current user
-            try:
-                Expense.query.filter_by(user_id=current_user.id).delete()
-                db.session.commit()
-            except Exception as e:
-                db.session.rollback()
-                flash('Error clearing previous expenses.', 'danger')
+            if job.status == 'done':
+                if job.imported > 0:
+                    flash(f'Successfully imported {job.imported} new transactions '
+                          f'({job.duplicates} were already imported)!', 'success')
+                else:
+                    flash('No new transactions found in the statement.', 'info')
                 return redirect(url_for('expense.dashboard'))
+            elif job.status == 'failed':
+                flash(f'Error processing statement: {job.error}', 'danger')
+            else:
+                flash('Statement uploaded. New transactions will appear once the import finishes.', 'info')
+            return redirect(url_for('expense.upload_statement', job=job.id))
             
-            # Process new transactions
-            transactions = extract_transactions_from_pdf(filepath)
-            successful_imports = 0
-            
-            for transaction in transactions:
-                # Skip zero amount transactions
-                if transaction['amount'] == 0:
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error processing statement: {str(e)}', 'danger')
+    
+    return render_template('upload.html', form=form, job_id=request.args.get('job', type=int))
+
+@expense_bp.route('/import-jobs/<int:id>')
+@login_required
+def import_job_status(id):
+    job = ImportJob.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+    return jsonify(job.to_dict())
+
+def _statement_uploads(files):
+    """
+    Yield (filename, stream) for every statement in a batch upload, unpacking
+    zip files. Zip members that are not statements, or are larger than a
+    single upload may be, are skipped.
+    """
+    max_size = current_app.config['MAX_CONTENT_LENGTH']
+    for upload in files:
+        filename = secure_filename(upload.filename)
+        if not filename.lower().endswith('.zip'):
+            yield filename, upload.stream
+            continue
+        with zipfile.ZipFile(upload.stream) as archive:
+            for member in archive.infolist():
+                member_name = secure_filename(os.path.basename(member.filename))
+                if member.is_dir() or not is_statement_file(member_name) or member.file_size > max_size:
                     continue
-                
-                # Determine final amount based on transaction type
-                final_amount = transaction['amount']
-                if transaction['type'] == 'payment':
-                    final_amount = -final_amount
-                
-                # Categorize the transaction
-                category_name = categorize_expense(transaction['description'])
-                category = Category.query.filter_by(name=category_name).first()
-                if not category:
-                    category = Category.query.filter_by(name='Miscellaneous').first()
-                
-                # Create new expense
-                expense = Expense(
-                    amount=final_amount,
-                    description=transaction['description'],
-                    date=transaction['date'],
-                    category_id=category.id,
-                    user_id=current_user.id,
-                    source='Bank Statement'
-                )
-                db.session.add(expense)
-                successful_imports += 1
-            
-            db.session.commit()
+                with archive.open(member) as stream:
+                    yield member_name, stream
+
+def _queue_statement_batch(files, source):
+    """Save every statement of a batch upload and queue them as one import batch."""
+    max_files = current_app.config['IMPORT_BATCH_MAX_FILES']
+    uploads = []
+    try:
+        for filename, stream in _statement_uploads(files):
+            if len(uploads) == max_files:
+                raise ValueError(f'A batch upload can hold at most {max_files} statements.')
+            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], f'{uuid.uuid4().hex}_{filename}')
+            metrics = ImportMetrics()
+            with metrics.stage('save'):
+                sha256 = save_stream(stream, filepath)
+            metrics.count('bytes', os.path.getsize(filepath))
+            statement = Statement(filename=filename, user_id=current_user.id, sha256=sha256,
+                                  import_metrics=metrics.to_dict())
+            db.session.add(statement)
+            uploads.append((statement, filepath))
+        if not uploads:
+            raise ValueError('No statements found in the upload.')
+    except Exception:
+        for statement, filepath in uploads:
             os.remove(filepath)
+        raise
+    return enqueue_import_batch(current_user.id, uploads, source)
+
+@expense_bp.route('/upload-batch', methods=['GET', 'POST'])
+@login_required
+def upload_statement_batch():
+    form = StatementBatchUploadForm()
+    if form.validate_on_submit():
+        try:
+            jobs = _queue_statement_batch(form.statements.data, 'Bank Statement')
             
-            if successful_imports > 0:
-                flash(f'Successfully cleared previous transactions and imported {successful_imports} new transactions!', 'success')
+            if all(job.status in ('done', 'failed') for job in jobs):
+                done = [job for job in jobs if job.status == 'done']
+                imported = sum(job.imported for job in done)
+                flash(f'Imported {imported} new transactions from {len(done)} of {len(jobs)} statements.',
+                      'success' if done else 'danger')
             else:
-                flash('No new transactions found in the statement.', 'info')
-            
-            return redirect(url_for('expense.dashboard'))
+                flash(f'{len(jobs)} statements uploaded. New transactions will appear once the import finishes.', 'info')
+            return redirect(url_for('expense.upload_statement_batch', batch=jobs[0].batch_id))
             
+        except (ValueError, zipfile.BadZipFile) as e:
+            db.session.rollback()
+            flash(f'Error processing statements: {str(e)}', 'danger')
         except Exception as e:
             db.session.rollback()
-            flash(f'Error processing statement: {str(e)}', 'danger')
-            if os.path.exists(filepath):
-                os.remove(filepath)
+            current_app.logger.error(f"Error processing statement batch: {e}")
+            flash('Error processing statements. Please try again.', 'danger')
     
-    return render_template('upload.html', form=form)
+    return render_template('upload_batch.html', form=form, batch_id=request.args.get('batch'))
+
+@expense_bp.route('/import-batches/<batch_id>')
+@login_required
+def import_batch_status(batch_id):
+    jobs = ImportJob.query.options(db.joinedload(ImportJob.statement)).filter_by(
+        batch_id=batch_id, user_id=current_user.id
+    ).order_by(ImportJob.id).all()
+    if not jobs:
+        return jsonify({'error': 'Import batch not found'}), 404
+    return jsonify({
+        'batch_id': batch_id,
+        'finished': all(job.status in ('done', 'failed') for job in jobs),
+        'imported': sum(job.imported for job in jobs),
+        'duplicates': sum(job.duplicates for job in jobs),
+        'jobs': [job.to_dict() for job in jobs]
+    })
 
 @expense_bp.route('/reports', methods=['GET', 'POST'])
 @login_required
+@query_budget(6)
 def reports():
     form = DateRangeForm()
     
@@ -366,7 +541,7 @@ def reports():
         end_date = form.end_date.data
         
         # Get expenses in date range
-        expenses = Expense.query.filter(
+        expenses = Expense.query_with_category().filter(
             Expense.user_id == current_user.id,
             Expense.date >= start_date,
             Expense.date <= end_date
@@ -374,7 +549,7 @@ def reports():
         
         # Get expense summary by category
         expenses_by_category = db.session.query(
-            Category.name, db.func.sum(Expense.amount)
+            Category.name, db.func.sum(Expense.amount_cents)
         ).join(Expense).filter(
             Expense.user_id == current_user.id,
             Expense.date >= start_date,
@@ -382,11 +557,11 @@ def reports():
         ).group_by(Category.name).all()
         
         categories = [cat[0] for cat in expenses_by_category]
-        amounts = [float(cat[1]) for cat in expenses_by_category]
+        amounts = [from_cents(cat[1]) for cat in expenses_by_category]
         
         # Get daily expenses for line chart
         daily_expenses = db.session.query(
-            db.func.date(Expense.date), db.func.sum(Expense.amount)
+            db.func.date(Expense.date), db.func.sum(Expense.amount_cents)
         ).filter(
             Expense.user_id == current_user.id,
             Expense.date >= start_date,
@@ -394,7 +569,7 @@ def reports():
         ).group_by(db.func.date(Expense.date)).all()
         
         dates = [str(day[0]) for day in daily_expenses]
-        daily_amounts = [float(day[1]) for day in daily_expenses]
+        daily_amounts = [from_cents(day[1]) for day in daily_expenses]
         
         return render_template(
             'reports.html',
@@ -417,6 +592,7 @@ def reports():
 
 @expense_bp.route('/get-ai-advice', methods=['POST'])
 @login_required
+@query_budget(4)
 def get_ai_advice():
     try:
         print("AI advice route accessed")
@@ -438,14 +614,14 @@ def get_ai_advice():
             
         print(f"User question: {user_question}")
         
-        # Get all expenses and categories for the current user
-        expenses = Expense.query.filter_by(user_id=current_user.id).order_by(Expense.date.desc()).all()
+        # Load the user's expenses as a columnar frame and their categories
+        frame = ExpenseFrame.for_user(current_user.id)
         categories = Category.query.filter_by(user_id=current_user.id).all()
         
-        print(f"Found {len(expenses)} expenses and {len(categories)} categories")
+        print(f"Found {frame.count} expenses and {len(categories)} categories")
         
         # Get OpenAI advice directly
-        ai_advice = get_openai_advice(expenses, categories, user_question)
+        ai_advice = get_openai_advice(frame, categories, user_question)
         
         if not ai_advice:
             print("No advice was generated")
@@ -476,102 +652,40 @@ def process_statement():
         if form.validate_on_submit():
             file = form.statement.data
             if file:
-                # Save the file
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
-                
-                # Extract transactions
-                transactions = extract_transactions_from_pdf(filepath)
-                successful_imports = 0
-                
-                # Ensure "Other" category exists
-                other_category = Category.query.filter_by(
-                    name='Other',
-                    user_id=current_user.id
-                ).first()
-                
-                if not other_category:
-                    other_category = Category(
-                        name='Other',
-                        budget=200.0,
-                        user_id=current_user.id
-                    )
-                    db.session.add(other_category)
-                    db.session.commit()
-                    print("Created 'Other' category")
+                job = _queue_statement_import(file, 'statement')
                 
-                # Process each transaction
-                for transaction in transactions:
-                    try:
-                        # Get category
-                        category_name = categorize_expense(transaction['description'])
-                        category = Category.query.filter_by(
-                            name=category_name,
-                            user_id=current_user.id
-                        ).first()
-                        
-                        # If category doesn't exist, use "Other"
-                        if not category:
-                            print(f"Category {category_name} not found, using Other")
-                            category = other_category
-                        
-                        if not category or not category.id:
-                            print("Error: Invalid category")
-                            continue
-                        
-                        # Create expense
-                        final_amount = transaction['amount']
-                        if transaction.get('type', '').lower() == 'payment':
-                            final_amount = -final_amount
-                        
-                        expense = Expense(
-                            amount=final_amount,
-                            description=transaction['description'],
-                            date=transaction['date'],
-                            category_id=category.id,
-                            user_id=current_user.id,
-                            source='statement'
-                        )
-                        db.session.add(expense)
-                        db.session.commit()
-                        successful_imports += 1
-                        print(f"Successfully imported transaction: {transaction['description']}")
-                            
-                    except Exception as e:
-                        print(f"Error processing transaction: {str(e)}")
-                        db.session.rollback()
-                        continue
-                
-                # Clean up the uploaded file
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                
-                if successful_imports > 0:
-                    flash(f'Successfully imported {successful_imports} transactions!', 'success')
+                if job.status == 'done':
+                    if job.imported > 0:
+                        flash(f'Successfully imported {job.imported} transactions!', 'success')
+                    else:
+                        flash('No transactions were imported. Please check the statement format.', 'warning')
+                    return redirect(url_for('expense.list_expenses'))
+                elif job.status == 'failed':
+                    flash('Error processing statement. Please try again.', 'danger')
                 else:
-                    flash('No transactions were imported. Please check the statement format.', 'warning')
-                
-                return redirect(url_for('expense.list_expenses'))
+                    flash('Statement uploaded. Its transactions will appear once the import finishes.', 'info')
+                return redirect(url_for('expense.upload_statement', job=job.id))
                 
         flash('Error processing statement. Please try again.', 'danger')
         return redirect(url_for('expense.upload_statement'))
         
     except Exception as e:
-        print(f"Error processing statement: {str(e)}")
+        db.session.rollback()
+        current_app.logger.error(f"Error processing statement: {e}")
         flash('Error processing statement. Please try again.', 'danger')
         return redirect(url_for('expense.upload_statement'))
 
 # Reminder routes
 @expense_bp.route('/reminders')
 @login_required
+@query_budget(4)
 def reminders():
-    upcoming_reminders = Reminder.query.filter_by(
+    upcoming_reminders = Reminder.query.options(db.joinedload(Reminder.category)).filter_by(
         user_id=current_user.id, 
         is_completed=False
     ).order_by(Reminder.due_date).all()
     
-    completed_reminders = Reminder.query.filter_by(
+    completed_reminders = Reminder.query.options(db.joinedload(Reminder.category)).filter_by(
         user_id=current_user.id, 
         is_completed=True
     ).order_by(Reminder.due_date.desc()).limit(5).all()
@@ -580,6 +694,7 @@ def reminders():
         'expenses/reminders.html', 
         upcoming_reminders=upcoming_reminders,
         completed_reminders=completed_reminders,
+        today=datetime.now(),
         title="Payment Reminders"
     )
 
@@ -604,6 +719,7 @@ def add_reminder():
             recurrence_type=form.recurrence_type.data if form.is_recurring.data else None
         )
         db.session.add(reminder)
+        bump_data_version(current_user.id)
         db.session.commit()
         flash('Reminder added successfully!', 'success')
         return redirect(url_for('expense.reminders'))
@@ -631,6 +747,7 @@ def edit_reminder(id):
         reminder.category_id = category_id
         reminder.is_recurring = form.is_recurring.data
         reminder.recurrence_type = form.recurrence_type.data if form.is_recurring.data else None
+        bump_data_version(current_user.id)
         
         db.session.commit()
         flash('Reminder updated successfully!', 'success')
@@ -676,6 +793,7 @@ def toggle_reminder(id):
             )
             db.session.add(new_reminder)
     
+    bump_data_version(current_user.id)
     db.session.commit()
     return jsonify({'success': True, 'completed': reminder.is_completed})
 
@@ -687,6 +805,7 @@ def delete_reminder(id):
         abort(403)
         
     db.session.delete(reminder)
+    bump_data_version(current_user.id)
     db.session.commit()
     flash('Reminder deleted successfully!', 'success')
     return redirect(url_for('expense.reminders'))
@@ -737,6 +856,7 @@ def add_goal():
             goal.is_completed = True
             
         db.session.add(goal)
+        bump_data_version(current_user.id)
         db.session.commit()
         flash('Financial goal added successfully!', 'success')
         return redirect(url_for('expense.goals'))
@@ -769,6 +889,7 @@ def edit_goal(id):
             goal.is_completed = True
         else:
             goal.is_completed = False
+        bump_data_version(current_user.id)
             
         db.session.commit()
         flash('Financial goal updated successfully!', 'success')
@@ -791,6 +912,7 @@ def update_goal_progress(id):
             
             if goal.current_amount >= goal.target_amount:
                 goal.is_completed = True
+            bump_data_version(current_user.id)
                 
             db.session.commit()
             return jsonify({
@@ -812,6 +934,7 @@ def delete_goal(id):
         abort(403)
         
     db.session.delete(goal)
+    bump_data_version(current_user.id)
     db.session.commit()
     flash('Financial goal deleted successfully!', 'success')
     return redirect(url_for('expense.goals'))
@@ -819,19 +942,23 @@ def delete_goal(id):
 # Expense Forecasting
 @expense_bp.route('/forecast')
 @login_required
+@query_budget(6)
 def forecast():
-    # Get all expenses for the current user
-    expenses = Expense.query.filter_by(user_id=current_user.id).all()
-    categories = Category.query.filter_by(user_id=current_user.id).all()
-    
-    # Get upcoming reminders
-    upcoming_reminders = Reminder.query.filter_by(
-        user_id=current_user.id, 
-        is_completed=False
-    ).order_by(Reminder.due_date).all()
+    def compute_forecast():
+        # Load the user's expenses as a columnar frame
+        frame = ExpenseFrame.for_user(current_user.id)
+        categories = Category.query.filter_by(user_id=current_user.id).all()
+        
+        # Get upcoming reminders
+        upcoming_reminders = Reminder.query.filter_by(
+            user_id=current_user.id, 
+            is_completed=False
+        ).order_by(Reminder.due_date).all()
+        
+        return generate_expense_forecast(frame, categories, upcoming_reminders)
     
-    # Generate forecast data
-    forecast_data = generate_expense_forecast(expenses, categories, upcoming_reminders)
+    # Generate forecast data, cached until the user's data changes
+    forecast_data = cached_analytics('forecast', current_user, compute_forecast)
     
     return render_template(
         'expenses/forecast.html',
@@ -868,7 +995,7 @@ def scan_receipt():
             
         if file:
             # Get user categories
-            categories = Category.query.filter_by(user_id=current_user.id).all()
+            categories = category_index(current_user)
             
             # Create uploads directory if it doesn't exist
             upload_folder = current_app.config['UPLOAD_FOLDER']
@@ -920,18 +1047,22 @@ def add_expense_from_receipt():
 
 @expense_bp.route('/financial-health')
 @login_required
+@query_budget(9)
 def financial_health():
-    # Get user data
-    expenses = Expense.query.filter_by(user_id=current_user.id).all()
-    categories = Category.query.filter_by(user_id=current_user.id).all()
-    goals = FinancialGoal.query.filter_by(user_id=current_user.id).all()
-    reminders = Reminder.query.filter_by(user_id=current_user.id).all()
+    def compute_health():
+        # Get user data
+        frame = ExpenseFrame.for_user(current_user.id)
+        categories = Category.query.filter_by(user_id=current_user.id).all()
+        goals = FinancialGoal.query.filter_by(user_id=current_user.id).all()
+        reminders = Reminder.query.filter_by(user_id=current_user.id).all()
+        
+        return calculate_financial_health(frame, categories, goals, reminders)
     
-    # Calculate financial health
-    health = calculate_financial_health(expenses, categories, goals, reminders)
+    # Calculate financial health, cached until the user's data changes
+    health = cached_analytics('financial_health', current_user, compute_health)
     
     # Get recent expenses
-    recent_expenses = Expense.query.filter_by(user_id=current_user.id).order_by(Expense.date.desc()).limit(5).all()
+    recent_expenses = Expense.query_with_category().filter_by(user_id=current_user.id).order_by(Expense.date.desc()).limit(5).all()
     
     # Get upcoming reminders
     upcoming_reminders = Reminder.query.filter_by(user_id=current_user.id, is_completed=False).order_by(Reminder.due_date).limit(5).all()
@@ -0,0 +1,103 @@
+from datetime import datetime
+from app import db
+from app.models import Expense
+from .money import from_cents, to_cents
+
+def month_bounds(year, month):
+    """Return the first day of a month and the first day of the next one."""
+    start = datetime(year, month, 1)
+    if month == 12:
+        return start, datetime(year + 1, 1, 1)
+    return start, datetime(year, month + 1, 1)
+
+class ExpenseAggregates:
+    """
+    Grouped SQL aggregates over a user's expenses.
+
+    Every method runs a single GROUP BY query, so the cost on the web worker
+    depends on the number of groups rather than the number of expenses.
+    Sums run over the integer cents column and are converted to dollars
+    once per group. Date filters use an inclusive `start` and an exclusive `end`.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._results = {}
+
+    def _memoized(self, name, query_fn, *args):
+        # Analyzers often ask for the same grouping more than once per request
+        key = (name,) + args
+        if key not in self._results:
+            self._results[key] = query_fn(*args)
+        return self._results[key]
+
+    def _filtered(self, query, start=None, end=None):
+        query = query.filter(Expense.user_id == self.user_id)
+        if start is not None:
+            query = query.filter(Expense.date >= start)
+        if end is not None:
+            query = query.filter(Expense.date < end)
+        return query
+
+    def totals(self, start=None, end=None):
+        """Return (total, count) for all matching expenses."""
+        total_cents, count = self._filtered(
+            db.session.query(db.func.sum(Expense.amount_cents), db.func.count(Expense.id)),
+            start, end
+        ).one()
+        return (from_cents(total_cents or 0), count)
+
+    def by_category(self, start=None, end=None):
+        """Return {category_id: (total, count)}."""
+        return self._memoized('by_category', self._by_category, start, end)
+
+    def _by_category(self, start, end):
+        rows = self._filtered(
+            db.session.query(Expense.category_id, db.func.sum(Expense.amount_cents), db.func.count(Expense.id)),
+            start, end
+        ).group_by(Expense.category_id).all()
+        return {category_id: (from_cents(total_cents), count) for category_id, total_cents, count in rows}
+
+    def by_month(self, start=None, end=None):
+        """Return {(year, month): (total, count)}."""
+        year = db.extract('year', Expense.date)
+        month = db.extract('month', Expense.date)
+        rows = self._filtered(
+            db.session.query(year, month, db.func.sum(Expense.amount_cents), db.func.count(Expense.id)),
+            start, end
+        ).group_by(year, month).all()
+        return {(int(y), int(m)): (from_cents(total_cents), count) for y, m, total_cents, count in rows}
+
+    def by_day(self, start=None, end=None):
+        """Return {(year, month, day): (total, count)}."""
+        year = db.extract('year', Expense.date)
+        month = db.extract('month', Expense.date)
+        day = db.extract('day', Expense.date)
+        rows = self._filtered(
+            db.session.query(year, month, day, db.func.sum(Expense.amount_cents), db.func.count(Expense.id)),
+            start, end
+        ).group_by(year, month, day).all()
+        return {(int(y), int(m), int(d)): (from_cents(total_cents), count) for y, m, d, total_cents, count in rows}
+
+    def small_expenses(self, threshold, start=None, end=None):
+        """Return (total, count) for expenses below `threshold`."""
+        total_cents, count = self._filtered(
+            db.session.query(db.func.sum(Expense.amount_cents), db.func.count(Expense.id)),
+            start, end
+        ).filter(Expense.amount_cents < to_cents(threshold)).one()
+        return (from_cents(total_cents or 0), count)
+
+    def recurring(self, min_count, start=None, end=None):
+        """
+        Return [(description, amount, count)] for description/amount pairs
+        that occur at least `min_count` times, in order of first occurrence.
+        """
+        rows = self._filtered(
+            db.session.query(Expense.description, Expense.amount_cents, db.func.count(Expense.id)),
+            start, end
+        ).group_by(
+            Expense.description, Expense.amount_cents
+        ).having(
+            db.func.count(Expense.id) >= min_count
+        ).order_by(db.func.min(Expense.id)).all()
+        return [(description, from_cents(amount_cents), count) for description, amount_cents, count in rows]
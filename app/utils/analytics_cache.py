@@ -0,0 +1,146 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from flask import current_app
+from app.models import User
+
+class TTLCache:
+    """Thread-safe in-process LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class DiskCache:
+    """
+    Local on-disk cache in a SQLite file, so several worker processes on the
+    same machine share computed results. Values are pickled.
+    """
+
+    def __init__(self, directory, max_entries=4096, ttl=300):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'analytics_cache.db')
+        self.max_entries = max_entries
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache '
+                         '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def get(self, key):
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None or row[1] < time.time():
+            return None
+        return pickle.loads(row[0])
+
+    def set(self, key, value):
+        try:
+            with self._connect() as conn:
+                conn.execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                             (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), time.time() + self.ttl))
+                # Keep the file bounded: drop expired rows, then the oldest overflow
+                conn.execute('DELETE FROM cache WHERE expires < ?', (time.time(),))
+                conn.execute('DELETE FROM cache WHERE key NOT IN '
+                             '(SELECT key FROM cache ORDER BY expires DESC LIMIT ?)', (self.max_entries,))
+        except sqlite3.Error as e:
+            current_app.logger.warning(f"Analytics disk cache write failed: {e}")
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache')
+
+class AnalyticsCache:
+    """Two-level cache: the in-process LRU in front of an optional disk backend."""
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+def init_analytics_cache(app):
+    """Create the analytics cache described by the ANALYTICS_CACHE_* settings."""
+    ttl = app.config.get('ANALYTICS_CACHE_TTL', 300)
+    memory = TTLCache(app.config.get('ANALYTICS_CACHE_SIZE', 256), ttl)
+    disk = None
+    if app.config.get('ANALYTICS_CACHE_DIR'):
+        disk = DiskCache(app.config['ANALYTICS_CACHE_DIR'], ttl=ttl)
+    app.extensions['analytics_cache'] = AnalyticsCache(memory, disk)
+
+def bump_data_version(user_id):
+    """
+    Invalidate a user's cached analytics by bumping their data version.
+    Runs in the current session, so it commits together with the write.
+    """
+    User.query.filter_by(id=user_id).update(
+        {User.data_version: User.data_version + 1}, synchronize_session=False
+    )
+
+def cached_analytics(name, user, compute):
+    """
+    Return compute() for `user`, cached under the user's current data version.
+    Keys also include today's date because the analytics depend on it.
+    """
+    cache = current_app.extensions.get('analytics_cache')
+    if cache is None:
+        return compute()
+
+    key = f"{name}:{user.id}:{user.data_version or 0}:{date.today().isoformat()}"
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value)
+    return value
@@ -0,0 +1,122 @@
+import re
+import threading
+from collections import OrderedDict
+from app import db
+from app.models import Category
+
+# Other names for the default categories, casefolded, so a lookup by either
+# name finds the user's category
+CATEGORY_ALIASES = {
+    'grocery': 'groceries',
+    'restaurants': 'dining',
+    'food & dining': 'dining',
+    'transport': 'transportation',
+    'bills': 'utilities',
+    'bills & utilities': 'utilities',
+    'health': 'healthcare',
+    'medical': 'healthcare',
+    'misc': 'other',
+    'miscellaneous': 'other',
+    'uncategorized': 'other',
+}
+
+_WORD = re.compile(r'\w+')
+
+def _canonical(name):
+    key = name.casefold().strip()
+    return CATEGORY_ALIASES.get(key, key)
+
+class CategoryIndex:
+    """
+    A user's categories indexed by name, so resolving a category name to its
+    id is a dict lookup instead of a query or a scan of every category.
+
+    exact() only finds the exact name. get() also tries the name ignoring
+    case, then its alias in CATEGORY_ALIASES. match(), for names that come
+    from the keyword tables, also falls back to a single word of a category
+    name ('health' finds 'Health & Fitness'). Where several categories
+    share a key the one created first wins. `categories` are (id, name)
+    pairs.
+    """
+
+    def __init__(self, categories=()):
+        self.ids = set()
+        self.default_id = None
+        self._exact = {}
+        self._casefold = {}
+        self._canonical = {}
+        self._words = {}
+        for category_id, name in categories:
+            self.add(category_id, name)
+
+    @classmethod
+    def for_user(cls, user_id):
+        """Build the index of a user's categories with one query."""
+        return cls(db.session.query(Category.id, Category.name)
+                             .filter(Category.user_id == user_id)
+                             .order_by(Category.id))
+
+    def add(self, category_id, name):
+        self.ids.add(category_id)
+        if self.default_id is None:
+            self.default_id = category_id
+        self._exact.setdefault(name, category_id)
+        self._casefold.setdefault(name.casefold().strip(), category_id)
+        self._canonical.setdefault(_canonical(name), category_id)
+        for word in _WORD.findall(name.casefold()):
+            self._words.setdefault(word, category_id)
+            self._words.setdefault(CATEGORY_ALIASES.get(word, word), category_id)
+
+    def exact(self, name, default=None):
+        """Return the id of the user's category named exactly `name`, or `default`."""
+        return self._exact.get(name, default)
+
+    def get(self, name, default=None):
+        """Return the id of the user's category called `name` or an alias of it, or `default`."""
+        category_id = self._exact.get(name)
+        if category_id is None:
+            key = name.casefold().strip()
+            category_id = self._casefold.get(key) or self._canonical.get(CATEGORY_ALIASES.get(key, key))
+        return default if category_id is None else category_id
+
+    def match(self, name, default=None):
+        """
+        get(), falling back to a category with `name` as one of its words.
+        Only for keyword-derived names: a word match would file rows for
+        'Other' under a category like 'Other Bills'.
+        """
+        category_id = self.get(name)
+        if category_id is None:
+            category_id = self._words.get(name.casefold().strip())
+        return default if category_id is None else category_id
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __len__(self):
+        return len(self.ids)
+
+# Recently used indexes by user id, with the data version they were built at
+_indexes = OrderedDict()
+_lock = threading.Lock()
+MAX_CACHED_INDEXES = 256
+
+def category_index(user):
+    """
+    Return the CategoryIndex of `user`, reusing the one built for their
+    current data version. Adding, editing or deleting a category bumps the
+    version (see bump_data_version), which invalidates the cached index.
+    """
+    version = user.data_version or 0
+    with _lock:
+        cached = _indexes.get(user.id)
+        if cached is not None and cached[0] == version:
+            _indexes.move_to_end(user.id)
+            return cached[1]
+    index = CategoryIndex.for_user(user.id)
+    with _lock:
+        _indexes[user.id] = (version, index)
+        _indexes.move_to_end(user.id)
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+    return index
@@ -2,16 +2,21 @@ from datetime import datetime, timedelta
 from collections import defaultdict
 import numpy as np
 from sqlalchemy import extract
+from .aggregates import month_bounds
 
-def analyze_spending_patterns(expenses, categories):
-    """Analyze spending patterns and provide AI-powered insights."""
+def analyze_spending_patterns(aggregates, categories):
+    """
+    Analyze spending patterns and provide AI-powered insights.
+    `aggregates` is an ExpenseAggregates for the user.
+    """
     insights = []
+    category_names = {category.id: category.name for category in categories}
     
     # Group expenses by category
     category_spending = defaultdict(float)
-    for expense in expenses:
-        category_name = expense.category.name if expense.category else "Uncategorized"
-        category_spending[category_name] += expense.amount
+    for category_id, (total, count) in aggregates.by_category().items():
+        category_name = category_names.get(category_id, "Uncategorized")
+        category_spending[category_name] += total
     
     # Calculate total spending
     total_spending = sum(category_spending.values())
@@ -30,10 +35,12 @@ def analyze_spending_patterns(expenses, categories):
     current_month = datetime.now().month
     current_year = datetime.now().year
     
-    monthly_expenses = defaultdict(float)
-    for expense in expenses:
-        if expense.date.year == current_year:
-            monthly_expenses[expense.date.month] += expense.amount
+    monthly_expenses = {
+        month: total
+        for (year, month), (total, count) in aggregates.by_month(
+            start=datetime(current_year, 1, 1), end=datetime(current_year + 1, 1, 1)
+        ).items()
+    }
     
     # Check for significant month-over-month changes
     if len(monthly_expenses) >= 2:
@@ -53,13 +60,12 @@ def analyze_spending_patterns(expenses, categories):
                 })
     
     # Provide budget-based insights
+    month_start, month_end = month_bounds(current_year, current_month)
+    current_month_spending = aggregates.by_category(start=month_start, end=month_end)
     for category in categories:
-        monthly_spending = sum(e.amount for e in expenses 
-                             if e.category_id == category.id 
-                             and e.date.month == current_month
-                             and e.date.year == current_year)
+        monthly_spending = current_month_spending.get(category.id, (0, 0))[0]
         
-        if category.budget > 0:
+        if (category.budget_cents or 0) > 0:
             budget_percentage = (monthly_spending / category.budget) * 100
             if budget_percentage > 90:
                 insights.append({
@@ -74,46 +80,43 @@ def analyze_spending_patterns(expenses, categories):
     
     return insights
 
-def get_ai_recommendations(expenses, categories):
-    """Generate AI-powered recommendations based on spending patterns."""
+def get_ai_recommendations(aggregates, categories):
+    """
+    Generate AI-powered recommendations based on spending patterns.
+    `aggregates` is an ExpenseAggregates for the user.
+    """
     recommendations = []
     
     # Analyze frequent small expenses
-    small_expenses = [e for e in expenses if e.amount < 20]
-    if len(small_expenses) > 10:
-        total_small = sum(e.amount for e in small_expenses)
+    total_small, small_count = aggregates.small_expenses(20)
+    if small_count > 10:
         recommendations.append({
             'type': 'tip',
-            'message': f'You have {len(small_expenses)} small expenses totaling ${total_small:.2f}. Consider tracking these closely as they can add up quickly.'
+            'message': f'You have {small_count} small expenses totaling ${total_small:.2f}. Consider tracking these closely as they can add up quickly.'
         })
     
     # Analyze category-specific patterns
+    category_spending = aggregates.by_category()
     for category in categories:
-        cat_expenses = [e for e in expenses if e.category_id == category.id]
-        if len(cat_expenses) > 0:
-            avg_amount = sum(e.amount for e in cat_expenses) / len(cat_expenses)
+        total, count = category_spending.get(category.id, (0, 0))
+        if count > 0:
+            avg_amount = total / count
             if category.name == 'Dining' and avg_amount > 50:
                 recommendations.append({
                     'type': 'saving',
                     'message': 'Your average dining expense is high. Consider meal prepping or looking for dining deals.'
                 })
-            elif category.name == 'Transportation' and len(cat_expenses) > 20:
+            elif category.name == 'Transportation' and count > 20:
                 recommendations.append({
                     'type': 'saving',
                     'message': 'You have frequent transportation expenses. Consider getting a monthly pass or carpooling options.'
                 })
     
     # Analyze recurring expenses
-    recurring_expenses = defaultdict(list)
-    for expense in expenses:
-        key = f"{expense.description}-{expense.amount}"
-        recurring_expenses[key].append(expense)
-    
-    for key, exp_list in recurring_expenses.items():
-        if len(exp_list) > 2:
-            recommendations.append({
-                'type': 'subscription',
-                'message': f'Recurring expense detected: {exp_list[0].description}. Review if this subscription is still needed.'
-            })
+    for description, amount, count in aggregates.recurring(3):
+        recommendations.append({
+            'type': 'subscription',
+            'message': f'Recurring expense detected: {description}. Review if this subscription is still needed.'
+        })
     
     return recommendations 
\ No newline at end of file
@@ -1,4 +1,7 @@
 import re
+import threading
+from collections import OrderedDict, deque
+from functools import lru_cache
 
 # Define category keywords
 CATEGORY_KEYWORDS = {
@@ -16,28 +19,224 @@ CATEGORY_KEYWORDS = {
     'Subscription': ['subscription', 'membership', 'monthly', 'annual', 'fee', 'dues'],
 }
 
+# Keywords categorize_expense has always checked first; the richer tables
+# only categorize descriptions none of these match
+PRIMARY_KEYWORDS = {
+    'Groceries': ['grocery', 'food', 'supermarket', 'market', 'supremo food'],
+    'Dining': ['restaurant', 'cafe', 'coffee', 'tst* gregorys'],
+    'Transportation': ['uber', 'lyft', 'taxi', 'njt bus', 'transit'],
+    'Shopping': ['amazon', 'zara', 'walmart', 'target'],
+    'Utilities': ['electric', 'water', 'gas', 'internet'],
+    'Entertainment': ['movie', 'theatre', 'netflix', 'spotify'],
+    'Healthcare': ['pharmacy', 'doctor', 'medical'],
+}
+
+# Merchant keywords used by categorize_expense_old
+MERCHANT_KEYWORDS = {
+    'Transportation': [
+        'njt bus', 'my-tix', 'mta', 'nyct', 'paygo', 'transit', 'uber', 'lyft',
+        'taxi', 'train', 'subway', 'metro', 'path', 'parking', 'nj transit',
+        'amtrak', 'rail'
+    ],
+    'Dining': [
+        'restaurant', 'cafe', 'coffee', 'food', 'deli', 'kitchen', 'grill',
+        'pizzeria', 'bar', 'tavern', 'pub', 'eatery', 'bistro', 'doordash',
+        'uber eats', 'grubhub', 'seamless', 'veloce', 'gregorys', 'starbucks',
+        'dunkin', 'mcdonalds', 'burger', 'wendy', 'chipotle', 'subway',
+        'nunu ethiopian', 'supremo food'
+    ],
+    'Groceries': [
+        'grocery', 'market', 'food market', 'supermarket', 'trader joe',
+        'whole foods', 'wegmans', 'shop rite', 'stop & shop', 'aldi',
+        'food bazaar', 'supremo food market'
+    ],
+    'Shopping': [
+        'amazon', 'walmart', 'target', 'costco', 'best buy', 'apple',
+        'zara', 'uniqlo', 'macy', 'nordstrom', 'tj maxx', 'marshall',
+        'retail', 'store', 'market'
+    ],
+    'Entertainment': [
+        'netflix', 'hulu', 'spotify', 'apple music', 'prime video',
+        'disney+', 'hbo', 'movie', 'cinema', 'theatre', 'concert',
+        'ticket', 'stubhub', 'eventbrite'
+    ],
+    'Bills & Utilities': [
+        'verizon', 'at&t', 't-mobile', 'sprint', 'comcast', 'xfinity',
+        'spectrum', 'con edison', 'pseg', 'national grid', 'water',
+        'utility', 'bill', 'insurance'
+    ]
+}
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over the keywords of ordered (category, keywords)
+    rules, so one pass over a description finds every keyword in it.
+
+    match() returns the category of the first rule with a keyword in the
+    text, the same answer as checking each rule's keywords with `in` in
+    order, or None. Transitions are precomputed for every state (a DFA), so
+    the scan is one dict lookup per character.
+    """
+    def __init__(self, rules):
+        self.categories = [category for category, _ in rules]
+        no_match = len(self.categories)
+        goto = [{}]
+        # Best (lowest) rule index of a keyword ending in each state
+        self.outputs = [no_match]
+        for priority, (category, keywords) in enumerate(rules):
+            for keyword in keywords:
+                state = 0
+                for char in keyword:
+                    next_state = goto[state].get(char)
+                    if next_state is None:
+                        next_state = len(goto)
+                        goto.append({})
+                        self.outputs.append(no_match)
+                        goto[state][char] = next_state
+                    state = next_state
+                self.outputs[state] = min(self.outputs[state], priority)
+
+        # Breadth-first, so a state's failure state is complete before it
+        self.transitions = [dict(edges) for edges in goto]
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                if state:
+                    fail[next_state] = self.transitions[fail[state]].get(char, 0)
+                self.outputs[next_state] = min(self.outputs[next_state], self.outputs[fail[next_state]])
+            if state:
+                for char, next_state in self.transitions[fail[state]].items():
+                    self.transitions[state].setdefault(char, next_state)
+        self.categories.append(None)
+
+    def match(self, text):
+        transitions = self.transitions
+        outputs = self.outputs
+        best = len(self.categories) - 1
+        state = 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            if outputs[state] < best:
+                best = outputs[state]
+                if not best:
+                    break
+        return self.categories[best]
+
+def keyword_rules():
+    """All keyword tables as (category, keywords) rules in priority order."""
+    rules = list(PRIMARY_KEYWORDS.items()) + list(CATEGORY_KEYWORDS.items())
+    for category, keywords in MERCHANT_KEYWORDS.items():
+        # Import into the app's own category rather than the legacy name
+        rules.append(('Utilities' if category == 'Bills & Utilities' else category, keywords))
+    return rules
+
+# Built once at import; categorize_expense runs for every imported transaction
+_AUTOMATON = KeywordAutomaton(keyword_rules())
+
+# Numbers around a merchant name: store numbers, dates, reference codes and
+# card suffixes. Matching starts at a digit, which keeps the scan fast.
+_MERCHANT_NOISE = re.compile(r'#?\d[\d/.:-]*')
+
+@lru_cache(maxsize=16384)
+def normalize_merchant(description):
+    """
+    Reduce a statement description to its merchant: lowercased, without
+    store numbers, dates, reference codes or card suffixes, and with its
+    whitespace collapsed. 'TST* GREGORYS COFFEE #0412 03/14' and
+    'TST* Gregorys Coffee #0977 04/02' both become 'tst* gregorys coffee'.
+    """
+    return ' '.join(_MERCHANT_NOISE.sub(' ', description.lower()).split())
+
+class MerchantCache:
+    """
+    Thread-safe LRU of per-merchant results with hit and miss counters, so
+    repeated merchants are categorized once. `max_entries` <= 0 disables it.
+    """
+    instances = {}
+
+    def __init__(self, name, max_entries=4096):
+        self.name = name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        MerchantCache.instances[name] = self
+
+    def get(self, key, compute):
+        """Return the cached result for `key`, calling compute(key) on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+        value = compute(key)
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries
+        }
+
+def merchant_cache_stats():
+    """Hit/miss counters of every merchant cache, by name, for tuning MERCHANT_CACHE_SIZE."""
+    stats = {name: cache.stats() for name, cache in MerchantCache.instances.items()}
+    info = normalize_merchant.cache_info()
+    lookups = info.hits + info.misses
+    stats['normalize_merchant'] = {
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_rate': round(info.hits / lookups, 3) if lookups else 0.0,
+        'entries': info.currsize,
+        'max_entries': info.maxsize
+    }
+    return stats
+
+def init_merchant_caches(app):
+    """Size the merchant caches from the MERCHANT_CACHE_SIZE setting."""
+    for cache in MerchantCache.instances.values():
+        cache.max_entries = app.config.get('MERCHANT_CACHE_SIZE', 4096)
+        cache.clear()
+
+category_cache = MerchantCache('categorize_expense')
+
+# What categorize_expense returns when no keyword matches; imports file
+# such rows under the user's category of this name
+FALLBACK_CATEGORY = 'Other'
+
+def _categorize_merchant(merchant):
+    return _AUTOMATON.match(merchant) or FALLBACK_CATEGORY
+
 def categorize_expense(description):
     """
     Categorize an expense based on its description.
     Returns the category name.
+
+    Matches the normalized merchant (see normalize_merchant) against
+    PRIMARY_KEYWORDS, then CATEGORY_KEYWORDS, then the MERCHANT_KEYWORDS
+    list, in one scan; the first category (in that order) with a keyword in
+    it wins. Results are cached per merchant in category_cache.
     """
-    description = description.lower()
-    
-    categories = {
-        'groceries': ['grocery', 'food', 'supermarket', 'market', 'supremo food'],
-        'dining': ['restaurant', 'cafe', 'coffee', 'tst* gregorys'],
-        'transportation': ['uber', 'lyft', 'taxi', 'njt bus', 'transit'],
-        'shopping': ['amazon', 'zara', 'walmart', 'target'],
-        'utilities': ['electric', 'water', 'gas', 'internet'],
-        'entertainment': ['movie', 'theatre', 'netflix', 'spotify'],
-        'healthcare': ['pharmacy', 'doctor', 'medical'],
-    }
-    
-    for category, keywords in categories.items():
-        if any(keyword in description for keyword in keywords):
-            return category.title()
-    
-    return 'Other'
+    return category_cache.get(normalize_merchant(description), _categorize_merchant)
 
 def categorize_expense_old(description):
     """
@@ -46,44 +245,8 @@ def categorize_expense_old(description):
     """
     description = description.lower()
     
-    # Define keywords for each category with more specific matches
-    categories = {
-        'Transportation': [
-            'njt bus', 'my-tix', 'mta', 'nyct', 'paygo', 'transit', 'uber', 'lyft',
-            'taxi', 'train', 'subway', 'metro', 'path', 'parking', 'nj transit',
-            'amtrak', 'rail'
-        ],
-        'Dining': [
-            'restaurant', 'cafe', 'coffee', 'food', 'deli', 'kitchen', 'grill',
-            'pizzeria', 'bar', 'tavern', 'pub', 'eatery', 'bistro', 'doordash',
-            'uber eats', 'grubhub', 'seamless', 'veloce', 'gregorys', 'starbucks',
-            'dunkin', 'mcdonalds', 'burger', 'wendy', 'chipotle', 'subway',
-            'nunu ethiopian', 'supremo food'
-        ],
-        'Groceries': [
-            'grocery', 'market', 'food market', 'supermarket', 'trader joe',
-            'whole foods', 'wegmans', 'shop rite', 'stop & shop', 'aldi',
-            'food bazaar', 'supremo food market'
-        ],
-        'Shopping': [
-            'amazon', 'walmart', 'target', 'costco', 'best buy', 'apple',
-            'zara', 'uniqlo', 'macy', 'nordstrom', 'tj maxx', 'marshall',
-            'retail', 'store', 'market'
-        ],
-        'Entertainment': [
-            'netflix', 'hulu', 'spotify', 'apple music', 'prime video',
-            'disney+', 'hbo', 'movie', 'cinema', 'theatre', 'concert',
-            'ticket', 'stubhub', 'eventbrite'
-        ],
-        'Bills & Utilities': [
-            'verizon', 'at&t', 't-mobile', 'sprint', 'comcast', 'xfinity',
-            'spectrum', 'con edison', 'pseg', 'national grid', 'water',
-            'utility', 'bill', 'insurance'
-        ]
-    }
-    
     # Check each category's keywords
-    for category, keywords in categories.items():
+    for category, keywords in MERCHANT_KEYWORDS.items():
         for keyword in keywords:
             if keyword in description:
                 return category
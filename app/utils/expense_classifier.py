@@ -0,0 +1,309 @@
+import fcntl
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+import numpy as np
+from flask import current_app
+from app import db
+from app.models import Category, Expense
+from .expense_categorizer import FALLBACK_CATEGORY, normalize_merchant
+
+# Hashed feature space shared by every model; changing it invalidates saved models
+N_FEATURES = 1 << 14
+# Extra row of zeros in the weight matrix for descriptions with no features
+_EMPTY_FEATURE = N_FEATURES
+
+@lru_cache(maxsize=16384)
+def merchant_features(merchant):
+    """
+    Hashed feature indices of a normalized merchant: its word tokens and the
+    byte trigrams of the padded text, so 'gregorys' and 'gregory s' share
+    most features. crc32 keeps the hashes stable across processes.
+    """
+    data = f' {merchant} '.encode('utf-8')
+    features = [zlib.crc32(token, 1) % N_FEATURES for token in data.split()]
+    features.extend(zlib.crc32(data[i:i + 3]) % N_FEATURES for i in range(len(data) - 2))
+    return tuple(features)
+
+def featurize(descriptions):
+    """
+    Sparse feature rows for `descriptions` in CSR form: (columns, starts),
+    where row i's feature indices are columns[starts[i]:starts[i + 1]].
+    """
+    columns = []
+    starts = np.zeros(len(descriptions) + 1, dtype=np.int64)
+    for i, description in enumerate(descriptions):
+        features = merchant_features(normalize_merchant(description))
+        # Featureless rows point at the zero row so every row has an entry
+        columns.extend(features or (_EMPTY_FEATURE,))
+        starts[i + 1] = len(columns)
+    return np.asarray(columns, dtype=np.int64), starts
+
+class NaiveBayesClassifier:
+    """
+    Multinomial naive Bayes over hashed merchant features, trained
+    incrementally from labeled expenses.
+
+    The model is just per-category feature counts, so partial_fit() adds a
+    batch of examples by counting and the log probabilities are rebuilt
+    lazily. predict() scores a whole batch as the sparse product of its
+    feature counts with the (features x categories) log-probability matrix,
+    gathered and summed per row in NumPy. `trained_through` is the highest
+    Expense id already counted.
+    """
+
+    def __init__(self, category_ids=(), documents=(), feature_counts=None, trained_through=0, alpha=0.1):
+        self.category_ids = np.asarray(category_ids, dtype=np.int64)
+        self.documents = np.asarray(documents, dtype=np.int64)
+        if feature_counts is None:
+            feature_counts = np.zeros((len(self.category_ids), N_FEATURES), dtype=np.int32)
+        self.feature_counts = feature_counts
+        self.trained_through = int(trained_through)
+        self.alpha = alpha
+        self._weights = None
+
+    @property
+    def examples(self):
+        return int(self.documents.sum())
+
+    def partial_fit(self, descriptions, category_ids, weight=1):
+        """
+        Count a batch of labeled descriptions into the model. A `weight` of -1
+        takes previously counted examples back out.
+        """
+        if not len(descriptions):
+            return self
+        labels = np.asarray(category_ids, dtype=np.int64)
+        new = np.setdiff1d(labels, self.category_ids)
+        if len(new):
+            self.category_ids = np.concatenate([self.category_ids, new])
+            self.documents = np.concatenate([self.documents, np.zeros(len(new), dtype=np.int64)])
+            self.feature_counts = np.vstack([self.feature_counts,
+                                             np.zeros((len(new), N_FEATURES), dtype=np.int32)])
+
+        order = np.argsort(self.category_ids)
+        rows = order[np.searchsorted(self.category_ids, labels, sorter=order)]
+        self.documents += weight * np.bincount(rows, minlength=len(self.category_ids))
+
+        columns, starts = featurize(descriptions)
+        row_per_feature = np.repeat(rows, np.diff(starts))
+        real = columns != _EMPTY_FEATURE
+        counts = np.bincount(row_per_feature[real] * N_FEATURES + columns[real],
+                             minlength=self.feature_counts.size)
+        self.feature_counts += weight * counts.reshape(self.feature_counts.shape).astype(np.int32)
+        if weight < 0:
+            np.maximum(self.documents, 0, out=self.documents)
+            np.maximum(self.feature_counts, 0, out=self.feature_counts)
+        self._weights = None
+        return self
+
+    @property
+    def trained_categories(self):
+        return int(np.count_nonzero(self.documents))
+
+    def _log_weights(self):
+        """
+        (features + 1) x categories log P(feature | category), the log priors,
+        and a 0/1 vector of the features seen in training.
+        """
+        if self._weights is None:
+            smoothed = self.feature_counts + self.alpha
+            log_probs = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+            weights = np.zeros((N_FEATURES + 1, len(self.category_ids)), dtype=np.float32)
+            weights[:N_FEATURES] = log_probs.T
+            # Categories whose examples were all relabeled get a prior of zero
+            with np.errstate(divide='ignore'):
+                log_priors = np.log(self.documents / self.documents.sum()).astype(np.float32)
+            seen = np.zeros(N_FEATURES + 1, dtype=np.float32)
+            seen[:N_FEATURES] = self.feature_counts.any(axis=0)
+            self._weights = weights, log_priors, seen
+        return self._weights
+
+    def predict(self, descriptions):
+        """
+        Return (category_ids, confidences) arrays for `descriptions`. The
+        confidence is the posterior probability of the predicted category
+        scaled by the share of the description's features seen in training,
+        since naive Bayes is just as sure about text it has never seen.
+        """
+        if not len(descriptions) or not len(self.category_ids):
+            return np.zeros(len(descriptions), dtype=np.int64), np.zeros(len(descriptions))
+        weights, log_priors, seen = self._log_weights()
+        columns, starts = featurize(descriptions)
+        scores = np.add.reduceat(weights[columns], starts[:-1], axis=0) + log_priors
+        best = scores.argmax(axis=1)
+        # Softmax of the winning score, computed stably
+        scores -= scores[np.arange(len(best)), best][:, None]
+        confidences = 1.0 / np.exp(scores).sum(axis=1)
+        confidences *= np.add.reduceat(seen[columns], starts[:-1]) / np.diff(starts)
+        return self.category_ids[best], confidences
+
+    def save(self, path):
+        """
+        Write the model to `path` as an uncompressed .npz holding only the
+        non-zero feature counts, replacing any previous file atomically.
+        """
+        nonzero = np.flatnonzero(self.feature_counts)
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, category_ids=self.category_ids, documents=self.documents,
+                     feature_index=nonzero.astype(np.int32),
+                     feature_counts=self.feature_counts.ravel()[nonzero],
+                     trained_through=np.int64(self.trained_through))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            category_ids = data['category_ids']
+            feature_counts = np.zeros((len(category_ids), N_FEATURES), dtype=np.int32)
+            feature_counts.ravel()[data['feature_index']] = data['feature_counts']
+            return cls(category_ids, data['documents'], feature_counts, int(data['trained_through']))
+
+def model_path(user_id):
+    return os.path.join(current_app.config['CLASSIFIER_DIR'], f'user_{user_id}.npz')
+
+# Recently used models by user id, with the file mtime they were read at
+_models = OrderedDict()
+_models_lock = threading.Lock()
+MAX_LOADED_MODELS = 32
+
+def _cache_model(user_id, mtime, model):
+    with _models_lock:
+        _models[user_id] = (mtime, model)
+        _models.move_to_end(user_id)
+        while len(_models) > MAX_LOADED_MODELS:
+            _models.popitem(last=False)
+
+def load_user_classifier(user_id):
+    """
+    Return the user's saved classifier, or None if there is none. Models are
+    kept in memory and re-read only when their file changes, so a worker
+    picks up retrained models without reloading on every import. The
+    returned model is shared; update it through _updating_classifier.
+    """
+    path = model_path(user_id)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        with _models_lock:
+            _models.pop(user_id, None)
+        return None
+    with _models_lock:
+        cached = _models.get(user_id)
+        if cached is not None and cached[0] == mtime:
+            _models.move_to_end(user_id)
+            return cached[1]
+    model = NaiveBayesClassifier.load(path)
+    _cache_model(user_id, mtime, model)
+    return model
+
+# Serializes model updates between threads; the file lock does it between processes
+_update_lock = threading.Lock()
+
+@contextmanager
+def _updating_classifier(user_id):
+    """
+    Hold the user's model lock and yield a private copy of their saved model
+    (None if there is none) to update. The web app relabels expenses while
+    the worker trains, so each load-update-save runs under an exclusive
+    flock on a lock file next to the model, and neither can overwrite the
+    other's counts with a stale copy. Save the copy with _save_classifier
+    before leaving the block.
+    """
+    path = model_path(user_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _update_lock, open(path + '.lock', 'a') as lock_file:
+        # Released when the lock file is closed
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield NaiveBayesClassifier.load(path) if os.path.exists(path) else None
+
+def _save_classifier(user_id, model):
+    """Save an updated model (atomically, see save()) and make it the cached one."""
+    path = model_path(user_id)
+    model.save(path)
+    _cache_model(user_id, os.stat(path).st_mtime_ns, model)
+
+def _unlabeled_category_ids(user_id):
+    """
+    Ids of the user's FALLBACK_CATEGORY categories. Imports put the rows
+    they could not categorize there, so those rows are not labels to learn
+    from; the classifier exists to move them out.
+    """
+    return {
+        category_id for (category_id,) in db.session.query(Category.id).filter(
+            Category.user_id == user_id,
+            Category.name == FALLBACK_CATEGORY
+        )
+    }
+
+def train_user_classifier(user_id, batch_size=5000):
+    """
+    Count the user's labeled expenses added since the last training into
+    their classifier and save it. Expenses in the fallback category are
+    skipped (see _unlabeled_category_ids). Returns the model.
+    """
+    unlabeled = _unlabeled_category_ids(user_id)
+    with _updating_classifier(user_id) as model:
+        model = model or NaiveBayesClassifier()
+        query = db.session.query(Expense.id, Expense.description, Expense.category_id).filter(
+            Expense.user_id == user_id,
+            Expense.category_id.isnot(None),
+            Expense.category_id.notin_(unlabeled),
+            Expense.id > model.trained_through
+        ).order_by(Expense.id)
+
+        trained = False
+        rows = query.limit(batch_size).all()
+        while rows:
+            model.partial_fit([row[1] for row in rows], [row[2] for row in rows])
+            model.trained_through = rows[-1][0]
+            trained = True
+            rows = query.filter(Expense.id > model.trained_through).limit(batch_size).all()
+
+        if trained:
+            _save_classifier(user_id, model)
+    return model
+
+def relabel_expense(user_id, expense_id, old_description, old_category_id, description, category_id):
+    """
+    Move an edited expense the classifier has already counted from its old
+    label to the new one. A `category_id` of None (a deleted expense) only
+    takes the old label out. Expenses not trained yet need nothing: the next
+    training reads their current category. Fallback category labels were
+    never counted, so they are neither taken out nor added.
+    """
+    try:
+        unlabeled = _unlabeled_category_ids(user_id)
+        with _updating_classifier(user_id) as model:
+            if model is None or expense_id > model.trained_through:
+                return
+            if old_category_id is not None and old_category_id not in unlabeled:
+                model.partial_fit([old_description], [old_category_id], weight=-1)
+            if category_id is not None and category_id not in unlabeled:
+                model.partial_fit([description], [category_id])
+            _save_classifier(user_id, model)
+    except Exception as e:
+        current_app.logger.warning(f"Updating the classifier for user {user_id} failed: {e}")
+
+def categorize_many(descriptions, user_id):
+    """
+    Categorize a batch of descriptions with the user's classifier in one
+    vectorized pass. Returns a list with a category id per description, or
+    None where the model is missing, has fewer than CLASSIFIER_MIN_EXAMPLES
+    examples in at least two categories, or is less confident than
+    CLASSIFIER_MIN_CONFIDENCE.
+    """
+    config = current_app.config
+    model = load_user_classifier(user_id)
+    if model is None or model.examples < config['CLASSIFIER_MIN_EXAMPLES'] or model.trained_categories < 2:
+        return [None] * len(descriptions)
+    category_ids, confidences = model.predict(descriptions)
+    confident = confidences >= config['CLASSIFIER_MIN_CONFIDENCE']
+    return [int(category_id) if ok else None for category_id, ok in zip(category_ids, confident)]
@@ -0,0 +1,177 @@
+from datetime import date
+import numpy as np
+from app import db
+from app.models import Expense
+from .money import from_cents, to_cents
+
+# Category id used in the frame for expenses without a category
+NO_CATEGORY = -1
+
+def group_sum(keys, values):
+    """
+    Vectorized group-by: return (unique_keys, sums, counts) for `values`
+    grouped by `keys`. Sums keep the dtype of `values`, so int64 cents stay exact.
+    """
+    if len(keys) == 0:
+        return keys[:0], np.zeros(0, dtype=values.dtype), np.zeros(0, dtype=np.int64)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.concatenate(([0], np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1))
+    sums = np.add.reduceat(values[order], starts)
+    counts = np.diff(np.append(starts, len(keys)))
+    return sorted_keys[starts], sums, counts
+
+def _ordinal(value):
+    """Return the proleptic ordinal of a date or datetime."""
+    return value.toordinal() if value is not None else None
+
+class ExpenseFrame:
+    """
+    Columnar snapshot of a user's expenses backed by NumPy arrays.
+
+    Built once per request from a lean column query, it offers the same
+    grouped interface as ExpenseAggregates (totals, by_category, by_month,
+    by_day, small_expenses, recurring) computed with vectorized group-bys,
+    so every analytics utility can share one load of the data. Amounts are
+    held as int64 cents; `amounts` is the float dollar view of them.
+    Date filters use an inclusive `start` and an exclusive `end` and are
+    applied at day granularity. Rows are kept in chronological order.
+    """
+
+    def __init__(self, ids, cents, ordinals, category_ids, descriptions):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.cents = np.asarray(cents, dtype=np.int64)
+        self.ordinals = np.asarray(ordinals, dtype=np.int64)
+        self.category_ids = np.asarray(category_ids, dtype=np.int64)
+        self.descriptions = np.asarray(descriptions, dtype=object)
+
+        # Month index (year * 12 + month - 1) for cheap month grouping
+        years, months = self._year_month(self.ordinals)
+        self.month_index = years * 12 + (months - 1)
+
+    @staticmethod
+    def _year_month(ordinals):
+        if len(ordinals) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        # Convert through datetime64 days, whose epoch is 1970-01-01
+        days = (ordinals - date(1970, 1, 1).toordinal()).astype('datetime64[D]')
+        months_since_epoch = days.astype('datetime64[M]').astype(np.int64)
+        return 1970 + months_since_epoch // 12, months_since_epoch % 12 + 1
+
+    @classmethod
+    def for_user(cls, user_id):
+        """Load a frame for a user with a single lean column query."""
+        rows = db.session.query(
+            Expense.id, Expense.amount_cents, Expense.date, Expense.category_id, Expense.description
+        ).filter(
+            Expense.user_id == user_id
+        ).order_by(Expense.date, Expense.id).all()
+        return cls(
+            [row[0] for row in rows],
+            [row[1] for row in rows],
+            [row[2].toordinal() for row in rows],
+            [row[3] if row[3] is not None else NO_CATEGORY for row in rows],
+            [row[4] for row in rows]
+        )
+
+    def __len__(self):
+        return len(self.cents)
+
+    @property
+    def count(self):
+        return len(self.cents)
+
+    @property
+    def amounts(self):
+        """Amounts in dollars as float64."""
+        return self.cents / 100
+
+    def mask(self, start=None, end=None):
+        """Return a boolean row mask for the [start, end) date window."""
+        mask = np.ones(len(self.cents), dtype=bool)
+        if start is not None:
+            mask &= self.ordinals >= _ordinal(start)
+        if end is not None:
+            mask &= self.ordinals < _ordinal(end)
+        return mask
+
+    def totals(self, start=None, end=None):
+        """Return (total, count) for all matching expenses."""
+        mask = self.mask(start, end)
+        return (from_cents(int(self.cents[mask].sum())), int(mask.sum()))
+
+    def by_category(self, start=None, end=None):
+        """Return {category_id: (total, count)}, using None for uncategorized expenses."""
+        mask = self.mask(start, end)
+        keys, sums, counts = group_sum(self.category_ids[mask], self.cents[mask])
+        return {
+            (None if key == NO_CATEGORY else int(key)): (from_cents(int(total)), int(count))
+            for key, total, count in zip(keys, sums, counts)
+        }
+
+    def by_month(self, start=None, end=None):
+        """Return {(year, month): (total, count)}."""
+        mask = self.mask(start, end)
+        keys, sums, counts = group_sum(self.month_index[mask], self.cents[mask])
+        return {
+            (int(key // 12), int(key % 12 + 1)): (from_cents(int(total)), int(count))
+            for key, total, count in zip(keys, sums, counts)
+        }
+
+    def by_day(self, start=None, end=None):
+        """Return {(year, month, day): (total, count)}."""
+        mask = self.mask(start, end)
+        keys, sums, counts = group_sum(self.ordinals[mask], self.cents[mask])
+        result = {}
+        for key, total, count in zip(keys, sums, counts):
+            day = date.fromordinal(int(key))
+            result[(day.year, day.month, day.day)] = (from_cents(int(total)), int(count))
+        return result
+
+    def small_expenses(self, threshold, start=None, end=None):
+        """Return (total, count) for expenses below `threshold`."""
+        mask = self.mask(start, end) & (self.cents < to_cents(threshold))
+        return (from_cents(int(self.cents[mask].sum())), int(mask.sum()))
+
+    def recurring_groups(self, min_count, ignore_case=False):
+        """
+        Group rows by (description, amount) and return (first_rows, counts)
+        for groups with at least `min_count` rows, in order of first occurrence.
+        """
+        if len(self.cents) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        descriptions = self.descriptions
+        if ignore_case:
+            descriptions = np.array([d.lower() for d in descriptions], dtype=object)
+
+        _, description_keys = np.unique(descriptions.astype(str), return_inverse=True)
+        amount_values, amount_keys = np.unique(self.cents, return_inverse=True)
+        keys = description_keys.astype(np.int64) * len(amount_values) + amount_keys
+
+        _, first_rows, counts = np.unique(keys, return_index=True, return_counts=True)
+        selected = counts >= min_count
+        first_rows, counts = first_rows[selected], counts[selected]
+        order = np.argsort(first_rows, kind='stable')
+        return first_rows[order], counts[order]
+
+    def recurring(self, min_count, start=None, end=None):
+        """
+        Return [(description, amount, count)] for description/amount pairs
+        that occur at least `min_count` times, in order of first occurrence.
+        """
+        frame = self if start is None and end is None else self.subset(self.mask(start, end))
+        first_rows, counts = frame.recurring_groups(min_count)
+        return [
+            (frame.descriptions[row], from_cents(int(frame.cents[row])), int(count))
+            for row, count in zip(first_rows, counts)
+        ]
+
+    def subset(self, mask):
+        """Return a new frame holding only the rows selected by `mask`."""
+        return ExpenseFrame(self.ids[mask], self.cents[mask], self.ordinals[mask],
+                            self.category_ids[mask], self.descriptions[mask])
+
+    def date_of(self, row):
+        """Return the date of a row."""
+        return date.fromordinal(int(self.ordinals[row]))
@@ -1,9 +1,14 @@
 from datetime import datetime, timedelta
 from collections import defaultdict
 import numpy as np
+from .aggregates import month_bounds
+from .money import from_cents, to_cents
 
-def calculate_financial_health(expenses, categories, goals, reminders, income=0):
-    """Calculate overall financial health score and metrics."""
+def calculate_financial_health(frame, categories, goals, reminders, income=0):
+    """
+    Calculate overall financial health score and metrics.
+    `frame` is an ExpenseFrame for the user.
+    """
     today = datetime.now()
     
     # Initialize health metrics
@@ -21,20 +26,19 @@ def calculate_financial_health(expenses, categories, goals, reminders, income=0)
     }
     
     # Calculate total spending for current month
-    current_month_expenses = [e for e in expenses 
-                             if e.date.month == today.month and e.date.year == today.year]
-    total_spending = sum(e.amount for e in current_month_expenses)
+    month_start, month_end = month_bounds(today.year, today.month)
+    total_spending, _ = frame.totals(start=month_start, end=month_end)
+    current_month_spending = frame.by_category(start=month_start, end=month_end)
     
     # Calculate budget adherence
-    categories_with_budget = [c for c in categories if c.budget > 0]
+    categories_with_budget = [c for c in categories if (c.budget_cents or 0) > 0]
     if categories_with_budget:
         budget_scores = []
         for category in categories_with_budget:
-            cat_expenses = [e.amount for e in current_month_expenses if e.category_id == category.id]
-            cat_total = sum(cat_expenses)
+            cat_total = current_month_spending.get(category.id, (0, 0))[0]
             
             # Calculate adherence score (100 = at or under budget, 0 = 2x budget or more)
-            if cat_total <= category.budget:
+            if to_cents(cat_total) <= category.budget_cents:
                 adherence = 100
             else:
                 overspend_ratio = cat_total / category.budget
@@ -68,17 +72,13 @@ def calculate_financial_health(expenses, categories, goals, reminders, income=0)
         })
     
     # Calculate expense stability
-    if len(expenses) > 10:
+    if frame.count > 10:
         # Get monthly totals for past 6 months
-        monthly_totals = defaultdict(float)
-        for expense in expenses:
-            if (today - expense.date).days <= 180:
-                month_key = f"{expense.date.year}-{expense.date.month}"
-                monthly_totals[month_key] += expense.amount
+        monthly_totals = frame.by_month(start=today - timedelta(days=180))
         
         if monthly_totals:
             # Calculate coefficient of variation (lower is more stable)
-            values = list(monthly_totals.values())
+            values = [total for total, count in monthly_totals.values()]
             std_dev = np.std(values)
             mean = np.mean(values)
             
@@ -123,7 +123,7 @@ def calculate_financial_health(expenses, categories, goals, reminders, income=0)
     # Calculate debt management (based on upcoming payment reminders)
     upcoming_payments = [r for r in reminders if not r.is_completed and (r.due_date - today).days <= 30]
     if upcoming_payments:
-        total_upcoming = sum(r.amount for r in upcoming_payments)
+        total_upcoming = from_cents(sum(r.amount_cents for r in upcoming_payments))
         
         # Check for overdue payments
         overdue_payments = [r for r in upcoming_payments if r.due_date < today]
@@ -3,9 +3,13 @@ from collections import defaultdict
 import numpy as np
 from sqlalchemy import extract
 from ..models import Expense, Category, Reminder
+from .money import from_cents, to_cents
 
-def generate_expense_forecast(expenses, categories, reminders):
-    """Generate a 6-month expense forecast based on historical data and upcoming reminders."""
+def generate_expense_forecast(frame, categories, reminders):
+    """
+    Generate a 6-month expense forecast based on historical data and upcoming reminders.
+    `frame` is an ExpenseFrame for the user.
+    """
     today = datetime.now()
     forecast_months = 6
     
@@ -18,29 +22,25 @@ def generate_expense_forecast(expenses, categories, reminders):
         'expected_total': 0
     }
     
-    # Calculate average monthly spending by category
-    category_spending = defaultdict(list)
-    monthly_totals = defaultdict(float)
-    
     # Group expenses by month and category for the past 6 months
-    for expense in expenses:
-        # Only consider expenses from the past 6 months
-        if (today - expense.date).days <= 180:
-            month_key = f"{expense.date.year}-{expense.date.month}"
-            monthly_totals[month_key] += expense.amount
-            
-            category_name = expense.category.name if expense.category else "Uncategorized"
-            category_spending[category_name].append(expense.amount)
+    since = today - timedelta(days=180)
+    monthly_totals = frame.by_month(start=since)
+    category_names = {category.id: category.name for category in categories}
+    category_spending = defaultdict(lambda: [0.0, 0])
+    for category_id, (total, count) in frame.by_category(start=since).items():
+        spending = category_spending[category_names.get(category_id, "Uncategorized")]
+        spending[0] += total
+        spending[1] += count
     
     # Calculate average monthly spending for each category
     category_averages = {}
-    for category, amounts in category_spending.items():
-        if amounts:
-            category_averages[category] = sum(amounts) / len(amounts)
+    for category, (total, count) in category_spending.items():
+        if count:
+            category_averages[category] = total / count
     
-    # Calculate overall monthly average
+    # Calculate overall monthly average, in cents
     if monthly_totals:
-        overall_monthly_avg = sum(monthly_totals.values()) / len(monthly_totals)
+        overall_monthly_avg = sum(to_cents(total) for total, count in monthly_totals.values()) / len(monthly_totals)
     else:
         overall_monthly_avg = 0
     
@@ -56,14 +56,15 @@ def generate_expense_forecast(expenses, categories, reminders):
         for reminder in reminders:
             reminder_date = reminder.due_date
             if reminder_date.year == forecast_date.year and reminder_date.month == forecast_date.month:
-                forecast_total += reminder.amount
+                forecast_total += reminder.amount_cents
         
+        forecast_cents = round(forecast_total)
         forecast['monthly_totals'].append({
             'month': month_name,
-            'amount': round(forecast_total, 2)
+            'amount': from_cents(forecast_cents)
         })
         
-        forecast['expected_total'] += forecast_total
+        forecast['expected_total'] += forecast_cents
     
     # Generate category-specific forecasts
     for category, avg_amount in category_averages.items():
@@ -96,6 +97,6 @@ def generate_expense_forecast(expenses, categories, reminders):
                 forecast['savings_potential'] += potential_savings
     
     forecast['savings_potential'] = round(forecast['savings_potential'], 2)
-    forecast['expected_total'] = round(forecast['expected_total'], 2)
+    forecast['expected_total'] = from_cents(forecast['expected_total'])
     
     return forecast 
\ No newline at end of file
@@ -0,0 +1,371 @@
+import os
+import socket
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import repeat
+from flask import current_app
+from app import db
+from app.models import ImportJob
+from .statement_formats import iter_statement_transactions, is_pdf_statement
+from .statement_import import import_transactions, import_statements
+from .statement_cache import load_parsed_statement, store_parsed_statement
+from .import_metrics import ImportMetrics
+from .expense_classifier import train_user_classifier
+
+def enqueue_import(user_id, statement, filepath, source):
+    """
+    Queue a statement import and commit it so worker.py can pick it up.
+    With IMPORT_JOBS_INLINE the import runs right away in the request instead.
+    """
+    job = ImportJob(user_id=user_id, statement=statement, filepath=filepath, source=source)
+    db.session.add(job)
+    db.session.commit()
+
+    if current_app.config.get('IMPORT_JOBS_INLINE'):
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+        run_import_job(job)
+    return job
+
+def enqueue_import_batch(user_id, uploads, source):
+    """
+    Queue one import job per (statement, filepath) in `uploads`, sharing a
+    batch id so a worker extracts and imports them together (see
+    run_import_batch). Returns the jobs in upload order.
+    """
+    batch_id = uuid.uuid4().hex
+    jobs = [ImportJob(user_id=user_id, statement=statement, filepath=filepath,
+                      source=source, batch_id=batch_id)
+            for statement, filepath in uploads]
+    db.session.add_all(jobs)
+    db.session.commit()
+
+    if current_app.config.get('IMPORT_JOBS_INLINE'):
+        for job in jobs:
+            job.status = 'running'
+            job.started_at = datetime.utcnow()
+        db.session.commit()
+        run_import_batch(jobs)
+    return jobs
+
+def requeue_stale_jobs(timeout):
+    """Put back jobs whose worker has not finished them within `timeout` seconds."""
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout)
+    count = ImportJob.query.filter(
+        ImportJob.status == 'running',
+        ImportJob.started_at < cutoff
+    ).update({ImportJob.status: 'queued', ImportJob.worker: None}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+def claim_next_job(worker_name=None):
+    """
+    Atomically claim the oldest queued job for this worker.
+    Returns the job, or None if the queue is empty.
+    """
+    worker_name = worker_name or f'{socket.gethostname()}:{os.getpid()}'
+    while True:
+        job_id = db.session.query(ImportJob.id).filter(
+            ImportJob.status == 'queued'
+        ).order_by(ImportJob.id).limit(1).scalar()
+        if job_id is None:
+            db.session.rollback()
+            return None
+
+        # The status check makes the claim safe against other workers
+        claimed = ImportJob.query.filter(
+            ImportJob.id == job_id,
+            ImportJob.status == 'queued'
+        ).update({
+            ImportJob.status: 'running',
+            ImportJob.worker: worker_name,
+            ImportJob.started_at: datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return db.session.get(ImportJob, job_id)
+
+def claim_batch_jobs(job):
+    """
+    Claim the queued jobs left in a claimed job's batch for the same worker.
+    Returns every job of the batch this worker holds, in upload order.
+    """
+    ImportJob.query.filter(
+        ImportJob.batch_id == job.batch_id,
+        ImportJob.status == 'queued'
+    ).update({
+        ImportJob.status: 'running',
+        ImportJob.worker: job.worker,
+        ImportJob.started_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    return ImportJob.query.filter_by(
+        batch_id=job.batch_id, status='running', worker=job.worker
+    ).order_by(ImportJob.id).all()
+
+def _pdf_options(config):
+    """PDF extraction options for iter_statement_transactions from the PDF_* settings."""
+    options = {
+        'backend': config['PDF_TEXT_BACKEND'],
+        'max_pages': config['PDF_MAX_PAGES']
+    }
+    if config['PDF_SANDBOX_TIMEOUT']:
+        options['sandbox'] = {
+            'timeout': config['PDF_SANDBOX_TIMEOUT'],
+            'memory_limit_mb': config['PDF_SANDBOX_MEMORY_MB']
+        }
+    return options
+
+def _record_metrics(job, metrics, extra=None):
+    """Store an import's metrics on its statement and log them."""
+    data = metrics.to_dict()
+    data.update(extra or {})
+    job.statement.import_metrics = data
+    current_app.logger.info(f"Import job {job.id} ({job.statement.filename}, backend {job.backend}): "
+                            f"{metrics.summary()}")
+
+def _train_classifier(user_id, metrics):
+    """Count the user's newly imported expenses into their classifier; failures are only logged."""
+    try:
+        with metrics.stage('train'):
+            train_user_classifier(user_id)
+    except Exception as e:
+        current_app.logger.warning(f"Training the classifier for user {user_id} failed: {e}")
+
+def _failure_message(job, error):
+    """
+    The error to store on a failed job. Batches committed before the failure
+    stay imported (job.imported holds their rows after the rollback), so the
+    message says how many rows were written.
+    """
+    if job.imported:
+        return f"Failed after {job.imported} rows imported: {error}"
+    return str(error)
+
+def run_import_job(job):
+    """
+    Run a claimed import job: extract the statement, merge its transactions
+    into the user's expenses and mark the statement processed. Each batch is
+    committed with the job's progress so the status endpoint can report it
+    while the import runs. A statement whose bytes were parsed before is
+    read from the parsed statement cache instead of the PDF. CSV, OFX and
+    QIF statements are streamed straight into the import in bounded batches.
+    PDFs are parsed in the sandbox child process unless PDF_SANDBOX_TIMEOUT
+    is 0. An extraction that fails, sandboxed or not, fails the job with its
+    error and leaves the statement unprocessed. A job that fails after some batches were committed keeps those
+    rows and says so in its error. Stage timings and counters are logged and
+    stored on the statement. After a successful import the user's classifier
+    is trained on the new rows.
+    """
+    config = current_app.config
+    sha256 = job.statement.sha256 if is_pdf_statement(job.filepath) else None
+    parsed = []
+    extraction_errors = []
+    # Continues the metrics the upload started (the save stage)
+    metrics = ImportMetrics(job.statement.import_metrics)
+
+    def on_page(pages_done, page_count):
+        job.pages_done = pages_done
+        job.total_pages = page_count
+
+    def on_batch(result):
+        job.imported = result['imported']
+        job.skipped = result['skipped']
+        job.duplicates = result['duplicates']
+        with metrics.stage('commit'):
+            db.session.commit()
+
+    def on_backend(backend):
+        job.backend = backend
+
+    def extracted():
+        # Keep a copy of the stream so a PDF parse can be cached afterwards
+        for transaction in iter_statement_transactions(
+            job.filepath,
+            on_error=extraction_errors.append,
+            on_backend=on_backend,
+            workers=config['PDF_EXTRACT_WORKERS'],
+            min_parallel_pages=config['PDF_PARALLEL_MIN_PAGES'],
+            on_page=on_page,
+            metrics=metrics,
+            **_pdf_options(config)
+        ):
+            if sha256:
+                parsed.append(transaction)
+            yield transaction
+
+    try:
+        with metrics.stage('cache'):
+            cached = load_parsed_statement(sha256)
+        if cached is not None:
+            current_app.logger.info(f"Import job {job.id}: using cached parse of {sha256[:12]}")
+            job.backend = 'cache'
+        transactions = cached if cached is not None else extracted()
+        result = import_transactions(job.user_id, transactions, source=job.source,
+                                     batch_size=config['IMPORT_JOB_BATCH_SIZE'], on_batch=on_batch,
+                                     metrics=metrics)
+        for index, description, error in result['errors']:
+            current_app.logger.debug(f"Import job {job.id}: skipped transaction {index} ({description}): {error}")
+        # The parser stopped early: fail the job, keeping the rows on_batch committed
+        if extraction_errors:
+            raise extraction_errors[0]
+
+        job.imported = result['imported']
+        job.skipped = result['skipped'] + len(result['errors'])
+        job.duplicates = result['duplicates']
+        job.status = 'done'
+        job.statement.processed = True
+        with metrics.stage('commit'):
+            db.session.commit()
+
+        # Only complete parses get here, so the parse can be cached
+        if cached is None and sha256:
+            with metrics.stage('cache'):
+                store_parsed_statement(sha256, parsed)
+        _train_classifier(job.user_id, metrics)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Import job {job.id} failed: {e}")
+        job.status = 'failed'
+        job.error = _failure_message(job, e)
+    finally:
+        job.finished_at = datetime.utcnow()
+        _record_metrics(job, metrics)
+        db.session.commit()
+        # Clean up the uploaded file
+        if os.path.exists(job.filepath):
+            os.remove(job.filepath)
+    return job
+
+def _parse_statement_file(filepath, pdf_options):
+    """
+    Pool worker for batch imports: parse one statement file completely.
+    Returns (transactions, error, backend, metrics), where error is None on
+    success and metrics is the ImportMetrics dict of the parse.
+    """
+    errors = []
+    backends = []
+    metrics = ImportMetrics()
+    try:
+        transactions = list(iter_statement_transactions(filepath, on_error=errors.append,
+                                                        on_backend=backends.append, metrics=metrics,
+                                                        **pdf_options))
+    except Exception as e:
+        errors.append(e)
+    backend = backends[-1] if backends else None
+    if errors:
+        return [], str(errors[0]), backend, metrics.to_dict()
+    return transactions, None, backend, metrics.to_dict()
+
+def _extract_batch(jobs, workers, pdf_options, metrics):
+    """
+    Yield (job, transactions, error) for every job of a batch. Cached PDF
+    parses are reused; the other files are parsed on a pool of `workers`
+    processes, one file per task. Each file's parse is timed into
+    metrics[job.id].
+    """
+    to_parse = []
+    for job in jobs:
+        with metrics[job.id].stage('cache'):
+            cached = load_parsed_statement(job.statement.sha256) if is_pdf_statement(job.filepath) else None
+        if cached is not None:
+            job.backend = 'cache'
+            yield job, cached, None
+        else:
+            to_parse.append(job)
+    if not to_parse:
+        return
+
+    filepaths = [job.filepath for job in to_parse]
+    executor = None
+    if workers > 1 and len(to_parse) > 1:
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(to_parse)))
+        results = executor.map(_parse_statement_file, filepaths, repeat(pdf_options))
+    else:
+        results = map(_parse_statement_file, filepaths, repeat(pdf_options))
+    try:
+        for job, (transactions, error, backend, parse_metrics) in zip(to_parse, results):
+            job.backend = backend
+            metrics[job.id].merge(parse_metrics)
+            if error is None and is_pdf_statement(job.filepath) and job.statement.sha256:
+                with metrics[job.id].stage('cache'):
+                    store_parsed_statement(job.statement.sha256, transactions)
+            yield job, transactions, error
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+def run_import_batch(jobs):
+    """
+    Run the claimed jobs of one batch upload: extract every file on a
+    process pool, then merge the transactions of all files that parsed into
+    the user's expenses with a single import_statements pass. Each job ends
+    'done' with its own imported/duplicate counts, or 'failed' with the error
+    that stopped its file, so the batch reports per file.
+
+    Each statement stores the metrics of its own save and parse, plus the
+    shared import stages of the batch under 'batch'.
+    """
+    config = current_app.config
+    parsed_jobs = []
+    statements = []
+    metrics = {job.id: ImportMetrics(job.statement.import_metrics) for job in jobs}
+    batch_metrics = ImportMetrics()
+    try:
+        # Extract everything first: caching a parse commits the session
+        extracted = sorted(_extract_batch(jobs, config['IMPORT_BATCH_WORKERS'], _pdf_options(config), metrics),
+                           key=lambda item: item[0].id)
+        for job, transactions, error in extracted:
+            if error is not None:
+                current_app.logger.warning(f"Import job {job.id} failed: {error}")
+                job.status = 'failed'
+                job.error = error
+                continue
+            parsed_jobs.append(job)
+            statements.append(transactions)
+        # Keep the per-file failures if the import below fails and rolls back
+        db.session.commit()
+
+        def on_batch(result):
+            for job, statement_result in zip(parsed_jobs, result['statements']):
+                job.imported = statement_result['imported']
+                job.duplicates = statement_result['duplicates']
+            with batch_metrics.stage('commit'):
+                db.session.commit()
+
+        result = import_statements(jobs[0].user_id, statements, source=jobs[0].source,
+                                   batch_size=config['IMPORT_JOB_BATCH_SIZE'], on_batch=on_batch,
+                                   metrics=batch_metrics)
+        for job, statement_result in zip(parsed_jobs, result['statements']):
+            for index, description, error in statement_result['errors']:
+                current_app.logger.debug(f"Import job {job.id}: skipped transaction {index} ({description}): {error}")
+            job.imported = statement_result['imported']
+            job.skipped = statement_result['skipped'] + len(statement_result['errors'])
+            job.duplicates = statement_result['duplicates']
+            job.status = 'done'
+            job.statement.processed = True
+            metrics[job.id].count('transactions', job.imported + job.duplicates + job.skipped)
+            metrics[job.id].count('rows_inserted', statement_result['imported'])
+            metrics[job.id].count('duplicates', statement_result['duplicates'])
+        if parsed_jobs:
+            _train_classifier(jobs[0].user_id, batch_metrics)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Import batch {jobs[0].batch_id} failed: {e}")
+        for job in jobs:
+            if job.status != 'failed':
+                job.status = 'failed'
+                job.error = _failure_message(job, e)
+    finally:
+        current_app.logger.info(f"Import batch {jobs[0].batch_id}: {batch_metrics.summary()}")
+        for job in jobs:
+            job.finished_at = datetime.utcnow()
+            _record_metrics(job, metrics[job.id], {'batch': batch_metrics.to_dict()})
+        db.session.commit()
+        # Clean up the uploaded files
+        for job in jobs:
+            if os.path.exists(job.filepath):
+                os.remove(job.filepath)
+    return jobs
@@ -0,0 +1,76 @@
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+class ImportMetrics:
+    """
+    Stage timers and counters for one statement import.
+
+    Stages accumulate wall time in milliseconds: save, cache, extract (PDF
+    text), parse (statement lines or CSV/OFX/QIF records), categories
+    (category lookup), dedupe (fingerprint lookup), categorize, insert,
+    rollups, commit, train (classifier update) and fallback (a PDF text pass
+    that found nothing and was redone with another backend). Counters
+    include bytes, pages, lines, rows_errored (statement lines or records
+    the parser could not read), transactions, rows_inserted, duplicates, skipped, errors (rows
+    the import rejected), merchant_rule_hits (rows categorized by a learned
+    MerchantRule), classifier_hits (rows the keywords missed that the
+    classifier categorized), and category_cache_hits and
+    category_cache_misses for the merchant category cache. to_dict() is what
+    gets logged and stored on Statement.import_metrics.
+    """
+    def __init__(self, data=None):
+        self.stages_ms = defaultdict(float)
+        self.counters = Counter()
+        if data:
+            self.merge(data)
+
+    def merge(self, data):
+        """Add the stages and counters of a to_dict() result, e.g. from a pool worker."""
+        for name, ms in data.get('stages_ms', {}).items():
+            self.stages_ms[name] += ms
+        self.counters.update(data.get('counters', {}))
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages_ms[name] += (time.perf_counter() - start) * 1000
+
+    def add_time(self, name, seconds):
+        self.stages_ms[name] += seconds * 1000
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def timed(self, iterable, name):
+        """Yield from `iterable`, charging the time spent producing each item to stage `name`."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, time.perf_counter() - start)
+                return
+            self.add_time(name, time.perf_counter() - start)
+            yield item
+
+    def total_ms(self):
+        return sum(self.stages_ms.values())
+
+    def to_dict(self):
+        return {
+            'stages_ms': {name: round(ms, 1) for name, ms in self.stages_ms.items()},
+            'counters': dict(self.counters),
+            'total_ms': round(self.total_ms(), 1)
+        }
+
+    def summary(self):
+        """One log line: stage times slowest first, then the counters."""
+        stages = ' '.join(f'{name}={ms:.0f}ms' for name, ms in
+                          sorted(self.stages_ms.items(), key=lambda item: -item[1]))
+        counters = ' '.join(f'{name}={value}' for name, value in sorted(self.counters.items()))
+        return f'{stages} total={self.total_ms():.0f}ms {counters}'
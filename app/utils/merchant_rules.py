@@ -0,0 +1,37 @@
+from app import db
+from app.models import Category, MerchantRule
+from .expense_categorizer import normalize_merchant
+
+def learn_merchant_rule(user_id, description, category_id):
+    """
+    Remember that the user files the merchant of `description` under
+    `category_id`, so later imports categorize it the same way. Runs in the
+    current session; the caller commits. Returns the rule, or None if the
+    description has no merchant left after normalization.
+    """
+    merchant = normalize_merchant(description or '')[:200]
+    if not merchant or category_id is None:
+        return None
+
+    rule = MerchantRule.query.filter_by(user_id=user_id, normalized_merchant=merchant).first()
+    if rule is None:
+        rule = MerchantRule(user_id=user_id, normalized_merchant=merchant)
+        db.session.add(rule)
+    rule.category_id = category_id
+    return rule
+
+def load_merchant_rules(user_id):
+    """
+    Return the user's learned rules as a {normalized_merchant: category_id}
+    dict, with one indexed query. Rules pointing at another user's category
+    are ignored.
+    """
+    return dict(
+        db.session.query(MerchantRule.normalized_merchant, MerchantRule.category_id)
+                  .join(Category, Category.id == MerchantRule.category_id)
+                  .filter(MerchantRule.user_id == user_id, Category.user_id == user_id)
+    )
+
+def forget_category_rules(category_id):
+    """Drop the rules that file merchants under a category being deleted."""
+    MerchantRule.query.filter_by(category_id=category_id).delete(synchronize_session=False)
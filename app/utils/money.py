@@ -0,0 +1,35 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from sqlalchemy.ext.hybrid import hybrid_property
+
+def to_cents(amount):
+    """Convert a dollar amount (float, str or Decimal) to integer cents."""
+    if amount is None:
+        return None
+    try:
+        # Going through str() keeps 0.1 + 0.2 style float noise out of the result
+        return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {amount!r}")
+
+def from_cents(cents):
+    """Convert integer cents back to a dollar amount."""
+    if cents is None:
+        return None
+    return cents / 100
+
+def money_property(cents_attr):
+    """
+    Expose the integer cents column `cents_attr` as a dollar amount.
+    Reads return a float, writes round to the nearest cent, and in queries
+    the attribute is the cents column divided by 100.
+    """
+    def getter(self):
+        return from_cents(getattr(self, cents_attr))
+
+    def setter(self, value):
+        setattr(self, cents_attr, to_cents(value))
+
+    def expression(cls):
+        return getattr(cls, cents_attr) / 100.0
+
+    return hybrid_property(getter, setter, expr=expression)
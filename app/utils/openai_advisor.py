@@ -5,9 +5,16 @@ from collections import defaultdict
 import traceback
 import json
 import re
+import numpy as np
+from .aggregates import month_bounds
+from .expense_frame import NO_CATEGORY
+from .money import from_cents, to_cents
 
-def get_openai_advice(expenses, categories, user_question=''):
-    """Get personalized financial advice from OpenAI."""
+def get_openai_advice(frame, categories, user_question=''):
+    """
+    Get personalized financial advice from OpenAI.
+    `frame` is an ExpenseFrame for the user.
+    """
     try:
         # Check if the message is a simple greeting
         if is_greeting(user_question):
@@ -30,7 +37,7 @@ def get_openai_advice(expenses, categories, user_question=''):
         client = OpenAI(api_key=api_key)
         
         # Prepare expense data with enhanced analysis
-        expense_summary = prepare_expense_summary(expenses, categories)
+        expense_summary = prepare_expense_summary(frame, categories)
         if not expense_summary['valid']:
             return expense_summary['messages']
         
@@ -113,9 +120,12 @@ def get_greeting_response():
     
     return random.choice(greetings)
 
-def prepare_expense_summary(expenses, categories):
-    """Prepare a summary of expense data for AI analysis."""
-    if not expenses:
+def prepare_expense_summary(frame, categories):
+    """
+    Prepare a summary of expense data for AI analysis.
+    `frame` is an ExpenseFrame for the user.
+    """
+    if not frame.count:
         return {
             'valid': False,
             'messages': [{
@@ -126,28 +136,27 @@ def prepare_expense_summary(expenses, categories):
     
     # Get current date for reference
     now = datetime.now()
-    current_month = now.month
-    current_year = now.year
+    month_start, month_end = month_bounds(now.year, now.month)
+    category_names = {category.id: category.name for category in categories}
     
     # Calculate total spending
-    total_spending = sum(expense.amount for expense in expenses)
+    total_spending, _ = frame.totals()
     
     # Group expenses by category
     category_spending = defaultdict(float)
     category_count = defaultdict(int)
-    for expense in expenses:
-        category_name = expense.category.name if expense.category else "Uncategorized"
-        category_spending[category_name] += expense.amount
-        category_count[category_name] += 1
+    for category_id, (total, count) in frame.by_category().items():
+        category_name = category_names.get(category_id, "Uncategorized")
+        category_spending[category_name] += total
+        category_count[category_name] += count
     
     # Calculate monthly trends (last 6 months)
+    monthly_spending = frame.by_month()
     monthly_trends = {}
     for i in range(6):
         month_date = now - timedelta(days=30 * i)
         month_name = month_date.strftime("%B %Y")
-        month_spending = sum(expense.amount for expense in expenses 
-                           if expense.date.month == month_date.month 
-                           and expense.date.year == month_date.year)
+        month_spending = monthly_spending.get((month_date.year, month_date.month), (0, 0))[0]
         if month_spending > 0:
             monthly_trends[month_name] = month_spending
     
@@ -155,48 +164,47 @@ def prepare_expense_summary(expenses, categories):
     top_categories = sorted(category_spending.items(), key=lambda x: x[1], reverse=True)
     
     # Calculate budget status for each category
+    current_month_spending = frame.by_category(start=month_start, end=month_end)
     budget_status = {}
     for category in categories:
-        if category.budget > 0:
-            current_month_spending = sum(e.amount for e in expenses 
-                                      if e.category_id == category.id 
-                                      and e.date.month == current_month
-                                      and e.date.year == current_year)
+        if (category.budget_cents or 0) > 0:
+            spent = current_month_spending.get(category.id, (0, 0))[0]
             budget_status[category.name] = {
                 'budget': category.budget,
-                'spent': current_month_spending,
-                'remaining': category.budget - current_month_spending,
-                'percentage': (current_month_spending / category.budget) * 100
+                'spent': spent,
+                'remaining': from_cents(category.budget_cents - to_cents(spent)),
+                'percentage': (spent / category.budget) * 100
             }
     
     # Identify recurring expenses
     recurring_expenses = []
-    expense_dict = defaultdict(list)
-    for expense in expenses:
-        key = f"{expense.description.lower()}-{expense.amount}"
-        expense_dict[key].append(expense)
-    
-    for key, exp_list in expense_dict.items():
-        if len(exp_list) >= 2:
-            recurring_expenses.append({
-                'description': exp_list[0].description,
-                'amount': exp_list[0].amount,
-                'frequency': len(exp_list),
-                'category': exp_list[0].category.name if exp_list[0].category else "Uncategorized"
-            })
+    first_rows, counts = frame.recurring_groups(2, ignore_case=True)
+    for row, count in zip(first_rows, counts):
+        recurring_expenses.append({
+            'description': frame.descriptions[row],
+            'amount': from_cents(int(frame.cents[row])),
+            'frequency': int(count),
+            'category': category_names.get(int(frame.category_ids[row]), "Uncategorized")
+        })
     
     # Identify unusual expenses (significantly higher than average for that category)
     unusual_expenses = []
-    for expense in expenses:
-        if expense.category:
-            category_avg = category_spending[expense.category.name] / category_count[expense.category.name]
-            if expense.amount > category_avg * 2 and expense.amount > 50:
-                unusual_expenses.append({
-                    'description': expense.description,
-                    'amount': expense.amount,
-                    'category': expense.category.name,
-                    'date': expense.date.strftime("%Y-%m-%d")
-                })
+    categorized = frame.category_ids != NO_CATEGORY
+    if categorized.any():
+        # Average per category name, broadcast back to every row
+        category_ids, row_keys = np.unique(frame.category_ids, return_inverse=True)
+        key_names = [category_names.get(int(c), "Uncategorized") for c in category_ids]
+        key_averages = np.array([category_spending[name] / category_count[name] for name in key_names])
+        row_averages = key_averages[row_keys]
+        amounts = frame.amounts
+        unusual = categorized & (amounts > row_averages * 2) & (frame.cents > 5000)
+        for row in np.flatnonzero(unusual):
+            unusual_expenses.append({
+                'description': frame.descriptions[row],
+                'amount': from_cents(int(frame.cents[row])),
+                'category': key_names[row_keys[row]],
+                'date': frame.date_of(row).strftime("%Y-%m-%d")
+            })
     
     return {
         'valid': True,
@@ -207,7 +215,7 @@ def prepare_expense_summary(expenses, categories):
         'budget_status': budget_status,
         'recurring_expenses': recurring_expenses,
         'unusual_expenses': unusual_expenses,
-        'expense_count': len(expenses),
+        'expense_count': frame.count,
         'category_count': len(category_spending)
     }
 
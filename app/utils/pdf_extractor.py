@@ -1,6 +1,25 @@
+import logging
 import pdfplumber
 import re
-from datetime import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+from pdfminer.pdfdevice import PDFTextDevice
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdffont import PDFUnicodeNotDefined
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.utils import apply_matrix_pt, mult_matrix
+from .import_metrics import ImportMetrics
+
+# A child of the Flask app's logger ('app'), usable in pool workers without an app context
+logger = logging.getLogger(__name__)
+
+class StatementExtractionError(Exception):
+    """A statement could not be extracted: too many pages, too slow or too big."""
 
 def clean_amount(amount_str):
     """Clean and convert amount string to float."""
@@ -13,89 +32,365 @@ def clean_amount(amount_str):
         return -float(amount_str.replace('-', ''))
     return float(amount_str)
 
-def extract_transactions_from_pdf(pdf_path):
+# Bump when parsing changes so cached parses (see statement_cache) are redone
+PARSER_VERSION = 2
+
+# Date, dollar amount and percentage tokens, matched in one left-to-right scan
+_TOKEN_RE = re.compile(
+    r'(?P<date>\d{2}/\d{2}/\d{4})'
+    r'|(?P<amount>-?\$?\d+,?\d*\.\d{2})'
+    r'|(?P<percent>\d+%)'
+)
+_SECTION_RE = re.compile(r'Payments|Transactions')
+_HEADER_RE = re.compile(r'Date|Description|Amount')
+
+@lru_cache(maxsize=4096)
+def _parse_date(date_str):
+    """Parse MM/DD/YYYY; statements repeat the same few hundred dates."""
+    return date(int(date_str[6:]), int(date_str[:2]), int(date_str[3:5]))
+
+def tokenize_line(line):
     """
-    Extract transactions from bank statement PDF.
-    Returns a list of dictionaries containing transaction details.
+    Split a statement line into (date_str, amount_strs, description) in a
+    single scan, or return None if the line has no date or no amount.
+
+    The description is the line with the transaction date, every dollar
+    amount and any percentages (Daily Cash rates) removed and whitespace
+    collapsed.
     """
-    transactions = []
+    date_str = None
+    amounts = []
+    parts = []
+    position = 0
+    for token in _TOKEN_RE.finditer(line):
+        kind = token.lastgroup
+        if kind == 'date':
+            if date_str is None:
+                date_str = token.group()
+            elif token.group() != date_str:
+                # Only the transaction date is stripped from the description
+                continue
+        elif kind == 'amount':
+            amounts.append(token.group())
+        parts.append(line[position:token.start()])
+        position = token.end()
+
+    if date_str is None or not amounts:
+        return None
+    parts.append(line[position:])
+    return date_str, amounts, ' '.join(''.join(parts).split())
+
+def parse_page_text(text, on_error=None):
+    """
+    Parse the text of one statement page.
+
+    Returns (entries, last_section). `entries` is a list of (section,
+    transaction) pairs where section is None for lines that appear before
+    the first section header on the page, i.e. lines that continue the
+    section of the previous page. `last_section` is the section in effect
+    at the end of the page, or None if the page has no section header.
+    Pages can therefore be parsed independently and stitched in order.
+    `on_error(exception)` is called for each line that looks like a
+    transaction but cannot be parsed.
+    """
+    entries = []
     current_section = None
     
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                lines = text.split('\n')
-                
-                for line in lines:
-                    # Identify section headers
-                    if 'Payments' in line:
-                        current_section = 'payments'
-                        continue
-                    elif 'Transactions' in line:
-                        current_section = 'transactions'
-                        continue
-                    
-                    # Skip header lines and empty lines
-                    if not line.strip() or 'Date' in line or 'Description' in line or 'Amount' in line:
-                        continue
-
-                    # Try to parse the line based on the current section
-                    try:
-                        # Match date pattern MM/DD/YYYY
-                        date_match = re.search(r'\d{2}/\d{2}/\d{4}', line)
-                        if not date_match:
-                            continue
-                            
-                        date_str = date_match.group()
-                        transaction_date = datetime.strptime(date_str, '%m/%d/%Y').date()
-                        
-                        # Extract amount (looking for dollar amounts)
-                        amount_matches = re.findall(r'-?\$?\d+,?\d*\.\d{2}', line)
-                        if not amount_matches:
-                            continue
-                            
-                        # Get the last amount in the line (transaction amount)
-                        amount_str = amount_matches[-1]
-                        amount = clean_amount(amount_str)
-                        
-                        # Extract description
-                        # Remove date, amounts, and any "Daily Cash" related text
-                        description = line.replace(date_str, '')
-                        for amt in amount_matches:
-                            description = description.replace(amt, '')
-                        description = re.sub(r'\d+%', '', description)  # Remove percentage
-                        description = re.sub(r'\s+', ' ', description).strip()
-                        
-                        # Skip Daily Cash redemption entries
-                        if 'Daily Cash redemption' in description:
-                            continue
-                            
-                        # Clean up description
-                        description = re.sub(r'\s+', ' ', description)
-                        description = description.strip()
-                        
-                        # Skip if no meaningful description
-                        if not description:
-                            continue
-                            
-                        # Add transaction type based on section
-                        transaction_type = 'payment' if current_section == 'payments' else 'purchase'
-                        
-                        transactions.append({
-                            'date': transaction_date,
-                            'description': description,
-                            'amount': abs(amount),  # Store positive amount
-                            'type': transaction_type
-                        })
-                        
-                    except Exception as e:
-                        print(f"Error processing line: {line}")
-                        print(f"Error details: {str(e)}")
-                        continue
+    for line in (text or '').split('\n'):
+        # Identify section headers
+        if _SECTION_RE.search(line):
+            current_section = 'payments' if 'Payments' in line else 'transactions'
+            continue
+        
+        # Skip header lines and empty lines
+        if not line or line.isspace() or _HEADER_RE.search(line):
+            continue
+
+        try:
+            tokens = tokenize_line(line)
+            if tokens is None:
+                continue
+            date_str, amount_strs, description = tokens
+            
+            # Skip Daily Cash redemption entries and lines without a description
+            if not description or 'Daily Cash redemption' in description:
+                continue
+            
+            entries.append((current_section, {
+                'date': _parse_date(date_str),
+                'description': description,
+                # The last amount in the line is the transaction amount
+                'amount': abs(clean_amount(amount_strs[-1]))  # Store positive amount
+            }))
+            
+        except Exception as e:
+            logger.debug(f"Skipping statement line {line!r}: {e}")
+            if on_error is not None:
+                on_error(e)
+            continue
     
+    return entries, current_section
+
+def _stitch_pages(page_results):
+    """
+    Resolve the section of every transaction across page boundaries and
+    yield the transactions in page order.
+    """
+    current_section = None
+    for entries, last_section in page_results:
+        for section, transaction in entries:
+            section = section or current_section
+            # Add transaction type based on section
+            transaction['type'] = 'payment' if section == 'payments' else 'purchase'
+            yield transaction
+        if last_section is not None:
+            current_section = last_section
+
+# Same tolerances pdfplumber's extract_text uses, in points
+_Y_TOLERANCE = 3
+_X_TOLERANCE = 3
+# TJ adjustments (thousandths of an em) wide enough to be a word gap
+_TJ_SPACE = 200
+
+class _RawTextDevice(PDFTextDevice):
+    """
+    Collect the text shown on a page as (y, x0, x1, text) fragments, one per
+    Tj/TJ string, without building per-character layout objects.
+    """
+    def __init__(self, rsrcmgr):
+        super().__init__(rsrcmgr)
+        self.fragments = []
+
+    def render_string(self, textstate, seq, ncs, graphicstate):
+        matrix = mult_matrix(textstate.matrix, self.ctm)
+        font = textstate.font
+        scaling = textstate.scaling * 0.01
+        fontsize = textstate.fontsize * scaling
+        charspace = textstate.charspace * scaling
+        wordspace = 0 if font.is_multibyte() else textstate.wordspace * scaling
+        dxscale = 0.001 * fontsize
+
+        start = textstate.linematrix
+        x, y = start
+        needcharspace = False
+        chars = []
+        for obj in seq:
+            if isinstance(obj, (int, float)):
+                x -= obj * dxscale
+                if obj < -_TJ_SPACE:
+                    chars.append(' ')
+                needcharspace = True
+                continue
+            for cid in font.decode(obj):
+                if needcharspace:
+                    x += charspace
+                x += font.char_width(cid) * fontsize
+                try:
+                    chars.append(font.to_unichr(cid))
+                except PDFUnicodeNotDefined:
+                    pass
+                if cid == 32:
+                    x += wordspace
+                needcharspace = True
+        textstate.linematrix = (x, y)
+
+        x0, y0 = apply_matrix_pt(matrix, start)
+        x1, _ = apply_matrix_pt(matrix, (x, y))
+        self.fragments.append((y0, x0, x1, ''.join(chars)))
+
+def _join_fragments(fragments):
+    """
+    Rebuild page text from fragments: top to bottom, fragments within
+    _Y_TOLERANCE of each other form a line, joined left to right with a
+    space wherever there is a horizontal gap.
+    """
+    lines = []
+    line = []
+    line_y = None
+    previous_x1 = None
+    for y, x0, x1, text in sorted(fragments, key=lambda fragment: (-round(fragment[0]), fragment[1])):
+        if line_y is None or abs(line_y - y) > _Y_TOLERANCE:
+            if line:
+                lines.append(''.join(line))
+            line = [text]
+            line_y = y
+        else:
+            if x0 - previous_x1 > _X_TOLERANCE:
+                line.append(' ')
+            line.append(text)
+        previous_x1 = x1
+    if line:
+        lines.append(''.join(line))
+    return '\n'.join(lines)
+
+@contextmanager
+def _open_fast_pages(pdf_path):
+    """Fast backend: read each page's content stream with pdfminer, no layout analysis."""
+    with open(pdf_path, 'rb') as f:
+        pages = list(PDFPage.create_pages(PDFDocument(PDFParser(f))))
+        rsrcmgr = PDFResourceManager(caching=True)
+
+        def page_text(page):
+            device = _RawTextDevice(rsrcmgr)
+            PDFPageInterpreter(rsrcmgr, device).process_page(page)
+            return _join_fragments(device.fragments)
+
+        yield pages, page_text
+
+@contextmanager
+def _open_layout_pages(pdf_path):
+    """Layout backend: pdfplumber's character layout analysis."""
+    with pdfplumber.open(pdf_path) as pdf:
+        yield pdf.pages, lambda page: page.extract_text()
+
+TEXT_BACKENDS = {
+    'fast': _open_fast_pages,
+    'layout': _open_layout_pages
+}
+
+# Per-process handle on the statement being extracted by a pool worker
+_worker_document = None
+_worker_pages = None
+
+def _open_worker_pdf(pdf_path, backend):
+    global _worker_document, _worker_pages
+    # Keep the context manager referenced so the file stays open for the
+    # life of the worker process
+    _worker_document = TEXT_BACKENDS[backend](pdf_path)
+    _worker_pages = _worker_document.__enter__()
+
+def _read_page(page, page_text):
+    """
+    Extract and parse one page, returning (page_result, extract_s, parse_s,
+    lines, errored_lines).
+    """
+    start = time.perf_counter()
+    text = page_text(page) or ''
+    extracted = time.perf_counter()
+    errors = []
+    page_result = parse_page_text(text, errors.append)
+    return page_result, extracted - start, time.perf_counter() - extracted, text.count('\n') + 1, len(errors)
+
+def _parse_worker_page(page_number):
+    pages, page_text = _worker_pages
+    return _read_page(pages[page_number], page_text)
+
+def _iter_page_results(pdf_path, backend, workers, min_parallel_pages, on_page=None, metrics=None, max_pages=None):
+    metrics = metrics or ImportMetrics()
+
+    def record(page_result, extract_s, parse_s, lines, errored_lines):
+        metrics.add_time('extract', extract_s)
+        metrics.add_time('parse', parse_s)
+        metrics.count('pages')
+        metrics.count('lines', lines)
+        if errored_lines:
+            metrics.count('rows_errored', errored_lines)
+        return page_result
+
+    start = time.perf_counter()
+    with TEXT_BACKENDS[backend](pdf_path) as (pages, page_text):
+        page_count = len(pages)
+        metrics.add_time('extract', time.perf_counter() - start)
+        if max_pages and page_count > max_pages:
+            raise StatementExtractionError(f"Statement has {page_count} pages; at most {max_pages} are allowed")
+        if workers <= 1 or page_count < min_parallel_pages:
+            for number, page in enumerate(pages, 1):
+                yield record(*_read_page(page, page_text))
+                if on_page is not None:
+                    on_page(number, page_count)
+            return
+
+    # Each worker opens the file once and parses whole pages; map() hands
+    # the results back in page order so the section state stitches correctly
+    executor = ProcessPoolExecutor(max_workers=min(workers, page_count),
+                                   initializer=_open_worker_pdf, initargs=(pdf_path, backend))
+    # Pool stages are summed over the workers, so they can exceed wall time
+    try:
+        for number, page_read in enumerate(executor.map(_parse_worker_page, range(page_count)), 1):
+            yield record(*page_read)
+            if on_page is not None:
+                on_page(number, page_count)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def iter_transactions_from_pdf(pdf_path, workers=1, min_parallel_pages=8, on_page=None, on_error=None,
+                               backend='auto', on_backend=None, metrics=None, max_pages=None):
+    """
+    Extract transactions from bank statement PDF, yielding them page by page.
+
+    `backend` picks how page text is read: 'fast' reads the content streams
+    directly, 'layout' runs pdfplumber's layout analysis, and 'auto' tries
+    the fast backend and falls back to layout for the whole document when
+    the fast pass finds no transactions or fails before finding any; the
+    discarded pass's page progress and counters are dropped and its time
+    is recorded as the 'fallback' stage. `on_backend(name)` reports the
+    backend that produced the transactions.
+
+    With workers > 1, statements of at least `min_parallel_pages` pages are
+    parsed on a process pool of that size. Transactions are yielded in
+    statement order either way. `on_page(pages_done, page_count)` is called
+    once the transactions of each page have been consumed, and
+    `on_error(exception)` if extraction stops early, e.g. because the
+    statement has more than `max_pages` pages. Page text extraction and line
+    parsing are timed into `metrics` (an ImportMetrics), if given. See
+    pdf_sandbox for running this in a resource-limited child process.
+    """
+    backends = ('fast', 'layout') if backend == 'auto' else (backend,)
+    try:
+        for name in backends:
+            last = name == backends[-1]
+            # A pass that may be thrown away reports progress and metrics into
+            # buffers, applied once it finds a transaction, so a fallback does
+            # not count pages twice or move the progress backwards
+            state = {'found': False, 'pending_page': None}
+            pass_metrics = metrics if last or metrics is None else ImportMetrics()
+
+            def pass_on_page(pages_done, page_count):
+                if state['found'] or last:
+                    on_page(pages_done, page_count)
+                else:
+                    state['pending_page'] = (pages_done, page_count)
+
+            try:
+                for transaction in _stitch_pages(_iter_page_results(
+                    pdf_path, name, workers, min_parallel_pages, on_page and pass_on_page, pass_metrics, max_pages
+                )):
+                    if not state['found']:
+                        state['found'] = True
+                        if on_backend is not None:
+                            on_backend(name)
+                        if state['pending_page'] is not None:
+                            on_page(*state['pending_page'])
+                    yield transaction
+            except StatementExtractionError:
+                # About the statement itself, so every backend would fail
+                raise
+            except Exception as e:
+                if state['found'] or last:
+                    raise
+                logger.warning(f"The {name} PDF backend failed ({e}), retrying with {backends[-1]}")
+                continue
+            finally:
+                if pass_metrics is not metrics:
+                    if state['found']:
+                        metrics.merge(pass_metrics.to_dict())
+                    else:
+                        # Only the time of a discarded pass is kept
+                        metrics.add_time('fallback', pass_metrics.total_ms() / 1000)
+            if state['found']:
+                return
+            if name != backends[-1]:
+                logger.info(f"No transactions found with the {name} PDF backend, retrying with {backends[-1]}")
+        if on_backend is not None:
+            on_backend(backends[-1])
     except Exception as e:
-        print(f"Error extracting transactions: {e}")
-        return []
-    
-    return transactions 
\ No newline at end of file
+        logger.warning(f"Extracting transactions from {pdf_path} failed: {e}")
+        if on_error is not None:
+            on_error(e)
+
+def extract_transactions_from_pdf(pdf_path, backend='auto'):
+    """
+    Extract transactions from bank statement PDF.
+    Returns a list of dictionaries containing transaction details.
+    """
+    return list(iter_transactions_from_pdf(pdf_path, backend=backend))
@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+import resource
+import signal
+import time
+from .import_metrics import ImportMetrics
+from .pdf_extractor import StatementExtractionError, iter_transactions_from_pdf
+
+# Transactions sent to the parent per message when a page is very long
+SEND_BATCH_SIZE = 500
+
+def _limit_address_space(memory_limit_mb):
+    """
+    Cap the address space of this process at what it already maps (the
+    forked app) plus `memory_limit_mb`, so the parse can only add that much.
+    Returns the previous limits for resource.setrlimit.
+    """
+    with open('/proc/self/statm') as f:
+        mapped = int(f.read().split()[0]) * resource.getpagesize()
+    limit = mapped + int(memory_limit_mb * 1024 * 1024)
+    previous = resource.getrlimit(resource.RLIMIT_AS)
+    soft, hard = previous
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    return previous
+
+def _describe_error(error, memory_limit_mb):
+    if isinstance(error, MemoryError):
+        return f"Statement extraction exceeded the {memory_limit_mb} MB memory limit"
+    return str(error) or type(error).__name__
+
+def _sandbox_main(conn, pdf_path, memory_limit_mb, options):
+    """Child process: extract the statement and stream the results over `conn`."""
+    # Own process group, so a timeout also kills any page-parallel pool workers
+    os.setpgrp()
+    errors = []
+    metrics = ImportMetrics()
+    batch = []
+
+    def flush():
+        if batch:
+            conn.send(('transactions', batch[:]))
+            batch.clear()
+
+    def on_page(pages_done, page_count):
+        flush()
+        conn.send(('page', pages_done, page_count))
+
+    previous_limits = None
+    try:
+        if memory_limit_mb:
+            # RLIMIT_AS is per process and the page-parallel pool workers
+            # inherit it at fork, so split the budget between this process
+            # and its workers rather than give each of them all of it
+            workers = options.get('workers', 1)
+            processes = workers + 1 if workers > 1 else 1
+            previous_limits = _limit_address_space(memory_limit_mb / processes)
+        for transaction in iter_transactions_from_pdf(
+            pdf_path, on_page=on_page, on_error=errors.append,
+            on_backend=lambda backend: conn.send(('backend', backend)),
+            metrics=metrics, **options
+        ):
+            batch.append(transaction)
+            if len(batch) >= SEND_BATCH_SIZE:
+                flush()
+        flush()
+    except Exception as e:
+        errors.append(e)
+    # Lift the limit again so a parse that ran out of memory can still report it
+    if previous_limits is not None:
+        resource.setrlimit(resource.RLIMIT_AS, previous_limits)
+    conn.send(('metrics', metrics.to_dict()))
+    if errors:
+        conn.send(('error', _describe_error(errors[0], memory_limit_mb)))
+    else:
+        conn.send(('done',))
+    conn.close()
+
+def iter_transactions_sandboxed(pdf_path, timeout=300, memory_limit_mb=2048, on_page=None, on_backend=None,
+                                metrics=None, **options):
+    """
+    iter_transactions_from_pdf in a child process, so a malformed or huge
+    PDF cannot hang or exhaust the calling worker.
+
+    The child and, with `workers` > 1, its page-parallel pool workers share
+    `memory_limit_mb` of extra address space: each of them may grow by an
+    equal part of it (RLIMIT_AS, which is per process), so the parse of one
+    statement adds at most `memory_limit_mb` in total. The caller waits for
+    the child at most `timeout` seconds in total, and time it spends on the
+    transactions it is handed does not count. On a timeout the child's
+    whole process group is killed, pool workers included. `options`
+    (backend, workers, max_pages, ...) are passed through. Transactions are
+    streamed back over a pipe page by page, and `on_page`, `on_backend` and
+    `metrics` are fed from the child as usual.
+
+    Raises StatementExtractionError with a readable message if the child
+    fails, runs out of memory or time, or dies.
+    """
+    parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_sandbox_main, name='pdf-sandbox',
+                                      args=(child_conn, pdf_path, memory_limit_mb, options))
+    process.start()
+    child_conn.close()
+
+    waited = 0.0
+    try:
+        while True:
+            start = time.monotonic()
+            ready = waited < timeout and parent_conn.poll(timeout - waited)
+            waited += time.monotonic() - start
+            if not ready:
+                raise StatementExtractionError(f"Statement extraction timed out after {timeout} seconds")
+            try:
+                message = parent_conn.recv()
+            except EOFError:
+                process.join()
+                raise StatementExtractionError(
+                    f"Statement extraction stopped unexpectedly (exit code {process.exitcode})"
+                )
+
+            kind = message[0]
+            if kind == 'transactions':
+                yield from message[1]
+            elif kind == 'page':
+                if on_page is not None:
+                    on_page(message[1], message[2])
+            elif kind == 'backend':
+                if on_backend is not None:
+                    on_backend(message[1])
+            elif kind == 'metrics':
+                if metrics is not None:
+                    metrics.merge(message[1])
+            elif kind == 'error':
+                raise StatementExtractionError(message[1])
+            else:
+                return
+    finally:
+        parent_conn.close()
+        if process.is_alive():
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        process.join()
@@ -0,0 +1,80 @@
+from functools import wraps
+from flask import g, has_request_context, request, current_app
+from sqlalchemy import event
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a view issues more SQL statements than its declared budget."""
+
+class QueryCounter:
+    """
+    Context manager counting the SQL statements sent to an engine.
+
+        with QueryCounter(db.engine) as counter:
+            ...
+        print(counter.count, counter.statements)
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+        return False
+
+def query_budget(max_queries):
+    """
+    Declare the maximum number of SQL statements a view may issue per request.
+    The budget is only checked when QUERY_BUDGET_MODE is configured.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return view(*args, **kwargs)
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+def init_query_budget(app, engine):
+    """
+    Count the statements issued by each request and compare them with the
+    view's @query_budget. QUERY_BUDGET_MODE is 'warn' to log overruns or
+    'raise' to fail the request; benchmarks/query_budget.py runs every
+    budgeted route in 'raise' mode on a small and a large dataset.
+    """
+    mode = app.config.get('QUERY_BUDGET_MODE')
+    if not mode:
+        return
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'query_count' in g:
+            g.query_count += 1
+
+    @app.before_request
+    def start_query_count():
+        g.query_count = 0
+
+    @app.after_request
+    def check_query_budget(response):
+        view = app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        if budget is None or 'query_count' not in g:
+            return response
+
+        # Statements issued while streaming a response are not counted here
+        if g.query_count > budget:
+            message = f'{request.endpoint} issued {g.query_count} queries (budget {budget})'
+            if mode == 'raise':
+                raise QueryBudgetExceeded(message)
+            current_app.logger.warning(message)
+        return response
@@ -3,6 +3,7 @@ import os
 from datetime import datetime
 from flask import current_app
 import re
+from .expense_categorizer import MerchantCache, normalize_merchant
 
 # Define flags but don't import modules yet
 TESSERACT_AVAILABLE = None
@@ -163,36 +164,45 @@ def parse_receipt_data(text):
     
     return receipt_data
 
+# Keywords suggest_category looks for in a receipt's merchant and description
+RECEIPT_CATEGORY_KEYWORDS = {
+    'grocery': ['grocery', 'supermarket', 'food', 'market', 'walmart', 'target', 'kroger', 'safeway'],
+    'dining': ['restaurant', 'cafe', 'coffee', 'starbucks', 'mcdonald', 'burger', 'pizza', 'taco'],
+    'transportation': ['gas', 'uber', 'lyft', 'taxi', 'transit', 'train', 'bus', 'metro', 'fuel'],
+    'shopping': ['amazon', 'store', 'mall', 'shop', 'retail', 'clothing', 'electronics'],
+    'utilities': ['electric', 'water', 'gas', 'internet', 'phone', 'bill', 'utility'],
+    'entertainment': ['movie', 'theater', 'netflix', 'spotify', 'hulu', 'disney', 'game'],
+    'health': ['doctor', 'pharmacy', 'medical', 'health', 'fitness', 'gym', 'hospital']
+}
+
+suggestion_cache = MerchantCache('suggest_category')
+
+def _matching_receipt_categories(key):
+    """Category names whose keywords appear in the (merchant, description) key, in table order."""
+    merchant, description = key
+    return tuple(
+        category_name for category_name, keywords in RECEIPT_CATEGORY_KEYWORDS.items()
+        if any(keyword in merchant or keyword in description for keyword in keywords)
+    )
+
 def suggest_category(merchant, description, categories):
-    """Suggest a category based on merchant name and description."""
-    merchant = merchant.lower() if merchant else ""
-    description = description.lower() if description else ""
-    
-    # Define keyword mappings
-    category_keywords = {
-        'grocery': ['grocery', 'supermarket', 'food', 'market', 'walmart', 'target', 'kroger', 'safeway'],
-        'dining': ['restaurant', 'cafe', 'coffee', 'starbucks', 'mcdonald', 'burger', 'pizza', 'taco'],
-        'transportation': ['gas', 'uber', 'lyft', 'taxi', 'transit', 'train', 'bus', 'metro', 'fuel'],
-        'shopping': ['amazon', 'store', 'mall', 'shop', 'retail', 'clothing', 'electronics'],
-        'utilities': ['electric', 'water', 'gas', 'internet', 'phone', 'bill', 'utility'],
-        'entertainment': ['movie', 'theater', 'netflix', 'spotify', 'hulu', 'disney', 'game'],
-        'health': ['doctor', 'pharmacy', 'medical', 'health', 'fitness', 'gym', 'hospital']
-    }
-    
-    # Check for category matches
-    for category_name, keywords in category_keywords.items():
-        for keyword in keywords:
-            if keyword in merchant or keyword in description:
-                # Find matching category in user's categories
-                for category in categories:
-                    if category_name.lower() in category.name.lower():
-                        return category.id
+    """
+    Suggest a category based on merchant name and description. `categories`
+    is the user's CategoryIndex.
+    """
+    key = (normalize_merchant(merchant or ''), normalize_merchant(description or ''))
+    
+    # Use the first matching category name the user has a category for
+    for category_name in suggestion_cache.get(key, _matching_receipt_categories):
+        category_id = categories.match(category_name)
+        if category_id is not None:
+            return category_id
     
     # Default to first category or None
-    return categories[0].id if categories else None
+    return categories.default_id
 
 def scan_receipt(image_path, categories):
-    """Process receipt image and extract expense data."""
+    """Process receipt image and extract expense data. `categories` is the user's CategoryIndex."""
     _check_dependencies()
     
     if not TESSERACT_AVAILABLE:
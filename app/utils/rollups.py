@@ -0,0 +1,190 @@
+from collections import defaultdict
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Expense, ExpenseRollup
+from .money import from_cents
+
+def _bucket_key(expense):
+    """Return the rollup bucket an expense belongs to."""
+    return (expense.user_id, expense.date.year, expense.date.month,
+            expense.date.day, expense.category_id)
+
+def rollup_deltas(expenses, sign=1):
+    """
+    Collapse expenses into per-bucket (total_cents, count) deltas.
+    Use sign=-1 for expenses that are being removed.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for expense in expenses:
+        delta = deltas[_bucket_key(expense)]
+        delta[0] += sign * expense.amount_cents
+        delta[1] += sign
+    return deltas
+
+def rollup_deltas_from_rows(rows, sign=1):
+    """Same as rollup_deltas, for plain expense dicts used by bulk inserts."""
+    deltas = defaultdict(lambda: [0, 0])
+    for row in rows:
+        date = row['date']
+        delta = deltas[(row['user_id'], date.year, date.month, date.day, row['category_id'])]
+        delta[0] += sign * row['amount_cents']
+        delta[1] += sign
+    return deltas
+
+_BUCKET_COLUMNS = ('user_id', 'year', 'month', 'day', 'category_id')
+
+def _upsert_statement(dialect_name):
+    """
+    INSERT ... ON CONFLICT DO UPDATE that adds a delta to its bucket, or
+    None on backends without it.
+    """
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    table = ExpenseRollup.__table__
+    statement = insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=list(_BUCKET_COLUMNS),
+        set_={
+            'total_cents': table.c.total_cents + statement.excluded.total_cents,
+            'count': table.c.count + statement.excluded.count
+        }
+    )
+
+def _add_to_bucket(key, total_cents, count):
+    """
+    Add one delta with an UPDATE that increments the bucket in the database,
+    creating the bucket if there is none. A concurrent writer creating the
+    same bucket first makes the INSERT fail, and the delta is added to its row.
+    """
+    table = ExpenseRollup.__table__
+    conditions = [
+        table.c.category_id.is_(None) if value is None else table.c[column] == value
+        for column, value in zip(_BUCKET_COLUMNS, key)
+    ]
+    increment = table.update().where(*conditions).values(
+        total_cents=table.c.total_cents + total_cents,
+        count=table.c.count + count
+    )
+    if db.session.execute(increment).rowcount or count <= 0:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(table.insert().values(
+                dict(zip(_BUCKET_COLUMNS, key), total_cents=total_cents, count=count)
+            ))
+    except IntegrityError:
+        db.session.execute(increment)
+
+def apply_rollup_deltas(deltas):
+    """
+    Apply bucket deltas to the rollup table in the current session.
+    The caller is responsible for committing.
+
+    Totals are added in the database rather than read, changed and written
+    back, so imports in the worker and edits in web requests can update
+    the same buckets at once without losing each other's changes. On SQLite
+    and PostgreSQL all deltas go out as one executemany upsert; buckets
+    without a category (NULLs never conflict) and other backends are
+    updated one bucket at a time. Buckets left without expenses are then
+    dropped with one DELETE.
+    """
+    if not deltas:
+        return
+
+    upsert = _upsert_statement(db.session.get_bind().dialect.name)
+    rows = []
+    for key, (total_cents, count) in deltas.items():
+        if upsert is not None and key[-1] is not None:
+            rows.append(dict(zip(_BUCKET_COLUMNS, key), total_cents=total_cents, count=count))
+        else:
+            _add_to_bucket(key, total_cents, count)
+    if rows:
+        db.session.execute(upsert, rows)
+
+    # Drop buckets that no longer hold any expenses
+    ExpenseRollup.query.filter(
+        ExpenseRollup.user_id.in_({key[0] for key in deltas}),
+        ExpenseRollup.count <= 0
+    ).delete(synchronize_session=False)
+
+def add_to_rollups(*expenses):
+    """Record newly created expenses in the rollup table."""
+    apply_rollup_deltas(rollup_deltas(expenses))
+
+def remove_from_rollups(*expenses):
+    """Remove deleted expenses from the rollup table."""
+    apply_rollup_deltas(rollup_deltas(expenses, sign=-1))
+
+def clear_user_rollups(user_id):
+    """Delete every rollup bucket for a user."""
+    ExpenseRollup.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+def clear_category_rollups(category_id):
+    """Delete every rollup bucket for a category."""
+    ExpenseRollup.query.filter_by(category_id=category_id).delete(synchronize_session=False)
+
+def rebuild_user_rollups(user_id):
+    """Recompute all rollup buckets for a user from the expenses table."""
+    clear_user_rollups(user_id)
+
+    year = db.extract('year', Expense.date)
+    month = db.extract('month', Expense.date)
+    day = db.extract('day', Expense.date)
+    buckets = db.session.query(
+        year, month, day, Expense.category_id,
+        db.func.sum(Expense.amount_cents), db.func.count(Expense.id)
+    ).filter(
+        Expense.user_id == user_id
+    ).group_by(year, month, day, Expense.category_id).all()
+
+    db.session.add_all([
+        ExpenseRollup(user_id=user_id, year=int(y), month=int(m), day=int(d),
+                      category_id=category_id, total_cents=total_cents or 0, count=count)
+        for y, m, d, category_id, total_cents, count in buckets
+    ])
+    return len(buckets)
+
+def monthly_totals(user_id, months, today):
+    """Return {'YYYY-MM': total} for the last `months` months ending at `today`."""
+    keys = []
+    year, month = today.year, today.month
+    for _ in range(months):
+        keys.append((year, month))
+        month -= 1
+        if month <= 0:
+            month += 12
+            year -= 1
+
+    rows = db.session.query(
+        ExpenseRollup.year, ExpenseRollup.month, db.func.sum(ExpenseRollup.total_cents)
+    ).filter(
+        ExpenseRollup.user_id == user_id,
+        db.or_(*[db.and_(ExpenseRollup.year == y, ExpenseRollup.month == m) for y, m in keys])
+    ).group_by(ExpenseRollup.year, ExpenseRollup.month).all()
+
+    totals = {(y, m): from_cents(total_cents) for y, m, total_cents in rows}
+    return {f"{y}-{m:02d}": totals.get((y, m), 0) for y, m in keys}
+
+def category_totals(user_id):
+    """Return {category_id: total} across the user's full history."""
+    rows = db.session.query(
+        ExpenseRollup.category_id, db.func.sum(ExpenseRollup.total_cents)
+    ).filter(
+        ExpenseRollup.user_id == user_id
+    ).group_by(ExpenseRollup.category_id).all()
+    return {category_id: from_cents(total_cents) for category_id, total_cents in rows}
+
+def daily_totals(user_id, year, month):
+    """Return {day: total} for a single month."""
+    rows = db.session.query(
+        ExpenseRollup.day, db.func.sum(ExpenseRollup.total_cents)
+    ).filter(
+        ExpenseRollup.user_id == user_id,
+        ExpenseRollup.year == year,
+        ExpenseRollup.month == month
+    ).group_by(ExpenseRollup.day).all()
+    return {day: from_cents(total_cents) for day, total_cents in rows}
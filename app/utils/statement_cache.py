@@ -0,0 +1,68 @@
+import hashlib
+import json
+import zlib
+from datetime import date
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import ParsedStatement
+from .pdf_extractor import PARSER_VERSION
+
+CHUNK_SIZE = 64 * 1024
+
+def save_upload(upload, filepath):
+    """
+    Stream an uploaded file to `filepath` in chunks and return the SHA-256
+    of its bytes, so hashing costs no extra pass over the file.
+    """
+    return save_stream(upload.stream, filepath)
+
+def save_stream(stream, filepath):
+    """save_upload for any readable binary stream, e.g. a zip member."""
+    digest = hashlib.sha256()
+    with open(filepath, 'wb') as f:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+def pack_transactions(transactions):
+    """Serialize extracted transactions as zlib-compressed JSON rows."""
+    rows = [
+        [t['date'].toordinal(), t['description'], t['amount'], 1 if t['type'] == 'payment' else 0]
+        for t in transactions
+    ]
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode('utf-8'))
+
+def unpack_transactions(data):
+    """Inverse of pack_transactions."""
+    return [{
+        'date': date.fromordinal(ordinal),
+        'description': description,
+        'amount': amount,
+        'type': 'payment' if is_payment else 'purchase'
+    } for ordinal, description, amount, is_payment in json.loads(zlib.decompress(data))]
+
+def load_parsed_statement(sha256):
+    """Return the cached transactions for a statement hash, or None."""
+    if not sha256:
+        return None
+    data = db.session.query(ParsedStatement.transactions).filter_by(
+        sha256=sha256, parser_version=PARSER_VERSION
+    ).scalar()
+    return unpack_transactions(data) if data is not None else None
+
+def store_parsed_statement(sha256, transactions):
+    """
+    Cache the transactions parsed from a statement and commit. Another job
+    caching the same file first is not an error.
+    """
+    db.session.add(ParsedStatement(sha256=sha256, parser_version=PARSER_VERSION,
+                                   transaction_count=len(transactions),
+                                   transactions=pack_transactions(transactions)))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
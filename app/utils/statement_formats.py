@@ -0,0 +1,238 @@
+import csv
+import html
+import logging
+import os
+from datetime import date, datetime
+from functools import lru_cache
+from .pdf_extractor import clean_amount, iter_transactions_from_pdf
+from .pdf_sandbox import iter_transactions_sandboxed
+
+# A child of the Flask app's logger ('app'), usable in pool workers without an app context
+logger = logging.getLogger(__name__)
+
+# Bytes read per chunk when scanning OFX files, which may have no newlines
+CHUNK_SIZE = 64 * 1024
+
+_DATE_FORMATS = ('%m/%d/%Y', '%Y-%m-%d', '%m/%d/%y', '%d.%m.%Y')
+
+@lru_cache(maxsize=4096)
+def parse_statement_date(date_str):
+    """Parse a date in any of the formats banks export; exports repeat the same dates."""
+    date_str = date_str.strip()
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date: {date_str}")
+
+def _transaction(transaction_date, description, amount, is_payment):
+    """Build a transaction dict shaped like the PDF extractor's output."""
+    return {
+        'date': transaction_date,
+        'description': ' '.join(description.split()),
+        'amount': abs(amount),  # Store positive amount
+        'type': 'payment' if is_payment else 'purchase'
+    }
+
+# Header names banks use for each CSV column, matched case-insensitively
+_CSV_COLUMNS = {
+    'date': ('transaction date', 'date', 'posted date', 'posting date', 'trans. date'),
+    'description': ('description', 'merchant', 'payee', 'name', 'details'),
+    'amount': ('amount (usd)', 'amount', 'transaction amount'),
+    'debit': ('debit', 'withdrawal', 'withdrawals'),
+    'credit': ('credit', 'deposit', 'deposits'),
+    'type': ('type', 'transaction type')
+}
+
+def _csv_columns(header):
+    """Map each known column to its index in a CSV header row."""
+    names = [name.strip().lower() for name in header]
+    columns = {}
+    for column, aliases in _CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                columns[column] = names.index(alias)
+                break
+    if 'date' not in columns or 'description' not in columns:
+        raise ValueError("CSV needs a date and a description column")
+    if 'amount' not in columns and 'debit' not in columns:
+        raise ValueError("CSV needs an amount or a debit column")
+    return columns
+
+def iter_transactions_from_csv(path, metrics=None):
+    """
+    Yield transactions from a CSV export one row at a time.
+
+    The header row picks the columns (see _CSV_COLUMNS). With a single
+    amount column, negative amounts or a Type of "Payment" are payments,
+    as in Apple Card exports; with separate debit and credit columns,
+    credits are payments. Rows that cannot be parsed are skipped and
+    counted as rows_errored in `metrics`, if given.
+    """
+    with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        reader = csv.reader(f)
+        columns = _csv_columns(next(reader, None) or [])
+        date_col = columns['date']
+        description_col = columns['description']
+        amount_col = columns.get('amount')
+        debit_col = columns.get('debit')
+        credit_col = columns.get('credit')
+        type_col = columns.get('type')
+
+        for row in reader:
+            if not row or not any(row):
+                continue
+            try:
+                if amount_col is not None:
+                    amount = clean_amount(row[amount_col])
+                    is_payment = amount < 0
+                elif row[debit_col].strip():
+                    amount, is_payment = clean_amount(row[debit_col]), False
+                else:
+                    amount, is_payment = clean_amount(row[credit_col]), True
+                if type_col is not None and row[type_col].strip().lower() == 'payment':
+                    is_payment = True
+                yield _transaction(parse_statement_date(row[date_col]), row[description_col],
+                                   amount, is_payment)
+            except (IndexError, ValueError) as e:
+                logger.debug(f"Skipping CSV row {reader.line_num}: {e}")
+                if metrics is not None:
+                    metrics.count('rows_errored')
+                continue
+
+def _ofx_elements(f):
+    """
+    Yield (tag, value) pairs from an OFX file read in fixed-size chunks.
+    Closing tags yield ('/TAG', ''). Works for both SGML (OFX 1.x, no closing
+    tags on values) and XML (OFX 2.x) files, with or without newlines.
+    """
+    pending = ''
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        pending += chunk
+        parts = pending.split('<')
+        # The last part may be cut off mid-element; keep it for the next chunk
+        pending = parts.pop()
+        for part in parts:
+            tag, _, value = part.partition('>')
+            if tag:
+                yield tag.strip().upper(), value.strip()
+    tag, _, value = pending.partition('>')
+    if tag:
+        yield tag.strip().upper(), value.strip()
+
+def _ofx_date(value):
+    """OFX dates are YYYYMMDD followed by an optional time and timezone."""
+    return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+
+def iter_transactions_from_ofx(path, metrics=None):
+    """
+    Yield the STMTTRN records of an OFX/QFX download one at a time.
+    Positive amounts are credits to the account, i.e. payments. Records
+    that cannot be parsed are counted as rows_errored in `metrics`.
+    """
+    with open(path, encoding='utf-8', errors='replace') as f:
+        record = None
+        for tag, value in _ofx_elements(f):
+            if tag == 'STMTTRN':
+                record = {}
+            elif tag == '/STMTTRN':
+                if record is None:
+                    continue
+                try:
+                    amount = clean_amount(record['TRNAMT'])
+                    description = record.get('NAME') or record.get('MEMO') or record.get('PAYEE', '')
+                    yield _transaction(_ofx_date(record['DTPOSTED']), description, amount, amount > 0)
+                except (KeyError, ValueError) as e:
+                    logger.debug(f"Skipping OFX transaction: {e}")
+                    if metrics is not None:
+                        metrics.count('rows_errored')
+                record = None
+            elif record is not None and not tag.startswith('/'):
+                record[tag] = html.unescape(value)
+
+def _qif_date(value):
+    """QIF dates look like 01/15/2024, 1/15/24 or 1/15'24."""
+    return parse_statement_date(value.replace("'", '/').replace(' ', '0'))
+
+def iter_transactions_from_qif(path, metrics=None):
+    """
+    Yield the records of a QIF export one at a time.
+    Positive amounts are deposits to the account, i.e. payments. Records
+    that cannot be parsed are counted as rows_errored in `metrics`.
+    """
+    with open(path, encoding='utf-8', errors='replace') as f:
+        record = {}
+        for line in f:
+            line = line.rstrip('\r\n')
+            if not line or line.startswith('!'):
+                continue
+            code, value = line[0], line[1:]
+            if code != '^':
+                record.setdefault(code, value)
+                continue
+            try:
+                if record:
+                    amount = clean_amount(record.get('T') or record['U'])
+                    description = record.get('P') or record.get('M', '')
+                    yield _transaction(_qif_date(record['D']), description, amount, amount > 0)
+            except (KeyError, ValueError) as e:
+                logger.debug(f"Skipping QIF record: {e}")
+                if metrics is not None:
+                    metrics.count('rows_errored')
+            record = {}
+
+STATEMENT_EXTENSIONS = ('.pdf', '.csv', '.ofx', '.qfx', '.qif')
+
+def is_statement_file(path):
+    return os.path.splitext(path)[1].lower() in STATEMENT_EXTENSIONS
+
+def is_pdf_statement(path):
+    """PDFs are the only statements slow enough to parse to be worth caching."""
+    return os.path.splitext(path)[1].lower() == '.pdf'
+
+def iter_statement_transactions(path, on_error=None, on_backend=None, metrics=None, sandbox=None, **pdf_options):
+    """
+    Stream the transactions of an uploaded statement, picking the parser
+    from the file extension. PDFs go through iter_transactions_from_pdf with
+    `pdf_options`; CSV, OFX/QFX and QIF files are read incrementally, so
+    memory use does not grow with the size of the file. `on_error` is
+    called with the exception if the file cannot be read to the end, and
+    `on_backend(name)` with the parser used: the PDF text backend, or
+    'csv', 'ofx' or 'qif'. Parsing is timed into `metrics`, if given.
+
+    With `sandbox` (keyword arguments for iter_transactions_sandboxed, e.g.
+    timeout and memory_limit_mb), PDFs are parsed in a resource-limited
+    child process and a failed extraction raises StatementExtractionError
+    instead of calling `on_error`.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.pdf' and sandbox is not None:
+        yield from iter_transactions_sandboxed(path, on_backend=on_backend, metrics=metrics,
+                                               **sandbox, **pdf_options)
+        return
+    if extension == '.pdf':
+        yield from iter_transactions_from_pdf(path, on_error=on_error, on_backend=on_backend,
+                                              metrics=metrics, **pdf_options)
+        return
+
+    parsers = {
+        '.csv': iter_transactions_from_csv,
+        '.ofx': iter_transactions_from_ofx,
+        '.qfx': iter_transactions_from_ofx,
+        '.qif': iter_transactions_from_qif
+    }
+    if extension not in parsers:
+        raise ValueError(f"Unsupported statement format: {extension or path}")
+    if on_backend is not None:
+        on_backend('ofx' if extension == '.qfx' else extension[1:])
+    transactions = parsers[extension](path, metrics)
+    try:
+        yield from (metrics.timed(transactions, 'parse') if metrics is not None else transactions)
+    except Exception as e:
+        logger.warning(f"Extracting transactions from {os.path.basename(path)} failed: {e}")
+        if on_error is not None:
+            on_error(e)
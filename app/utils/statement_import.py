@@ -0,0 +1,271 @@
+import hashlib
+from collections import Counter, OrderedDict
+from app import db
+from app.models import Category, Expense
+from .expense_categorizer import FALLBACK_CATEGORY, categorize_expense, category_cache, normalize_merchant
+from .merchant_rules import load_merchant_rules
+from .category_index import CategoryIndex
+from .expense_classifier import categorize_many
+from .rollups import apply_rollup_deltas, rollup_deltas_from_rows
+from .analytics_cache import bump_data_version
+from .money import to_cents
+from .import_metrics import ImportMetrics
+
+def _resolve_categories(user_id, fallback_category):
+    """
+    Index the user's categories once for the import (see CategoryIndex),
+    creating the fallback category if the user has none of exactly that
+    name. Returns (index, fallback category id).
+    """
+    category_index = CategoryIndex.for_user(user_id)
+    fallback_id = category_index.exact(fallback_category)
+    if fallback_id is None:
+        category = Category(name=fallback_category, budget=200.0, user_id=user_id)
+        db.session.add(category)
+        db.session.flush()
+        # Cached indexes of this user are stale now
+        bump_data_version(user_id)
+        category_index.add(category.id, category.name)
+        fallback_id = category.id
+    return category_index, fallback_id
+
+def normalize_description(description):
+    """Casefold a description and collapse its whitespace for fingerprinting."""
+    return ' '.join(description.casefold().split())
+
+def transaction_fingerprint(date, normalized_description, amount_cents, source, occurrence=0):
+    """
+    Identify an imported transaction by its day, normalized description,
+    amount and source. `occurrence` numbers identical transactions on the
+    same day (two coffees for the same price), so each keeps its own row.
+    """
+    key = f"{date:%Y-%m-%d}|{normalized_description}|{amount_cents}|{source}|{occurrence}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+class OccurrenceWindow:
+    """
+    Numbers identical transactions (same day, description and amount) in
+    the order a statement lists them, for transaction_fingerprint.
+
+    Counts are kept per day for the `max_days` days seen most recently, so
+    memory is bounded by the transactions of those days, not by the size of
+    the statement. Statements list transactions by date, sometimes in a few
+    date-ordered sections (purchases, then payments), so a day's identical
+    transactions always fall inside the window. Only an identical
+    transaction listed again after `max_days` other days would be numbered
+    from zero again.
+    """
+
+    def __init__(self, max_days=62):
+        self.max_days = max_days
+        self._days = OrderedDict()
+
+    def next(self, date, key):
+        """Return how many times `key` was already seen on `date`, and count this one."""
+        counts = self._days.get(date)
+        if counts is None:
+            counts = self._days[date] = Counter()
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+        else:
+            self._days.move_to_end(date)
+        occurrence = counts[key]
+        counts[key] += 1
+        return occurrence
+
+def build_expense_row(transaction, user_id, source, occurrences):
+    """
+    Turn one extracted transaction into an expense row dict with its
+    fingerprint. `occurrences` (an OccurrenceWindow) numbers identical
+    transactions seen so far in this statement. The category is resolved
+    later, for new rows only.
+    """
+    amount_cents = to_cents(transaction['amount'])
+    if (transaction.get('type') or '').lower() == 'payment':
+        amount_cents = -amount_cents
+
+    date = transaction['date']
+    description = transaction['description'][:200]
+    normalized = normalize_description(description)
+    # Count by an 8-byte digest, so the window holds a small int per
+    # transaction rather than its description
+    key = int.from_bytes(hashlib.blake2b(
+        f"{normalized}|{amount_cents}".encode('utf-8'), digest_size=8
+    ).digest(), 'big')
+    occurrence = occurrences.next(date, key)
+
+    return {
+        'amount_cents': amount_cents,
+        'description': description,
+        'date': date,
+        'user_id': user_id,
+        'source': source,
+        'fingerprint': transaction_fingerprint(date, normalized, amount_cents, source, occurrence)
+    }
+
+def _existing_fingerprints(user_id, fingerprints):
+    """Return the subset of `fingerprints` already imported for the user."""
+    return {
+        fingerprint for (fingerprint,) in db.session.query(Expense.fingerprint).filter(
+            Expense.user_id == user_id,
+            Expense.fingerprint.in_(fingerprints)
+        )
+    }
+
+def import_transactions(user_id, transactions, source, fallback_category=FALLBACK_CATEGORY, batch_size=1000, on_batch=None,
+                        metrics=None):
+    """
+    Merge extracted statement transactions into a user's expenses.
+
+    Every transaction gets a fingerprint (see transaction_fingerprint) that is
+    unique per user, so each batch costs one indexed lookup of the batch's
+    fingerprints and only unseen transactions are inserted. Re-importing the
+    same or an overlapping statement therefore leaves existing rows alone.
+    Categories and the user's learned merchant rules (see MerchantRule) are
+    loaded once up front. A new row whose merchant has a rule takes the rule's
+    category, the rest go through categorize_expense, and rows no keyword
+    matches are scored in one batch by the user's classifier (see
+    categorize_many), which fills in confident predictions. New rows are written with
+    executemany INSERTs of `batch_size` rows and the rollup table is updated
+    with one delta per bucket. Every batch that inserts rows bumps the user's
+    data version so cached analytics are invalidated. Nothing is committed
+    here, so the whole import is a single transaction owned by the caller.
+
+    `on_batch`, if given, is called with the running result after each
+    batch is written; background jobs use it to commit and report progress.
+    Each batch's rows, rollups and data version bump commit together there.
+    Stage times and row counts are added to `metrics` (an ImportMetrics),
+    if given.
+
+    Memory use does not grow with the number of rows: an import holds one
+    batch of `batch_size` rows and its fingerprint lookup, plus the
+    OccurrenceWindow counts for the transactions of the last 62 days seen
+    in the statement. Only the list of rows that could not be imported
+    grows.
+
+    Returns a dict with the number of rows imported, skipped and already
+    present (duplicates), plus a list of (index, description, error) tuples
+    for rows that could not be imported.
+    """
+    result = import_statements(user_id, [transactions], source, fallback_category, batch_size, on_batch, metrics)
+    del result['statements']
+    return result
+
+def _new_result():
+    return {
+        'imported': 0,
+        'skipped': 0,
+        'duplicates': 0,
+        'errors': []
+    }
+
+def import_statements(user_id, statements, source, fallback_category=FALLBACK_CATEGORY, batch_size=1000, on_batch=None,
+                      metrics=None):
+    """
+    Merge the transactions of several statements into a user's expenses, as
+    import_transactions does for one. Rows from all statements share the same
+    insert batches, so a batch upload costs one bulk insert per `batch_size`
+    rows rather than per file. Identical transactions are numbered within
+    each statement, so two statements that overlap in time still merge.
+
+    Returns the totals like import_transactions, plus a 'statements' list
+    with the same counts for each statement, in order.
+    """
+    metrics = metrics or ImportMetrics()
+    cache_hits, cache_misses = category_cache.hits, category_cache.misses
+    with metrics.stage('categories'):
+        category_index, fallback_id = _resolve_categories(user_id, fallback_category)
+        merchant_rules = load_merchant_rules(user_id)
+
+    result = _new_result()
+    result['statements'] = []
+    batch = []
+    batch_results = []
+
+    def flush_batch():
+        if not batch:
+            return
+        with metrics.stage('dedupe'):
+            existing = _existing_fingerprints(user_id, [row['fingerprint'] for row in batch])
+            new_rows = []
+            for row, statement_result in zip(batch, batch_results):
+                # Overlapping statements can repeat a transaction within one batch
+                if row['fingerprint'] in existing:
+                    statement_result['duplicates'] += 1
+                    continue
+                existing.add(row['fingerprint'])
+                statement_result['imported'] += 1
+                new_rows.append(row)
+
+        with metrics.stage('categorize'):
+            unmatched = []
+            for row in new_rows:
+                # The user's own correction for this merchant beats the keyword scan
+                category_id = merchant_rules.get(normalize_merchant(row['description'])) if merchant_rules else None
+                if category_id is not None:
+                    metrics.count('merchant_rule_hits')
+                else:
+                    category_name = categorize_expense(row['description'])
+                    if category_name != FALLBACK_CATEGORY:
+                        category_id = category_index.match(category_name)
+                    if category_id is None:
+                        unmatched.append(row)
+                        category_id = fallback_id
+                row['category_id'] = category_id
+
+            if unmatched:
+                predictions = categorize_many([row['description'] for row in unmatched], user_id)
+                for row, category_id in zip(unmatched, predictions):
+                    if category_id in category_index.ids:
+                        row['category_id'] = category_id
+                        metrics.count('classifier_hits')
+
+        if new_rows:
+            with metrics.stage('insert'):
+                db.session.execute(db.insert(Expense), new_rows)
+            with metrics.stage('rollups'):
+                apply_rollup_deltas(rollup_deltas_from_rows(new_rows))
+            # In the batch's transaction, so rows a caller commits through
+            # on_batch invalidate cached analytics even if the import fails later
+            bump_data_version(user_id)
+        result['imported'] += len(new_rows)
+        result['duplicates'] += len(batch) - len(new_rows)
+        batch.clear()
+        batch_results.clear()
+        if on_batch is not None:
+            on_batch(result)
+
+    for transactions in statements:
+        statement_result = _new_result()
+        result['statements'].append(statement_result)
+        occurrences = OccurrenceWindow()
+
+        for index, transaction in enumerate(transactions):
+            try:
+                # Skip zero amount transactions
+                if not transaction['amount']:
+                    statement_result['skipped'] += 1
+                    result['skipped'] += 1
+                    continue
+
+                batch.append(build_expense_row(transaction, user_id, source, occurrences))
+                batch_results.append(statement_result)
+            except (KeyError, TypeError, ValueError) as e:
+                error = (index, transaction.get('description', ''), str(e))
+                statement_result['errors'].append(error)
+                result['errors'].append(error)
+                continue
+
+            if len(batch) >= batch_size:
+                flush_batch()
+
+    flush_batch()
+
+    metrics.count('transactions', result['imported'] + result['duplicates'] + result['skipped'] + len(result['errors']))
+    metrics.count('rows_inserted', result['imported'])
+    metrics.count('duplicates', result['duplicates'])
+    metrics.count('skipped', result['skipped'])
+    metrics.count('errors', len(result['errors']))
+    metrics.count('category_cache_hits', category_cache.hits - cache_hits)
+    metrics.count('category_cache_misses', category_cache.misses - cache_misses)
+    return result
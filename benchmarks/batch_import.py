@@ -0,0 +1,74 @@
+"""Batch statement import benchmark.
+
+Writes a year of synthetic monthly statement PDFs, queues them as one batch
+upload and runs the batch with sequential extraction and on a process pool,
+printing statements/second and whether both runs imported the same rows.
+
+    python -m benchmarks.batch_import --statements 12 --workers 4
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+
+from app import db
+from app.models import Expense, Statement
+from app.utils.import_jobs import claim_batch_jobs, claim_next_job, enqueue_import_batch, run_import_batch
+from benchmarks.common import make_app, seed_users, write_statement_pdf
+
+def run(directory, paths, workers):
+    app, db_path = make_app(os.path.join(directory, f'batch-{workers}.db'), IMPORT_BATCH_WORKERS=workers)
+    with app.app_context():
+        db.create_all()
+        user_id = next(iter(seed_users(1)))
+        uploads = []
+        for path in paths:
+            # Jobs delete their file when done, so each run imports copies
+            filepath = os.path.join(directory, f'{workers}-{os.path.basename(path)}')
+            shutil.copy(path, filepath)
+            statement = Statement(filename=os.path.basename(path), user_id=user_id)
+            db.session.add(statement)
+            uploads.append((statement, filepath))
+        enqueue_import_batch(user_id, uploads, 'statement')
+
+        start = time.perf_counter()
+        jobs = claim_batch_jobs(claim_next_job('benchmark'))
+        run_import_batch(jobs)
+        elapsed = time.perf_counter() - start
+        rows = db.session.query(Expense.fingerprint).order_by(Expense.fingerprint).all()
+        failed = sum(job.status != 'done' for job in jobs)
+    return elapsed, rows, failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--statements', type=int, default=12)
+    parser.add_argument('--pages', type=int, default=4, help='pages per statement')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    directory = os.path.dirname(make_app()[1])
+    paths = []
+    for month in range(args.statements):
+        path = os.path.join(directory, f'statement-{month + 1:02d}.pdf')
+        write_statement_pdf(path, args.pages, seed=month)
+        paths.append(path)
+    print(f"Wrote {args.statements} statements of {args.pages} pages to {directory}")
+
+    results = {}
+    for name, workers in (('sequential', 1), (f'{args.workers} workers', args.workers)):
+        elapsed, rows, failed = run(directory, paths, workers)
+        results[name] = rows
+        print(f"{name:>12}: {len(rows)} rows from {args.statements - failed} statements in {elapsed:.2f}s "
+              f"({args.statements / elapsed:.1f} statements/s)")
+
+    sequential, parallel = results.values()
+    if sequential != parallel:
+        print("Parallel batch import differs from sequential import")
+        return 1
+    print("Sequential and parallel batch imports match")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""Expense classifier benchmark.
+
+Trains the hashed n-gram naive Bayes classifier on synthetic labeled
+expenses, where some merchants have no keyword and their category is only
+learnable from the user's history, then scores held-out descriptions in
+import-sized batches. Prints training and scoring descriptions/second,
+accuracy and coverage at the configured confidence threshold next to the
+keyword categorizer's, the model file size and its cold-load time.
+
+    python -m benchmarks.classifier --examples 200000 --batch-size 1000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.utils.expense_categorizer import categorize_expense, keyword_rules
+from app.utils.expense_classifier import NaiveBayesClassifier
+from config import Config
+
+CATEGORIES = ['Groceries', 'Dining', 'Transportation', 'Shopping', 'Utilities', 'Entertainment', 'Healthcare', 'Other']
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'to', 'ne', 'su', 'vi', 'bo', 'de', 'an', 'el']
+
+def synthetic_history(count, merchants=3000, seed=0):
+    """
+    (descriptions, labels) for `count` expenses over a pool of merchants.
+    Merchants named after a keyword take the category categorize_expense
+    gives them; made-up names get a fixed random category the keywords
+    cannot know.
+    """
+    rnd = random.Random(seed)
+    keywords = [keyword for _, keywords in keyword_rules() for keyword in keywords]
+    pool = []
+    for _ in range(merchants):
+        if rnd.random() < 0.6:
+            name = rnd.choice(keywords).upper()
+            category = categorize_expense(name)
+            category = category if category in CATEGORIES else 'Other'
+        else:
+            name = ''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))).upper()
+            category = rnd.choice(CATEGORIES)
+        pool.append((f"{name} {rnd.choice(['', 'LLC', 'INC', 'NYC'])}".strip(), category))
+    weights = [1 / rank for rank in range(1, merchants + 1)]
+    descriptions, labels = [], []
+    for name, category in rnd.choices(pool, weights, k=count):
+        descriptions.append(f"{name} #{rnd.randint(100, 9999)}")
+        labels.append(CATEGORIES.index(category))
+    return descriptions, np.asarray(labels)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--examples', type=int, default=200000, help='labeled expenses, 80%% for training')
+    parser.add_argument('--batch-size', type=int, default=1000, help='descriptions scored per call, like an import batch')
+    parser.add_argument('--min-confidence', type=float, default=Config.CLASSIFIER_MIN_CONFIDENCE)
+    args = parser.parse_args(argv)
+
+    descriptions, labels = synthetic_history(args.examples)
+    split = int(len(descriptions) * 0.8)
+    train, test = descriptions[:split], descriptions[split:]
+
+    model = NaiveBayesClassifier()
+    start = time.perf_counter()
+    for i in range(0, split, 5000):
+        model.partial_fit(train[i:i + 5000], labels[i:i + 5000])
+    elapsed = time.perf_counter() - start
+    print(f"Trained on {split:,} expenses in {elapsed:.2f}s ({split / elapsed:,.0f} descriptions/s)")
+
+    start = time.perf_counter()
+    predictions, confidences = [], []
+    for i in range(0, len(test), args.batch_size):
+        predicted, confidence = model.predict(test[i:i + args.batch_size])
+        predictions.append(predicted)
+        confidences.append(confidence)
+    elapsed = time.perf_counter() - start
+    predicted, confidence = np.concatenate(predictions), np.concatenate(confidences)
+    print(f"Scored {len(test):,} descriptions in batches of {args.batch_size} in {elapsed:.2f}s "
+          f"({len(test) / elapsed:,.0f} descriptions/s)")
+
+    truth = labels[split:]
+    confident = confidence >= args.min_confidence
+    keyword = np.asarray([CATEGORIES.index(name) if name in CATEGORIES else CATEGORIES.index('Other')
+                          for name in map(categorize_expense, test)])
+    print(f"  keywords: {(keyword == truth).mean():.1%} correct")
+    print(f"classifier: {(predicted == truth).mean():.1%} correct, {confident.mean():.1%} of rows at "
+          f"confidence >= {args.min_confidence}, {(predicted == truth)[confident].mean():.1%} correct among them")
+    # What an import does: keywords first, the classifier for rows they leave as Other
+    combined = np.where((keyword == CATEGORIES.index('Other')) & confident, predicted, keyword)
+    print(f"  combined: {(combined == truth).mean():.1%} correct")
+
+    path = os.path.join(tempfile.mkdtemp(prefix='expense-bench-'), 'model.npz')
+    model.save(path)
+    start = time.perf_counter()
+    loaded = NaiveBayesClassifier.load(path)
+    loaded.predict(test[:1])
+    elapsed = time.perf_counter() - start
+    print(f"Model file: {os.path.getsize(path) / 1024:.0f} KB, cold load and first prediction in {elapsed * 1000:.1f} ms")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks build a throwaway app against their own SQLite file so they never
+touch the development database. Run them from the repository root, e.g.
+
+    python -m benchmarks.query_plans --rows 2000000
+"""
+
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from config import Config
+from app import create_app, db
+from app.models import User, Category, Expense, Reminder, FinancialGoal
+
+DEFAULT_CATEGORIES = [
+    ('Groceries', 500.0),
+    ('Transportation', 200.0),
+    ('Entertainment', 150.0),
+    ('Utilities', 300.0),
+    ('Dining', 250.0),
+    ('Shopping', 200.0),
+    ('Healthcare', 150.0),
+    ('Other', 200.0)
+]
+
+DESCRIPTIONS = [
+    'MTA*NYCT PAYGO NEW YORK NY', 'TST* GREGORYS COFFEE', 'AMAZON MKTPLACE PMTS',
+    'SUPREMO FOOD MARKET', 'NETFLIX.COM', 'CON EDISON BILL PAYMENT', 'UBER TRIP',
+    'WHOLE FOODS MARKET', 'CVS PHARMACY', 'SPOTIFY USA', 'SHELL OIL GAS', 'ZARA USA'
+]
+
+def make_app(db_path=None, **overrides):
+    """Create an app bound to a benchmark database, returning (app, db_path)."""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='expense-bench-'), 'bench.db')
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.abspath(db_path)
+        UPLOAD_FOLDER = os.path.dirname(os.path.abspath(db_path))
+        CLASSIFIER_DIR = os.path.join(os.path.dirname(os.path.abspath(db_path)), 'classifiers')
+
+    for key, value in overrides.items():
+        setattr(BenchmarkConfig, key, value)
+
+    return create_app(BenchmarkConfig), db_path
+
+def seed_users(users):
+    """Create `users` users with the default categories. Returns {user_id: [category_ids]}."""
+    categories = {}
+    for i in range(users):
+        user = User(username=f'bench{i}', email=f'bench{i}@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+        rows = [Category(name=name, budget=budget, user_id=user.id) for name, budget in DEFAULT_CATEGORIES]
+        db.session.add_all(rows)
+        db.session.flush()
+        categories[user.id] = [row.id for row in rows]
+    db.session.commit()
+    return categories
+
+def seed_expenses(categories, rows, days=3 * 365, batch_size=50000, seed=42):
+    """Bulk insert `rows` random expenses spread over users and the last `days` days."""
+    rng = random.Random(seed)
+    now = datetime.now()
+    user_ids = list(categories)
+    inserted = 0
+    while inserted < rows:
+        batch = []
+        for _ in range(min(batch_size, rows - inserted)):
+            user_id = rng.choice(user_ids)
+            batch.append({
+                'amount_cents': rng.randint(100, 25000),
+                'description': rng.choice(DESCRIPTIONS),
+                'date': now - timedelta(days=rng.randrange(days), seconds=rng.randrange(86400)),
+                'category_id': rng.choice(categories[user_id]),
+                'user_id': user_id,
+                'source': 'benchmark'
+            })
+        db.session.execute(db.insert(Expense), batch)
+        db.session.commit()
+        inserted += len(batch)
+
+def seed_reminders_and_goals(categories, rows, batch_size=50000, seed=7):
+    """Bulk insert `rows` reminders and `rows` goals spread over users."""
+    rng = random.Random(seed)
+    now = datetime.now()
+    user_ids = list(categories)
+    for model, make_row in (
+        (Reminder, lambda user_id: {
+            'user_id': user_id, 'title': 'Bill', 'amount_cents': rng.randint(1000, 50000),
+            'due_date': now + timedelta(days=rng.randrange(-60, 120)),
+            'is_completed': rng.random() < 0.7, 'is_recurring': False
+        }),
+        (FinancialGoal, lambda user_id: {
+            'user_id': user_id, 'title': 'Goal', 'target_amount_cents': 100000,
+            'current_amount_cents': rng.randint(0, 100000), 'start_date': now - timedelta(days=90),
+            'target_date': now + timedelta(days=rng.randrange(30, 720)),
+            'is_completed': rng.random() < 0.5
+        }),
+    ):
+        inserted = 0
+        while inserted < rows:
+            batch = [make_row(rng.choice(user_ids)) for _ in range(min(batch_size, rows - inserted))]
+            db.session.execute(db.insert(model), batch)
+            db.session.commit()
+            inserted += len(batch)
+
+def time_call(fn, repeat=5):
+    """Return (median_ms, result) over `repeat` calls of fn()."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+def _pdf_string(text):
+    return '(' + text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ')'
+
+def write_statement_pdf(path, pages, rows_per_page=40, payments_every=10, seed=42):
+    """
+    Write a synthetic `pages`-page statement PDF in the layout pdf_extractor
+    expects and return the number of transaction lines written.
+
+    Pages are mostly "Transactions". Every `payments_every` pages a
+    "Payments" section starts at the bottom of a page and continues at the
+    top of the next page without a header, which exercises the cross-page
+    section state.
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+
+    def line(description, low, high, daily_cash=True):
+        day = start + timedelta(days=rng.randrange(365))
+        cash = f" 2% ${rng.uniform(0, 5):.2f}" if daily_cash else ''
+        return f"{day:%m/%d/%Y} {description}{cash} ${rng.uniform(low, high):,.2f}"
+
+    page_lines = []
+    rows = 0
+    for number in range(pages):
+        lines = [f'Statement page {number + 1} of {pages}']
+        if number == 0:
+            lines += ['Transactions', 'Date Description Daily Cash Amount']
+        elif number % payments_every == 0:
+            # Payments carried over from the previous page
+            lines += [line('ACH DEPOSIT INTERNET TRANSFER', 100, 900, False) for _ in range(2)]
+            lines += ['Transactions', 'Date Description Daily Cash Amount']
+            rows += 2
+        lines += [line(rng.choice(DESCRIPTIONS), 1, 250) for _ in range(rows_per_page)]
+        rows += rows_per_page
+        if number % payments_every == payments_every - 1:
+            lines += ['Payments', 'Date Description Amount']
+            lines += [line('ACH DEPOSIT INTERNET TRANSFER', 100, 900, False) for _ in range(2)]
+            rows += 2
+        page_lines.append(lines)
+
+    # Objects: 1 catalog, 2 page tree, 3 font, then a (page, content) pair per page
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None,
+               '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for lines in page_lines:
+        stream = 'BT /F1 8 Tf 10 TL 36 770 Td ' + ' '.join(f'{_pdf_string(line)} Tj T*' for line in lines) + ' ET'
+        page_id = len(objects) + 1
+        kids.append(f'{page_id} 0 R')
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>')
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'
+
+    data = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f'{number} 0 obj\n{body}\nendobj\n'.encode('latin-1')
+    xref = len(data)
+    data += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('latin-1')
+    data += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode('latin-1')
+    data += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode('latin-1')
+    with open(path, 'wb') as f:
+        f.write(data)
+    return rows
+
+def synthetic_statement_lines(lines, seed=42):
+    """
+    Return `lines` lines of statement text in the layout pdf_extractor
+    parses: section and column headers, purchases with Daily Cash rates,
+    payments, thousands separators, Daily Cash redemptions and the page
+    furniture (page numbers, totals, blank lines) a real statement has.
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    noise = ['', 'Page {} of 12', 'Total payments for this month ${:,.2f}',
+             'Card ending in 4321', 'Questions? Call 1-800-555-0100', 'Statement Balance ${:,.2f}']
+    result = []
+    section = 'Transactions'
+    while len(result) < lines:
+        roll = rng.random()
+        day = f"{(start + timedelta(days=rng.randrange(365))):%m/%d/%Y}"
+        if roll < 0.01:
+            section = 'Payments' if section == 'Transactions' else 'Transactions'
+            result += [section, 'Date Description Daily Cash Amount']
+        elif roll < 0.06:
+            result.append(rng.choice(noise).format(rng.randrange(1, 13) if rng.random() < 0.5 else rng.uniform(100, 5000)))
+        elif roll < 0.07:
+            result.append(f"{day} Daily Cash redemption -${rng.uniform(1, 50):.2f}")
+        elif section == 'Payments':
+            result.append(f"{day} ACH DEPOSIT INTERNET TRANSFER -${rng.uniform(100, 3000):,.2f}")
+        else:
+            amount = rng.uniform(1, 250) if rng.random() < 0.95 else rng.uniform(1000, 5000)
+            rate = rng.choice((1, 2, 3))
+            result.append(f"{day}  {rng.choice(DESCRIPTIONS)}   {rate}% ${amount * rate / 100:.2f} ${amount:,.2f}")
+    return result[:lines]
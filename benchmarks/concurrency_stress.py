@@ -0,0 +1,109 @@
+"""Concurrent reader/writer stress test for the database engine settings.
+
+Starts reader and writer processes against one SQLite file, the way several
+gunicorn workers would share it. Readers run the dashboard aggregates, and
+writers run statement imports through import_transactions. Each process
+runs for a fixed duration, and the script reports throughput and
+"database is locked" errors with SQLite tuning on and off.
+
+    python -m benchmarks.concurrency_stress --readers 4 --writers 2 --seconds 10
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.utils.aggregates import ExpenseAggregates
+from app.utils.statement_import import import_transactions
+from benchmarks.common import make_app, seed_users, seed_expenses
+from benchmarks.statement_import import synthetic_transactions
+
+def reader(db_path, tuning, seconds, user_ids, results):
+    app, _ = make_app(db_path, SQLITE_TUNING=tuning)
+    ops = errors = 0
+    deadline = time.monotonic() + seconds
+    with app.app_context():
+        while time.monotonic() < deadline:
+            try:
+                aggregates = ExpenseAggregates(user_ids[ops % len(user_ids)])
+                aggregates.by_category()
+                aggregates.by_month()
+                db.session.rollback()
+                ops += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    results.put(('read', ops, errors))
+
+def writer(db_path, tuning, seconds, user_ids, batch_size, results):
+    app, _ = make_app(db_path, SQLITE_TUNING=tuning)
+    transactions = synthetic_transactions(batch_size, seed=len(user_ids))
+    ops = errors = 0
+    deadline = time.monotonic() + seconds
+    with app.app_context():
+        while time.monotonic() < deadline:
+            try:
+                import_transactions(user_ids[ops % len(user_ids)], transactions, source='stress')
+                db.session.commit()
+                ops += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    results.put(('write', ops, errors))
+
+def run(tuning, args):
+    app, db_path = make_app(SQLITE_TUNING=tuning)
+    with app.app_context():
+        db.create_all()
+        categories = seed_users(args.users)
+        seed_expenses(categories, args.rows)
+        db.engine.dispose()
+    user_ids = list(categories)
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=reader, args=(db_path, tuning, args.seconds, user_ids, results))
+        for _ in range(args.readers)
+    ] + [
+        multiprocessing.Process(target=writer, args=(db_path, tuning, args.seconds, user_ids, args.batch, results))
+        for _ in range(args.writers)
+    ]
+    for process in processes:
+        process.start()
+    totals = {'read': [0, 0], 'write': [0, 0]}
+    for _ in processes:
+        kind, ops, errors = results.get()
+        totals[kind][0] += ops
+        totals[kind][1] += errors
+    for process in processes:
+        process.join()
+
+    label = 'tuned' if tuning else 'default'
+    for kind in ('read', 'write'):
+        ops, errors = totals[kind]
+        unit = 'dashboards' if kind == 'read' else f'imports of {args.batch} rows'
+        print(f"{label:>8} {kind:>5}: {ops / args.seconds:8.1f} {unit}/s, {errors} lock errors")
+    return totals
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rows', type=int, default=100000, help='expenses seeded before the run')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--batch', type=int, default=200, help='rows per import')
+    parser.add_argument('--tuned-only', action='store_true', help='skip the run without SQLite tuning')
+    args = parser.parse_args(argv)
+
+    if not args.tuned_only:
+        run(False, args)
+    run(True, args)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Statement line parser benchmark.
+
+Times the text-to-transaction stage of the PDF extractor on a synthetic
+statement corpus, separately from pdfplumber's text extraction. Compares the
+previous per-line regex parser with the precompiled single-pass tokenizer,
+checks that both produce the same transactions, and prints lines/second.
+
+    python -m benchmarks.line_parser --lines 1000000
+    python -m benchmarks.line_parser --lines 100000 --pdf-pages 20
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pdfplumber
+
+from app.utils.pdf_extractor import clean_amount, parse_page_text
+from benchmarks.common import synthetic_statement_lines, write_statement_pdf
+
+def legacy_parse_page_text(text):
+    """The per-line parser used before the tokenizer, kept for comparison."""
+    entries = []
+    current_section = None
+    for line in (text or '').split('\n'):
+        if 'Payments' in line:
+            current_section = 'payments'
+            continue
+        elif 'Transactions' in line:
+            current_section = 'transactions'
+            continue
+        if not line.strip() or 'Date' in line or 'Description' in line or 'Amount' in line:
+            continue
+        try:
+            date_match = re.search(r'\d{2}/\d{2}/\d{4}', line)
+            if not date_match:
+                continue
+            date_str = date_match.group()
+            transaction_date = datetime.strptime(date_str, '%m/%d/%Y').date()
+            amount_matches = re.findall(r'-?\$?\d+,?\d*\.\d{2}', line)
+            if not amount_matches:
+                continue
+            amount = clean_amount(amount_matches[-1])
+            description = line.replace(date_str, '')
+            for amt in amount_matches:
+                description = description.replace(amt, '')
+            description = re.sub(r'\d+%', '', description)
+            description = re.sub(r'\s+', ' ', description).strip()
+            if 'Daily Cash redemption' in description:
+                continue
+            description = re.sub(r'\s+', ' ', description)
+            description = description.strip()
+            if not description:
+                continue
+            entries.append((current_section, {
+                'date': transaction_date,
+                'description': description,
+                'amount': abs(amount)
+            }))
+        except Exception:
+            continue
+    return entries, current_section
+
+def time_parser(parse, pages):
+    start = time.perf_counter()
+    results = [parse(page) for page in pages]
+    return time.perf_counter() - start, results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=100000, help='corpus size (10k to 1M lines)')
+    parser.add_argument('--lines-per-page', type=int, default=60)
+    parser.add_argument('--pdf-pages', type=int, default=0, help='also time pdfplumber text extraction on a PDF of this many pages')
+    args = parser.parse_args(argv)
+
+    lines = synthetic_statement_lines(args.lines)
+    pages = ['\n'.join(lines[i:i + args.lines_per_page]) for i in range(0, len(lines), args.lines_per_page)]
+    print(f"Corpus: {len(lines):,} lines on {len(pages):,} pages")
+
+    results = {}
+    for name, parse in (('legacy regex', legacy_parse_page_text), ('tokenizer', parse_page_text)):
+        elapsed, results[name] = time_parser(parse, pages)
+        transactions = sum(len(entries) for entries, _ in results[name])
+        print(f"{name:>14}: {transactions:,} transactions in {elapsed:.2f}s ({len(lines) / elapsed:,.0f} lines/s)")
+
+    if args.pdf_pages:
+        path = os.path.join(tempfile.mkdtemp(prefix='expense-bench-'), 'statement.pdf')
+        write_statement_pdf(path, args.pdf_pages)
+        start = time.perf_counter()
+        with pdfplumber.open(path) as pdf:
+            texts = [page.extract_text() for page in pdf.pages]
+        elapsed = time.perf_counter() - start
+        pdf_lines = sum(len(text.split('\n')) for text in texts)
+        print(f"{'pdfplumber':>14}: {pdf_lines:,} lines of text in {elapsed:.2f}s ({pdf_lines / elapsed:,.0f} lines/s)")
+
+    legacy, tokenizer = results.values()
+    if legacy != tokenizer:
+        print("Tokenizer output differs from the legacy parser")
+        return 1
+    print("Tokenizer and legacy parser produce the same transactions")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
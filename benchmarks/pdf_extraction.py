@@ -0,0 +1,59 @@
+"""Statement PDF extraction benchmark.
+
+Writes a synthetic multi-page statement and extracts it with the layout
+(pdfplumber) and fast (raw content stream) text backends, each sequentially
+and on a process pool, printing pages/second, the time to the first
+transaction and whether every run produced the same transactions.
+
+    python -m benchmarks.pdf_extraction --pages 48 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from app.utils.pdf_extractor import iter_transactions_from_pdf
+from benchmarks.common import write_statement_pdf
+
+def run(path, backend, workers):
+    start = time.perf_counter()
+    first = None
+    transactions = []
+    for transaction in iter_transactions_from_pdf(path, workers=workers, min_parallel_pages=1, backend=backend):
+        if first is None:
+            first = time.perf_counter() - start
+        transactions.append(transaction)
+    return time.perf_counter() - start, first or 0.0, transactions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=48)
+    parser.add_argument('--rows-per-page', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    path = os.path.join(tempfile.mkdtemp(prefix='expense-bench-'), 'statement.pdf')
+    rows = write_statement_pdf(path, args.pages, args.rows_per_page)
+    print(f"Wrote {args.pages} pages with {rows} transactions to {path}")
+
+    results = {}
+    for backend in ('layout', 'fast'):
+        for mode, workers in (('sequential', 1), (f'{args.workers} workers', args.workers)):
+            name = f'{backend}, {mode}'
+            elapsed, first, transactions = run(path, backend, workers)
+            results[name] = transactions
+            print(f"{name:>20}: {len(transactions)} transactions in {elapsed:.2f}s "
+                  f"({args.pages / elapsed:.1f} pages/s, first after {first * 1000:.0f} ms)")
+
+    expected = results['layout, sequential']
+    for name, transactions in results.items():
+        if transactions != expected:
+            print(f"{name} extraction differs from layout, sequential extraction")
+            return 1
+    print("All backends and modes extract the same transactions")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Query budget check for the analytics routes.
+
+Runs each budgeted route (the analytics pages and reminders) against a
+small and a large dataset with QUERY_BUDGET_MODE='raise', so a view that
+exceeds its @query_budget fails, and reports the statement count for both
+sizes. The counts must not grow with the number of expenses.
+
+    python -m benchmarks.query_budget --small 20 --large 20000
+"""
+
+import argparse
+import sys
+
+from app import db
+from app.utils.query_budget import QueryCounter, QueryBudgetExceeded
+from benchmarks.common import make_app, seed_users, seed_expenses, seed_reminders_and_goals
+
+# reports and forecast have budgets too, but their templates do not exist yet
+ROUTES = [
+    ('GET', '/expense/dashboard', None),
+    ('GET', '/expense/financial-health', None),
+    ('GET', '/expense/expenses', None),
+    ('GET', '/expense/reminders', None),
+    ('POST', '/expense/get-ai-advice', {'question': 'How can I save more money?'}),
+]
+
+def count_route_queries(rows):
+    """Return {path: statement count} for every route against `rows` expenses."""
+    app, _ = make_app(TESTING=True, QUERY_BUDGET_MODE='raise')
+    with app.app_context():
+        db.create_all()
+        categories = seed_users(1)
+        seed_expenses(categories, rows)
+        seed_reminders_and_goals(categories, max(rows // 20, 1))
+
+    counts = {}
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'bench0', 'password': 'password123'})
+    for method, path, payload in ROUTES:
+        with app.app_context():
+            with QueryCounter(db.engine) as counter:
+                response = client.open(path, method=method, json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path} returned {response.status_code}')
+        counts[path] = counter.count
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--small', type=int, default=20, help='expenses in the small dataset')
+    parser.add_argument('--large', type=int, default=20000, help='expenses in the large dataset')
+    args = parser.parse_args(argv)
+
+    try:
+        small = count_route_queries(args.small)
+        large = count_route_queries(args.large)
+    except QueryBudgetExceeded as e:
+        print(f"Query budget exceeded: {e}")
+        return 1
+
+    failed = False
+    for path in small:
+        status = 'ok' if small[path] == large[path] else 'GROWS WITH DATA'
+        failed = failed or small[path] != large[path]
+        print(f"{path:<32} {small[path]:>3} queries @ {args.small} rows, {large[path]:>3} @ {args.large} rows  {status}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
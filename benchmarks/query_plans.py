@@ -0,0 +1,145 @@
+"""Query plan regression benchmark for the hot route filters.
+
+Seeds a throwaway SQLite database with millions of expenses, then runs the
+queries behind the reports, reminders, goals and financial health pages.
+For each query it prints SQLite's EXPLAIN QUERY PLAN and the median latency,
+and exits non-zero if any of them falls back to a full table scan.
+
+    python -m benchmarks.query_plans --rows 2000000 --users 50
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import db
+from app.models import Category, Expense, Reminder, FinancialGoal
+from benchmarks.common import make_app, seed_users, seed_expenses, seed_reminders_and_goals, time_call
+
+SCANNED_TABLES = ('expenses', 'reminders', 'financial_goals', 'categories')
+
+def hot_queries(user_id):
+    """Return (name, callable) pairs mirroring the queries issued by the routes."""
+    today = datetime.now()
+    start_date = datetime(today.year, today.month, 1)
+    end_date = today
+
+    return [
+        ('reports.expenses_in_range', lambda: Expense.query.filter(
+            Expense.user_id == user_id,
+            Expense.date >= start_date,
+            Expense.date <= end_date
+        ).all()),
+        ('reports.by_category', lambda: db.session.query(
+            Category.name, db.func.sum(Expense.amount_cents)
+        ).join(Expense).filter(
+            Expense.user_id == user_id,
+            Expense.date >= start_date,
+            Expense.date <= end_date
+        ).group_by(Category.name).all()),
+        ('reports.by_day', lambda: db.session.query(
+            db.func.date(Expense.date), db.func.sum(Expense.amount_cents)
+        ).filter(
+            Expense.user_id == user_id,
+            Expense.date >= start_date,
+            Expense.date <= end_date
+        ).group_by(db.func.date(Expense.date)).all()),
+        ('reminders.upcoming', lambda: Reminder.query.filter_by(
+            user_id=user_id, is_completed=False
+        ).order_by(Reminder.due_date).all()),
+        ('reminders.completed', lambda: Reminder.query.filter_by(
+            user_id=user_id, is_completed=True
+        ).order_by(Reminder.due_date.desc()).limit(5).all()),
+        ('goals.active', lambda: FinancialGoal.query.filter_by(
+            user_id=user_id, is_completed=False
+        ).order_by(FinancialGoal.target_date).all()),
+        ('goals.completed', lambda: FinancialGoal.query.filter_by(
+            user_id=user_id, is_completed=True
+        ).order_by(FinancialGoal.target_date.desc()).all()),
+        ('financial_health.categories', lambda: Category.query.filter_by(user_id=user_id).all()),
+        ('financial_health.recent_expenses', lambda: Expense.query.filter_by(
+            user_id=user_id
+        ).order_by(Expense.date.desc()).limit(5).all()),
+        ('financial_health.month_by_category', lambda: db.session.query(
+            Expense.category_id, db.func.sum(Expense.amount_cents)
+        ).filter(
+            Expense.user_id == user_id,
+            Expense.date >= start_date,
+            Expense.date < start_date + timedelta(days=32)
+        ).group_by(Expense.category_id).all()),
+        ('financial_health.upcoming_reminders', lambda: Reminder.query.filter_by(
+            user_id=user_id, is_completed=False
+        ).order_by(Reminder.due_date).limit(5).all()),
+    ]
+
+def capture_statements(fn):
+    """Run fn() and return the (sql, parameters) pairs it sent to the driver."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+def full_scans(plan_rows):
+    """Return plan details that scan one of the hot tables without an index."""
+    scans = []
+    for detail in plan_rows:
+        words = detail.split()
+        if len(words) >= 2 and words[0] == 'SCAN' and words[1] in SCANNED_TABLES and 'INDEX' not in detail:
+            scans.append(detail)
+    return scans
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000000, help='expenses to seed')
+    parser.add_argument('--users', type=int, default=50, help='users to spread rows across')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per query')
+    parser.add_argument('--db', help='reuse an already seeded benchmark database')
+    args = parser.parse_args(argv)
+
+    app, db_path = make_app(args.db)
+    regressions = []
+    with app.app_context():
+        if not args.db:
+            db.create_all()
+            print(f"Seeding {args.rows} expenses for {args.users} users into {db_path}")
+            categories = seed_users(args.users)
+            seed_expenses(categories, args.rows)
+            seed_reminders_and_goals(categories, max(args.rows // 20, args.users))
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql('ANALYZE')
+
+        user_id = 1
+        for name, fn in hot_queries(user_id):
+            statements = capture_statements(fn)
+            db.session.rollback()
+            median_ms, result = time_call(fn, args.repeat)
+            print(f"\n{name}: {median_ms:.2f} ms median, {len(result)} rows")
+
+            with db.engine.connect() as connection:
+                for statement, parameters in statements:
+                    plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+                    details = [row[-1] for row in plan]
+                    for detail in details:
+                        print(f"    {detail}")
+                    regressions.extend((name, scan) for scan in full_scans(details))
+
+    if regressions:
+        print("\nFull table scans detected:")
+        for name, detail in regressions:
+            print(f"    {name}: {detail}")
+        return 1
+
+    print("\nNo full table scans on hot queries")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
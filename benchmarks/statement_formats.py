@@ -0,0 +1,96 @@
+"""CSV/OFX/QIF statement import benchmark.
+
+Writes the same synthetic transactions as CSV, OFX and QIF, streams the CSV
+through import_transactions printing rows/second and how much the process's
+peak memory grew during the import, then times parsing each format.
+
+    python -m benchmarks.statement_formats --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from app import db
+from app.utils.statement_formats import iter_statement_transactions
+from app.utils.statement_import import import_transactions
+from benchmarks.common import make_app, seed_users, DESCRIPTIONS
+
+def synthetic_rows(rows, seed=42):
+    """
+    Yield (date, description, signed amount) rows over the last year in date
+    order, like a statement; negative amounts are payments.
+    """
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=365)
+    for i in range(rows):
+        amount = round(rng.uniform(1, 250), 2)
+        yield (start + timedelta(days=i * 365 // rows), rng.choice(DESCRIPTIONS),
+               -amount if rng.random() < 0.05 else amount)
+
+def write_statements(directory, rows):
+    """Write `rows` transactions as statement.csv, .ofx and .qif. Returns their paths."""
+    paths = {name: os.path.join(directory, f'statement.{name}') for name in ('csv', 'ofx', 'qif')}
+    with open(paths['csv'], 'w') as csv_file, open(paths['ofx'], 'w') as ofx_file, \
+            open(paths['qif'], 'w') as qif_file:
+        csv_file.write('Transaction Date,Description,Amount (USD)\n')
+        ofx_file.write('OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><CREDITCARDMSGSRSV1><CCSTMTTRNRS><CCSTMTRS>'
+                       '<BANKTRANLIST>\n')
+        qif_file.write('!Type:CCard\n')
+        for day, description, amount in synthetic_rows(rows):
+            csv_file.write(f'{day:%m/%d/%Y},{description},{amount:.2f}\n')
+            # OFX and QIF sign amounts from the account's side: purchases are negative
+            ofx_file.write(f'<STMTTRN>\n<TRNTYPE>{"CREDIT" if amount < 0 else "DEBIT"}\n'
+                           f'<DTPOSTED>{day:%Y%m%d}120000\n<TRNAMT>{-amount:.2f}\n'
+                           f'<NAME>{description}\n</STMTTRN>\n')
+            qif_file.write(f'D{day:%m/%d/%Y}\nT{-amount:.2f}\nP{description}\n^\n')
+        ofx_file.write('</BANKTRANLIST></CCSTMTRS></CCSTMTTRNRS></CREDITCARDMSGSRSV1></OFX>\n')
+    return paths
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--batch', type=int, default=1000, help='rows per import batch')
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix='expense-bench-')
+    paths = write_statements(directory, args.rows)
+    print(f"Wrote {args.rows} transactions per format to {directory}")
+
+    # Import first, so the peak memory reading only covers the import
+    app, db_path = make_app()
+    with app.app_context():
+        db.create_all()
+        user_id = next(iter(seed_users(1)))
+        before = peak_rss_mb()
+        start = time.perf_counter()
+        result = import_transactions(user_id, iter_statement_transactions(paths['csv']),
+                                     source='statement', batch_size=args.batch)
+        db.session.commit()
+        elapsed = time.perf_counter() - start
+    print(f"csv import: {result['imported']} rows in {elapsed:.2f}s ({result['imported'] / elapsed:,.0f} rows/s), "
+          f"peak memory grew {peak_rss_mb() - before:.0f} MB")
+
+    for name, path in paths.items():
+        start = time.perf_counter()
+        count = sum(1 for _ in iter_statement_transactions(path))
+        elapsed = time.perf_counter() - start
+        print(f"{name:>6} parse: {count} transactions in {elapsed:.2f}s ({count / elapsed:,.0f} rows/s)")
+
+    streams = [iter_statement_transactions(path) for path in paths.values()]
+    if any(csv_row != ofx_row or csv_row != qif_row for csv_row, ofx_row, qif_row in zip(*streams)):
+        print("Formats parsed to different transactions")
+        return 1
+    print("CSV, OFX and QIF parsed to the same transactions")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
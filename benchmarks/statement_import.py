@@ -0,0 +1,90 @@
+"""Statement import throughput benchmark.
+
+Compares the old per-row import loop (one category lookup and one commit per
+transaction) with the bulk import_transactions path, and prints rows/second
+for each. Then re-imports the same statement and a half-overlapping one,
+where only unseen fingerprints are inserted.
+
+    python -m benchmarks.statement_import --rows 2000
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from app import db
+from app.models import Category, Expense
+from app.utils.expense_categorizer import categorize_expense
+from app.utils.import_metrics import ImportMetrics
+from app.utils.statement_import import import_transactions
+from benchmarks.common import make_app, seed_users, DESCRIPTIONS
+
+def synthetic_transactions(rows, seed=42):
+    """Return `rows` transaction dicts shaped like extract_transactions_from_pdf output."""
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=365)
+    return [{
+        'date': start + timedelta(days=rng.randrange(365)),
+        'description': rng.choice(DESCRIPTIONS),
+        'amount': round(rng.uniform(1, 250), 2),
+        'type': 'payment' if rng.random() < 0.05 else 'purchase'
+    } for _ in range(rows)]
+
+def legacy_import(user_id, transactions):
+    """The per-row import loop process_statement used before the bulk path."""
+    other_category = Category.query.filter_by(name='Other', user_id=user_id).first()
+    imported = 0
+    for transaction in transactions:
+        category_name = categorize_expense(transaction['description'])
+        category = Category.query.filter_by(name=category_name, user_id=user_id).first() or other_category
+        amount = transaction['amount']
+        if transaction['type'] == 'payment':
+            amount = -amount
+        db.session.add(Expense(amount=amount, description=transaction['description'],
+                               date=transaction['date'], category_id=category.id,
+                               user_id=user_id, source='statement'))
+        db.session.commit()
+        imported += 1
+    return imported
+
+def bulk_import(user_id, transactions):
+    metrics = ImportMetrics()
+    result = import_transactions(user_id, transactions, source='statement', metrics=metrics)
+    with metrics.stage('commit'):
+        db.session.commit()
+    print(f"{'stages':>16}: {metrics.summary()}")
+    return result['imported']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000, help='transactions per import')
+    args = parser.parse_args(argv)
+
+    transactions = synthetic_transactions(args.rows)
+    for name, import_fn in (('per-row commits', legacy_import), ('bulk insert', bulk_import)):
+        # Each variant gets a fresh database so neither benefits from the other's pages
+        app, db_path = make_app()
+        with app.app_context():
+            db.create_all()
+            user_id = next(iter(seed_users(1)))
+            start = time.perf_counter()
+            imported = import_fn(user_id, transactions)
+            elapsed = time.perf_counter() - start
+        print(f"{name:>16}: {imported} rows in {elapsed:.3f}s ({imported / elapsed:,.0f} rows/s)")
+
+    # Re-uploads only look up the fingerprints of each batch
+    overlapping = transactions[len(transactions) // 2:] + synthetic_transactions(len(transactions) // 2, seed=7)
+    for name, batch in (('re-import', transactions), ('50% overlap', overlapping)):
+        with app.app_context():
+            start = time.perf_counter()
+            result = import_transactions(user_id, batch, source='statement')
+            db.session.commit()
+            elapsed = time.perf_counter() - start
+        print(f"{name:>16}: {result['imported']} new, {result['duplicates']} duplicates in {elapsed:.3f}s "
+              f"({len(batch) / elapsed:,.0f} rows/s)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,13 +6,69 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-this')
     
     # Database configuration
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///expense_tracker.db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///expense_tracker.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds
+    DB_STATEMENT_TIMEOUT = float(os.environ.get('DB_STATEMENT_TIMEOUT', 30))  # seconds
+    
+    # SQLite tuning for concurrent workers (WAL, busy timeout, synchronous=NORMAL)
+    SQLITE_TUNING = os.environ.get('SQLITE_TUNING', '1') != '0'
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    
+    # Check views against their @query_budget: 'warn' logs overruns, 'raise' fails the request
+    QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE')
+    
+    # Analytics cache: in-process LRU, plus an optional on-disk backend shared by workers
+    ANALYTICS_CACHE_SIZE = int(os.environ.get('ANALYTICS_CACHE_SIZE', 256))
+    ANALYTICS_CACHE_TTL = int(os.environ.get('ANALYTICS_CACHE_TTL', 300))  # seconds
+    ANALYTICS_CACHE_DIR = os.environ.get('ANALYTICS_CACHE_DIR')
+    
+    # Per-merchant categorization results cached in each process; see
+    # merchant_cache_stats() for hit rates when tuning the size
+    MERCHANT_CACHE_SIZE = int(os.environ.get('MERCHANT_CACHE_SIZE', 4096))
+    
+    # Per-user naive Bayes classifiers, saved as CLASSIFIER_DIR/user_<id>.npz and
+    # retrained after each import; imports use a model's prediction for rows
+    # no keyword matches once it has CLASSIFIER_MIN_EXAMPLES labeled expenses
+    # and is at least CLASSIFIER_MIN_CONFIDENCE sure
+    CLASSIFIER_DIR = os.environ.get('CLASSIFIER_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'classifiers'))
+    CLASSIFIER_MIN_EXAMPLES = int(os.environ.get('CLASSIFIER_MIN_EXAMPLES', 50))
+    CLASSIFIER_MIN_CONFIDENCE = float(os.environ.get('CLASSIFIER_MIN_CONFIDENCE', 0.75))
     
     # File upload configuration
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload size
     
+    # Statement extraction: statements with at least PDF_PARALLEL_MIN_PAGES pages
+    # are parsed on a pool of PDF_EXTRACT_WORKERS processes (1 disables the pool)
+    PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', min(4, os.cpu_count() or 1)))
+    PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 8))
+    # 'fast' reads PDF content streams directly, 'layout' uses pdfplumber's
+    # layout analysis, 'auto' falls back to layout when fast finds nothing
+    PDF_TEXT_BACKEND = os.environ.get('PDF_TEXT_BACKEND', 'auto')
+    # Imports parse PDFs in a child process limited to PDF_SANDBOX_TIMEOUT
+    # seconds (0 disables the sandbox) and PDF_SANDBOX_MEMORY_MB of extra
+    # memory, shared with its PDF_EXTRACT_WORKERS page workers; statements
+    # longer than PDF_MAX_PAGES pages are rejected
+    PDF_SANDBOX_TIMEOUT = int(os.environ.get('PDF_SANDBOX_TIMEOUT', 120))
+    PDF_SANDBOX_MEMORY_MB = int(os.environ.get('PDF_SANDBOX_MEMORY_MB', 1024))
+    PDF_MAX_PAGES = int(os.environ.get('PDF_MAX_PAGES', 500))
+    
+    # Statement imports run as background jobs picked up by worker.py;
+    # IMPORT_JOBS_INLINE=1 runs them inside the upload request instead
+    IMPORT_JOBS_INLINE = os.environ.get('IMPORT_JOBS_INLINE', '0') == '1'
+    IMPORT_JOB_BATCH_SIZE = 500  # rows committed per progress update
+    IMPORT_JOB_POLL_INTERVAL = 2  # seconds
+    IMPORT_JOB_TIMEOUT = 3600  # seconds before a running job is considered stale
+    
+    # Batch uploads: files are extracted on a pool of IMPORT_BATCH_WORKERS
+    # processes; zips may hold at most IMPORT_BATCH_MAX_FILES statements
+    IMPORT_BATCH_WORKERS = int(os.environ.get('IMPORT_BATCH_WORKERS', min(4, os.cpu_count() or 1)))
+    IMPORT_BATCH_MAX_FILES = int(os.environ.get('IMPORT_BATCH_MAX_FILES', 50))
+    
     # Session configuration
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     
@@ -0,0 +1,74 @@
+"""Add transaction fingerprints to expenses
+
+This script adds the expenses.fingerprint column, backfills it for every
+imported expense, and creates the unique (user_id, fingerprint) index that
+statement imports use to skip transactions already present. It also brings
+the import_jobs table in line with merge imports.
+"""
+
+from collections import Counter
+from app import create_app, db
+from app.models import User, Expense
+from app.utils.statement_import import normalize_description, transaction_fingerprint
+from sqlalchemy import inspect
+
+def backfill_fingerprints(user_id):
+    """Fingerprint a user's imported expenses in import (id) order."""
+    rows = db.session.query(
+        Expense.id, Expense.date, Expense.description, Expense.amount_cents, Expense.source
+    ).filter(
+        Expense.user_id == user_id,
+        Expense.source != 'manual',
+        Expense.fingerprint.is_(None)
+    ).order_by(Expense.id).all()
+
+    occurrences = Counter()
+    updates = []
+    for expense_id, date, description, amount_cents, source in rows:
+        normalized = normalize_description(description)
+        base_key = (f"{date:%Y-%m-%d}", normalized, amount_cents, source)
+        updates.append({
+            'id': expense_id,
+            'fingerprint': transaction_fingerprint(date, normalized, amount_cents, source, occurrences[base_key])
+        })
+        occurrences[base_key] += 1
+
+    if updates:
+        db.session.execute(db.update(Expense), updates)
+    return len(updates)
+
+def run_migration():
+    """Run the migration to add and backfill expenses.fingerprint"""
+    app = create_app()
+    with app.app_context():
+        inspector = inspect(db.engine)
+        columns = [column['name'] for column in inspector.get_columns('expenses')]
+        if 'fingerprint' not in columns:
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql('ALTER TABLE expenses ADD COLUMN fingerprint VARCHAR(40)')
+            print("Added expenses.fingerprint column")
+
+        for user in User.query.all():
+            count = backfill_fingerprints(user.id)
+            db.session.commit()
+            print(f"Fingerprinted {count} imported expenses for {user.username}")
+
+        for index in Expense.__table__.indexes:
+            if index.name == 'ux_expenses_user_fingerprint':
+                index.create(db.engine, checkfirst=True)
+                print(f"Created index {index.name}")
+
+        # Imports no longer replace existing expenses; jobs count duplicates instead
+        if inspector.has_table('import_jobs'):
+            columns = [column['name'] for column in inspector.get_columns('import_jobs')]
+            with db.engine.begin() as connection:
+                if 'replace_existing' in columns:
+                    connection.exec_driver_sql('ALTER TABLE import_jobs DROP COLUMN replace_existing')
+                if 'duplicates' not in columns:
+                    connection.exec_driver_sql(
+                        'ALTER TABLE import_jobs ADD COLUMN duplicates INTEGER NOT NULL DEFAULT 0'
+                    )
+            print("Updated import_jobs table")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,26 @@
+"""Add batch ids to import jobs
+
+This script adds the import_jobs.batch_id column and its index, which group
+the files of a batch statement upload so a worker imports them together.
+"""
+
+from app import create_app, db
+from app.models import ImportJob
+from sqlalchemy import inspect
+
+def run_migration():
+    """Run the migration to add import_jobs.batch_id"""
+    app = create_app()
+    with app.app_context():
+        columns = [column['name'] for column in inspect(db.engine).get_columns('import_jobs')]
+        if 'batch_id' not in columns:
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql('ALTER TABLE import_jobs ADD COLUMN batch_id VARCHAR(32)')
+            print("Added import_jobs.batch_id column")
+
+        for index in ImportJob.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        print("Created import_jobs indexes")
+
+if __name__ == "__main__":
+    run_migration()
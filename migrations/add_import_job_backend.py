@@ -0,0 +1,22 @@
+"""Record the statement parser backend on import jobs
+
+This script adds the import_jobs.backend column, which reports whether a
+statement was read with the fast or the layout PDF backend, a CSV/OFX/QIF
+parser, or the parsed statement cache.
+"""
+
+from app import create_app, db
+from sqlalchemy import inspect
+
+def run_migration():
+    """Run the migration to add import_jobs.backend"""
+    app = create_app()
+    with app.app_context():
+        columns = [column['name'] for column in inspect(db.engine).get_columns('import_jobs')]
+        if 'backend' not in columns:
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql('ALTER TABLE import_jobs ADD COLUMN backend VARCHAR(20)')
+            print("Added import_jobs.backend column")
+
+if __name__ == "__main__":
+    run_migration()
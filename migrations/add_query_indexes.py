@@ -0,0 +1,29 @@
+"""Add composite indexes for hot query filters
+
+This script builds the composite indexes declared on the models on an
+existing database. Indexes that already exist are left untouched.
+"""
+
+from app import create_app, db
+from app.models import Category, Expense, Reminder, FinancialGoal
+
+def run_migration():
+    """Run the migration to create the composite indexes"""
+    app = create_app()
+    with app.app_context():
+        for model in (Category, Expense, Reminder, FinancialGoal):
+            for index in model.__table__.indexes:
+                # Unique indexes are built by the migration that backfills their columns
+                if index.unique:
+                    continue
+                index.create(db.engine, checkfirst=True)
+                print(f"Created index {index.name}")
+
+        # Refresh planner statistics so SQLite picks up the new indexes
+        if db.engine.dialect.name == 'sqlite':
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql('ANALYZE')
+            print("Updated query planner statistics")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,27 @@
+"""Add statement hashes and the parsed statement cache
+
+This script adds the statements.sha256 column and creates the
+parsed_statements table, so re-uploaded statements skip PDF parsing.
+"""
+
+from app import create_app, db
+from app.models import Statement, ParsedStatement
+from sqlalchemy import inspect
+
+def run_migration():
+    """Run the migration to add statement hashes and parsed_statements"""
+    app = create_app()
+    with app.app_context():
+        columns = [column['name'] for column in inspect(db.engine).get_columns('statements')]
+        if 'sha256' not in columns:
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql('ALTER TABLE statements ADD COLUMN sha256 VARCHAR(64)')
+            print("Added statements.sha256 column")
+        for index in Statement.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+
+        ParsedStatement.__table__.create(db.engine, checkfirst=True)
+        print("Created parsed_statements table")
+
+if __name__ == "__main__":
+    run_migration()
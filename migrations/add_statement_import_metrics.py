@@ -0,0 +1,21 @@
+"""Add import metrics to statements
+
+This script adds the statements.import_metrics column, which holds the
+stage timings and counters recorded while the statement was imported.
+"""
+
+from app import create_app, db
+from sqlalchemy import inspect
+
+def run_migration():
+    """Run the migration to add statements.import_metrics"""
+    app = create_app()
+    with app.app_context():
+        columns = [column['name'] for column in inspect(db.engine).get_columns('statements')]
+        if 'import_metrics' not in columns:
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql('ALTER TABLE statements ADD COLUMN import_metrics JSON')
+            print("Added statements.import_metrics column")
+
+if __name__ == "__main__":
+    run_migration()
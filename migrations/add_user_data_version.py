@@ -0,0 +1,26 @@
+"""Add data version column to users
+
+This script adds the users.data_version column that keys the analytics
+cache. Every write bumps it, so cached results for the user are invalidated.
+"""
+
+from app import create_app, db
+from sqlalchemy import inspect
+
+def run_migration():
+    """Run the migration to add users.data_version"""
+    app = create_app()
+    with app.app_context():
+        columns = [column['name'] for column in inspect(db.engine).get_columns('users')]
+        if 'data_version' in columns:
+            print("users.data_version already exists")
+            return
+
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                'ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0'
+            )
+        print("Added users.data_version column")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,61 @@
+"""Convert money columns to integer cents
+
+This script replaces the float money columns (expense and reminder amounts,
+category budgets and goal amounts) with integer cents columns, converting the
+existing rows, and rebuilds the expense_rollups table with integer totals.
+"""
+
+from app import create_app, db
+from app.models import User, ExpenseRollup
+from app.utils.rollups import rebuild_user_rollups
+from sqlalchemy import inspect
+
+# (table, float column, cents column, NOT NULL)
+MONEY_COLUMNS = [
+    ('expenses', 'amount', 'amount_cents', True),
+    ('reminders', 'amount', 'amount_cents', True),
+    ('categories', 'budget', 'budget_cents', False),
+    ('financial_goals', 'target_amount', 'target_amount_cents', True),
+    ('financial_goals', 'current_amount', 'current_amount_cents', False),
+]
+
+def run_migration():
+    """Run the migration to store money as integer cents"""
+    app = create_app()
+    with app.app_context():
+        converted = set()
+        for table, float_column, cents_column, not_null in MONEY_COLUMNS:
+            columns = [column['name'] for column in inspect(db.engine).get_columns(table)]
+            if float_column not in columns:
+                print(f"{table}.{float_column} already converted")
+                continue
+
+            constraint = ' NOT NULL DEFAULT 0' if not_null else ' DEFAULT 0'
+            with db.engine.begin() as connection:
+                if cents_column not in columns:
+                    connection.exec_driver_sql(
+                        f'ALTER TABLE {table} ADD COLUMN {cents_column} INTEGER{constraint}'
+                    )
+                # ROUND() rounds half away from zero, matching to_cents()
+                connection.exec_driver_sql(
+                    f'UPDATE {table} SET {cents_column} = CAST(ROUND({float_column} * 100) AS INTEGER) '
+                    f'WHERE {float_column} IS NOT NULL'
+                )
+                connection.exec_driver_sql(f'ALTER TABLE {table} DROP COLUMN {float_column}')
+            converted.add(table)
+            print(f"Converted {table}.{float_column} to {cents_column}")
+
+        # Rollups are derived data, so recreate the table and backfill it
+        inspector = inspect(db.engine)
+        if 'expenses' in converted or not inspector.has_table('expense_rollups') or 'total_cents' not in [
+            column['name'] for column in inspector.get_columns('expense_rollups')
+        ]:
+            ExpenseRollup.__table__.drop(db.engine, checkfirst=True)
+            ExpenseRollup.__table__.create(db.engine)
+            for user in User.query.all():
+                buckets = rebuild_user_rollups(user.id)
+                db.session.commit()
+                print(f"Rebuilt {buckets} rollup buckets for {user.username}")
+
+if __name__ == "__main__":
+    run_migration()
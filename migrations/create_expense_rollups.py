@@ -0,0 +1,26 @@
+"""Create expense rollups table
+
+This script creates the expense_rollups table used by the dashboard and
+backfills it from the existing expenses of every user.
+"""
+
+from app import create_app, db
+from app.models import User, ExpenseRollup
+from app.utils.rollups import rebuild_user_rollups
+
+def run_migration():
+    """Run the migration to create and backfill the expense_rollups table"""
+    app = create_app()
+    with app.app_context():
+        # Create the table
+        ExpenseRollup.__table__.create(db.engine, checkfirst=True)
+        print("Created expense_rollups table")
+
+        # Backfill buckets for existing users
+        for user in User.query.all():
+            buckets = rebuild_user_rollups(user.id)
+            db.session.commit()
+            print(f"Rebuilt {buckets} rollup buckets for {user.username}")
+
+if __name__ == "__main__":
+    run_migration()
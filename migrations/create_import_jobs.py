@@ -0,0 +1,18 @@
+"""Create import jobs table
+
+This script creates the import_jobs table that queues statement imports
+for worker.py.
+"""
+
+from app import create_app, db
+from app.models import ImportJob
+
+def run_migration():
+    """Run the migration to create the import_jobs table"""
+    app = create_app()
+    with app.app_context():
+        ImportJob.__table__.create(db.engine, checkfirst=True)
+        print("Created import_jobs table")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,18 @@
+"""Create the merchant rules table
+
+This script creates the merchant_rules table, which remembers the category
+a user gave a merchant when editing an expense so later imports reuse it.
+"""
+
+from app import create_app, db
+from app.models import MerchantRule
+
+def run_migration():
+    """Run the migration to create merchant_rules"""
+    app = create_app()
+    with app.app_context():
+        MerchantRule.__table__.create(db.engine, checkfirst=True)
+        print("Created merchant_rules table")
+
+if __name__ == "__main__":
+    run_migration()
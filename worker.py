@@ -0,0 +1,54 @@
+"""Background worker for statement import jobs.
+
+Polls the import_jobs table and runs queued imports one at a time. Run one
+or more next to the web server; no external broker is needed:
+
+    python worker.py
+    python worker.py --once    # drain the queue and exit
+"""
+
+import argparse
+import logging
+import time
+
+from app import create_app
+from app.utils.import_jobs import claim_next_job, claim_batch_jobs, requeue_stale_jobs, run_import_batch, run_import_job
+
+def main():
+    parser = argparse.ArgumentParser(description='Run statement import jobs')
+    parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+    parser.add_argument('--poll-interval', type=float, default=None, help='seconds between queue polls')
+    args = parser.parse_args()
+
+    app = create_app()
+    # Import metrics are logged at INFO
+    app.logger.setLevel(logging.INFO)
+    with app.app_context():
+        poll_interval = args.poll_interval or app.config['IMPORT_JOB_POLL_INTERVAL']
+        requeued = requeue_stale_jobs(app.config['IMPORT_JOB_TIMEOUT'])
+        if requeued:
+            print(f"Requeued {requeued} stale import jobs")
+
+        print("Import worker started")
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if args.once:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            if job.batch_id:
+                # Batch uploads are extracted and imported together
+                jobs = claim_batch_jobs(job)
+                print(f"Running import batch {job.batch_id} with {len(jobs)} statements")
+                run_import_batch(jobs)
+            else:
+                print(f"Running import job {job.id} for {job.statement.filename}")
+                jobs = [run_import_job(job)]
+            for job in jobs:
+                print(f"Import job {job.id} {job.status} (backend: {job.backend}): {job.imported} imported, "
+                      f"{job.duplicates} already imported, {job.skipped} skipped")
+
+if __name__ == '__main__':
+    main()